@@ -0,0 +1,202 @@
+import math
+import re
+import threading
+import time
+from collections import OrderedDict
+
+# Similarity cache for first-turn chat answers.
+#
+# Many conversations open with the same few questions ("what is climate
+# change?"), and with no history the model's answer only depends on the
+# question. The first user message of a conversation is normalized into
+# terms (lowercase words without stop words, with a crude plural strip,
+# plus word bigrams at a quarter weight so word order counts for a little)
+# and compared against the cached questions by TF-IDF cosine similarity.
+# An inverted index from term to entries means only questions sharing a
+# term are scored. If the best match reaches `threshold`, its answer is
+# served without calling Gemini; otherwise the model's answer is added once
+# it arrives.
+#
+# Entries expire after `ttl` seconds and the least recently used go first
+# once there are `max_entries`. Messages that ask for a quiz are never
+# cached, so quiz mode keeps producing new questions. Best-match scores are
+# counted in SCORE_BUCKETS for tuning the threshold. The cache is per
+# process.
+
+WORD_RE = re.compile(r"[a-z0-9']+")
+
+STOP_WORDS = frozenset('''
+a an the is are was were be been being am do does did of to in on at by for
+with from about as into than then so and or but if it its it's this that
+these those there here what whats what's which who whom how why when where
+can could would should will shall may might must please tell me my i you
+your we our us explain describe give some any much many more most very
+just also really like kind sort between
+'''.split())
+
+# Messages asking for something different every time
+NO_CACHE_RE = re.compile(r'\b(quiz|test me|question|random|another|again|joke)\b', re.IGNORECASE)
+
+BIGRAM_WEIGHT = 0.25
+
+SCORE_BUCKETS = (0.5, 0.7, 0.8, 0.9, 0.95, 1.0)
+
+
+def _stem(word):
+    if len(word) > 4 and word.endswith('ies'):
+        return word[:-3] + 'y'
+    if len(word) > 3 and word.endswith('s') and not word.endswith(('ss', 'us', 'is')):
+        return word[:-1]
+    return word
+
+
+def terms(message):
+    # Term frequencies for a message
+    words = [_stem(word.strip("'")) for word in WORD_RE.findall(message.lower())]
+    words = [word for word in words if word and word not in STOP_WORDS]
+    counts = {}
+    for word in words:
+        counts[word] = counts.get(word, 0) + 1
+    for first, second in zip(words, words[1:]):
+        bigram = first + ' ' + second
+        counts[bigram] = counts.get(bigram, 0) + BIGRAM_WEIGHT
+    return counts
+
+
+class _Entry:
+    __slots__ = ('question', 'answer', 'terms', 'created', 'hits')
+
+    def __init__(self, question, answer, terms, created):
+        self.question = question
+        self.answer = answer
+        self.terms = terms
+        self.created = created
+        self.hits = 0
+
+
+class AnswerCache:
+    def __init__(self, threshold=0.85, max_entries=1000, ttl=86400, max_message_chars=300):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        # Long messages are specific enough that a match is unlikely
+        self.max_message_chars = max_message_chars
+
+        self._entries = OrderedDict()  # id -> _Entry, least recently used first
+        self._postings = {}  # term -> set of entry ids
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self._counters = {'lookups': 0, 'hits': 0, 'misses': 0, 'skipped': 0, 'added': 0,
+                          'evictions': 0, 'expired': 0}
+        self._scores = [0] * len(SCORE_BUCKETS)
+        self._hit_score_total = 0.0
+
+    def cacheable(self, message):
+        return (self.max_entries > 0 and len(message) <= self.max_message_chars
+                and not NO_CACHE_RE.search(message))
+
+    def _idf(self, term):
+        # Smoothed inverse document frequency over the cached questions
+        return math.log((1 + len(self._entries)) / (1 + len(self._postings.get(term, ())))) + 1
+
+    def _vector(self, counts):
+        vector = {term: count * self._idf(term) for term, count in counts.items()}
+        norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+        return vector, norm
+
+    def _best_match(self, counts, now):
+        # Must be called with self._lock held; returns (entry id, score)
+        query, query_norm = self._vector(counts)
+        if not query_norm:
+            return None, 0.0
+        candidates = set()
+        for term in query:
+            candidates.update(self._postings.get(term, ()))
+
+        best_id, best_score = None, 0.0
+        for entry_id in candidates:
+            entry = self._entries[entry_id]
+            if now - entry.created > self.ttl:
+                continue
+            vector, norm = self._vector(entry.terms)
+            dot = sum(weight * vector.get(term, 0.0) for term, weight in query.items())
+            score = dot / (query_norm * norm) if norm else 0.0
+            if score > best_score:
+                best_id, best_score = entry_id, score
+        return best_id, best_score
+
+    def _remove(self, entry_id):
+        entry = self._entries.pop(entry_id)
+        for term in entry.terms:
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.discard(entry_id)
+                if not postings:
+                    del self._postings[term]
+
+    def lookup(self, message):
+        # Returns the cached answer for a first-turn message, or None
+        if not self.cacheable(message):
+            with self._lock:
+                self._counters['skipped'] += 1
+            return None
+        counts = terms(message)
+        now = time.time()
+        with self._lock:
+            self._counters['lookups'] += 1
+            entry_id, score = self._best_match(counts, now)
+            for position, bound in enumerate(SCORE_BUCKETS):
+                if score <= bound:
+                    self._scores[position] += 1
+                    break
+            if entry_id is None or score < self.threshold:
+                self._counters['misses'] += 1
+                return None
+            entry = self._entries[entry_id]
+            self._entries.move_to_end(entry_id)
+            entry.hits += 1
+            self._counters['hits'] += 1
+            self._hit_score_total += score
+            return entry.answer
+
+    def add(self, message, answer):
+        if not answer or not self.cacheable(message):
+            return False
+        counts = terms(message)
+        if not counts:
+            return False
+        now = time.time()
+        with self._lock:
+            # A concurrent request may have cached a matching question
+            _, score = self._best_match(counts, now)
+            if score >= self.threshold:
+                return False
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = _Entry(message, answer, counts, now)
+            for term in counts:
+                self._postings.setdefault(term, set()).add(entry_id)
+            self._counters['added'] += 1
+
+            while self._entries:
+                oldest_id, oldest = next(iter(self._entries.items()))
+                if now - oldest.created > self.ttl:
+                    self._counters['expired'] += 1
+                elif len(self._entries) > self.max_entries:
+                    self._counters['evictions'] += 1
+                else:
+                    break
+                self._remove(oldest_id)
+        return True
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats['threshold'] = self.threshold
+            stats['entries'] = len(self._entries)
+            stats['terms'] = len(self._postings)
+            stats['hit_rate'] = round(stats['hits'] / stats['lookups'], 3) if stats['lookups'] else None
+            stats['mean_hit_score'] = (round(self._hit_score_total / stats['hits'], 3)
+                                       if stats['hits'] else None)
+            stats['best_scores'] = {f"<={bound}": count for bound, count in zip(SCORE_BUCKETS, self._scores)}
+        return stats
@@ -1,3 +1,5 @@
+import os
+
 # Import the Flask app from chatbot.py
 from chatbot import app
 
@@ -8,4 +10,4 @@ from chatbot import app
 if __name__ == '__main__':
     # This won't be used by Gunicorn, but allows for local testing
     port = int(os.environ.get('PORT', 5000))
-    app.run(host='0.0.0.0', port=port, debug=False)
\ No newline at end of file
+    app.run(host='0.0.0.0', port=port, debug=False)
@@ -0,0 +1,222 @@
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+from load_test import run_load
+
+# Latency/throughput benchmark against a local fake Gemini backend.
+#
+# Starts the app under gunicorn (using gunicorn.conf.py) with
+# google.generativeai replaced by fake_genai, drives each route at the given
+# concurrency with load_test.run_load, and reports p50/p95/p99 latency,
+# throughput, errors and the resident memory of every worker. No network
+# access or API key is needed.
+#
+#   python benchmark.py --concurrency 50 --requests 200 --latency 0.5
+#   python benchmark.py --output results.json
+#   python benchmark.py --baseline results.json --max-regression 0.2
+#
+# With --baseline the run fails (exit status 1) if any route's p95 latency
+# grew, or its throughput fell, by more than --max-regression.
+
+ROUTES = {
+    'chat': ('POST', '/chat', {'message': 'What is the difference between solar and wind energy?'}),
+    'chat_stream': ('POST', '/chat/stream', {'message': 'How does composting help the climate?'}),
+    'questions': ('GET', '/get_questions', None),
+    'scenarios': ('GET', '/get_scenarios', None),
+    'words': ('GET', '/get_words?difficulty=medium&mode=hangman', None),
+    'index': ('GET', '/', None),
+    'quiz_page': ('GET', '/quiz', None),
+    'static_js': ('GET', '/eco_adventure.js', None),
+}
+
+
+def create_app():
+    # Gunicorn entry point: `gunicorn 'benchmark:create_app()'`
+    import fake_genai
+    fake_genai.install()
+    from chatbot import app
+    return app
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_up(base_url, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(base_url + '/', timeout=2):
+                return True
+        except Exception:
+            time.sleep(0.2)
+    return False
+
+
+def worker_memory(master_pid):
+    # Resident memory (KiB) of each gunicorn worker, read from /proc
+    memory = {}
+    if not os.path.isdir('/proc'):
+        return memory
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/status') as f:
+                status = dict(line.split(':', 1) for line in f if ':' in line)
+        except OSError:
+            continue
+        if status.get('PPid', '').strip() == str(master_pid):
+            memory[int(entry)] = int(status.get('VmRSS', '0 kB').split()[0])
+    return memory
+
+
+def start_server(args, port, workdir):
+    env = dict(os.environ)
+    env.update({
+        'PORT': str(port),
+        'FAKE_GENAI_LATENCY': str(args.latency),
+        'FAKE_GENAI_JITTER': str(args.jitter),
+        'FAKE_GENAI_FAILURE_RATE': str(args.failure_rate),
+        'FAKE_GENAI_RESPONSE_SIZE': str(args.response_size),
+        'GEMINI_API_KEY': 'fake-key',
+        'CONTENT_CACHE_PATH': os.path.join(workdir, 'content_cache.db') if args.disk_cache else '',
+        # Every benchmark request comes from one address without a session,
+        # so rate limits would turn most of the load into cheap 429s
+        'RATE_LIMIT_CHAT_PER_MINUTE': '0',
+        'RATE_LIMIT_CONTENT_PER_MINUTE': '0',
+        # State files go in the scratch directory, so runs don't share state
+        # or leave files in the repository
+        'RATE_LIMIT_PATH': os.path.join(workdir, 'rate_limits.db'),
+        'DEDUP_INDEX_PATH': os.path.join(workdir, 'dedup_index.db'),
+        'LEADERBOARD_PATH': os.path.join(workdir, 'leaderboard.db'),
+        'QUIZ_SESSION_STORE': 'sqlite:' + os.path.join(workdir, 'quiz_sessions.db'),
+        'WEB_CONCURRENCY': str(args.workers),
+        'GUNICORN_THREADS': str(args.threads),
+        'GUNICORN_WORKER_CLASS': args.worker_class,
+    })
+    command = [
+        sys.executable, '-m', 'gunicorn', 'benchmark:create_app()',
+        '-c', 'gunicorn.conf.py', '--bind', f'127.0.0.1:{port}',
+        '--access-logfile', os.path.join(workdir, 'access.log'),
+        '--error-logfile', os.path.join(workdir, 'error.log'),
+    ]
+    here = os.path.dirname(os.path.abspath(__file__))
+    return subprocess.Popen(command, cwd=here, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def run_benchmark(args):
+    port = free_port()
+    base_url = f'http://127.0.0.1:{port}'
+    with tempfile.TemporaryDirectory() as workdir:
+        server = start_server(args, port, workdir)
+        try:
+            if not wait_until_up(base_url):
+                with open(os.path.join(workdir, 'error.log')) as f:
+                    print(f.read(), file=sys.stderr)
+                raise RuntimeError('Server did not start')
+
+            results = {}
+            for name in args.routes:
+                method, path, body = ROUTES[name]
+                # Warm up so one-off costs (cold pools, first model build)
+                # don't dominate the percentiles
+                run_load(base_url + path, args.warmup, min(args.warmup, args.concurrency), method=method, body=body)
+                result = run_load(base_url + path, args.requests, args.concurrency,
+                                  method=method, body=body)
+                result['worker_rss_kb'] = worker_memory(server.pid)
+                results[name] = result
+            return {
+                'config': {
+                    'latency': args.latency,
+                    'jitter': args.jitter,
+                    'failure_rate': args.failure_rate,
+                    'response_size': args.response_size,
+                    'concurrency': args.concurrency,
+                    'requests': args.requests,
+                    'workers': args.workers,
+                    'threads': args.threads,
+                    'worker_class': args.worker_class,
+                },
+                'routes': results,
+            }
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+
+
+def print_report(report):
+    header = f"{'route':<12} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7} {'non-2xx':>8} {'max RSS MiB':>12}"
+    print(header)
+    print('-' * len(header))
+    for name, result in report['routes'].items():
+        non_2xx = sum(count for status, count in result['statuses'].items() if not 200 <= int(status) < 300)
+        rss = max(result['worker_rss_kb'].values(), default=0) / 1024
+        print(f"{name:<12} {result['throughput_rps']:>8.1f} {result['p50_ms']:>9.1f} {result['p95_ms']:>9.1f} "
+              f"{result['p99_ms']:>9.1f} {result['errors']:>7} {non_2xx:>8} {rss:>12.1f}")
+
+
+def compare(report, baseline, max_regression):
+    # Returns a list of human-readable regressions
+    regressions = []
+    for name, result in report['routes'].items():
+        before = baseline.get('routes', {}).get(name)
+        if not before:
+            continue
+        if before['p95_ms'] and result['p95_ms'] > before['p95_ms'] * (1 + max_regression):
+            regressions.append(f"{name}: p95 {before['p95_ms']}ms -> {result['p95_ms']}ms")
+        if before['throughput_rps'] and result['throughput_rps'] < before['throughput_rps'] * (1 - max_regression):
+            regressions.append(f"{name}: throughput {before['throughput_rps']} -> {result['throughput_rps']} req/s")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the app against a fake Gemini backend')
+    parser.add_argument('--routes', nargs='+', choices=sorted(ROUTES), default=list(ROUTES))
+    parser.add_argument('--requests', type=int, default=200, help='Requests per route')
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--warmup', type=int, default=10, help='Warm-up requests per route')
+    parser.add_argument('--latency', type=float, default=0.5, help='Fake model latency in seconds')
+    parser.add_argument('--jitter', type=float, default=0.1)
+    parser.add_argument('--failure-rate', type=float, default=0.0)
+    parser.add_argument('--response-size', type=int, default=10)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=64)
+    parser.add_argument('--worker-class', default='gthread')
+    parser.add_argument('--disk-cache', action='store_true', help='Enable the SQLite content cache tier')
+    parser.add_argument('--output', help='Write the full report as JSON')
+    parser.add_argument('--baseline', help='JSON report to compare against')
+    parser.add_argument('--max-regression', type=float, default=0.2)
+    args = parser.parse_args()
+
+    report = run_benchmark(args)
+    print_report(report)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.max_regression)
+        if regressions:
+            print('\nRegressions:')
+            for regression in regressions:
+                print('  ' + regression)
+            sys.exit(1)
+        print('\nNo regressions against baseline')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+import re
+import threading
+
+# Rolling context window for /chat.
+#
+# Only the most recent `keep_turns` turns of a conversation are sent to the
+# model verbatim. Older turns are folded into a short running summary that is
+# stored with the session and sent as a single exchange ahead of the recent
+# turns, and the whole request is kept under `token_budget` (estimated) tokens
+# by folding more turns when needed. This keeps the cost of every turn roughly
+# constant instead of growing with the length of the conversation.
+
+TAG_RE = re.compile(r'<[^>]+>')
+SENTENCE_END_RE = re.compile(r'(?<=[.!?])\s')
+
+
+def estimate_tokens(text):
+    # Roughly four characters per token for English text, which is close
+    # enough for budgeting without a count_tokens round trip
+    return len(text) // 4 + 1
+
+
+def turns_tokens(turns):
+    return sum(estimate_tokens(part) for turn in turns for part in turn.get('parts', []))
+
+
+def summarize_turn(turn, max_chars=160):
+    # Extractive one-liner: first sentence of the turn with markup removed
+    text = ' '.join(TAG_RE.sub(' ', ' '.join(turn.get('parts', []))).split())
+    text = SENTENCE_END_RE.split(text, 1)[0]
+    if len(text) > max_chars:
+        text = text[:max_chars].rsplit(' ', 1)[0] + '...'
+    speaker = 'User' if turn.get('role') == 'user' else 'Bot'
+    return f"{speaker}: {text}"
+
+
+class ContextManager:
+    def __init__(self, keep_turns=6, token_budget=3000, summary_chars=1200):
+        self.keep_turns = keep_turns
+        self.token_budget = token_budget
+        self.summary_chars = summary_chars
+
+        self._lock = threading.Lock()
+        self._counters = {
+            'requests': 0,
+            'folded_turns': 0,
+            'tokens_before': 0,
+            'tokens_after': 0,
+            'last_tokens_before': 0,
+            'last_tokens_after': 0,
+        }
+
+    def fold(self, record, count):
+        # Move the oldest `count` turns of the history into the summary
+        history = record['history']
+        folded, record['history'] = history[:count], history[count:]
+        lines = [line for line in record.get('summary', '').split('\n') if line]
+        lines.extend(summarize_turn(turn) for turn in folded)
+
+        # Keep the summary bounded by dropping its oldest lines
+        while lines and sum(len(line) + 1 for line in lines) > self.summary_chars:
+            lines.pop(0)
+        record['summary'] = '\n'.join(lines)
+        record['folded_tokens'] = record.get('folded_tokens', 0) + turns_tokens(folded)
+        return len(folded)
+
+    def summary_turns(self, record):
+        if not record.get('summary'):
+            return []
+        return [
+            {"role": "user", "parts": ["Summary of our conversation so far:\n" + record['summary']]},
+            {"role": "model", "parts": ["Thanks, I'll keep that context in mind."]},
+        ]
+
+    def build(self, record, preamble=None):
+        # Returns the contents to send to the model: `preamble` turns (e.g.
+        # the system prompt exchange), the running summary, then the recent
+        # history. `record` is updated in place and should be saved back to
+        # the session store afterwards.
+        preamble = preamble or []
+        folded = 0
+
+        history = record['history']
+        if len(history) > self.keep_turns:
+            # Fold whole exchanges so the recent history starts on a user turn
+            excess = len(history) - self.keep_turns
+            if excess % 2:
+                excess += 1
+            folded += self.fold(record, min(excess, len(history) - 1))
+
+        contents = preamble + self.summary_turns(record) + record['history']
+        tokens = turns_tokens(contents)
+        while tokens > self.token_budget and len(record['history']) > 2:
+            folded += self.fold(record, 2)
+            contents = preamble + self.summary_turns(record) + record['history']
+            tokens = turns_tokens(contents)
+
+        # What this request would have cost with the full conversation
+        tokens_before = turns_tokens(preamble) + record.get('folded_tokens', 0) + turns_tokens(record['history'])
+
+        with self._lock:
+            self._counters['requests'] += 1
+            self._counters['folded_turns'] += folded
+            self._counters['tokens_before'] += tokens_before
+            self._counters['tokens_after'] += tokens
+            self._counters['last_tokens_before'] = tokens_before
+            self._counters['last_tokens_after'] = tokens
+        return contents
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+        requests = stats['requests'] or 1
+        stats['avg_tokens_before'] = stats['tokens_before'] // requests
+        stats['avg_tokens_after'] = stats['tokens_after'] // requests
+        return stats
@@ -1,37 +1,71 @@
-import os
-from flask import Flask, request, jsonify, send_from_directory, session
-import google.generativeai as genai
-import uuid
-import json
-import random
-
-# Try to load environment variables from .env file, but handle errors gracefully
-try:
-    from dotenv import load_dotenv
-    load_dotenv()
-    print("Environment variables loaded successfully")
-except Exception as e:
-    print(f"Warning: Could not load .env file: {str(e)}")
-    print("Continuing without .env file")
+from startup_timing import startup
+
+with startup.phase('flask'):
+    import os
+    from flask import Flask, Response, g, request, jsonify, session
+    from flask.json.provider import DefaultJSONProvider
+    import time
+    import uuid
+    import json
+    import random
+    import threading
+
+# The Gemini SDK isn't imported here; llm_provider.py loads and configures it
+# the first time a model is needed
+with startup.phase('app_modules'):
+    from question_pool import QuestionPool, question_key
+    from word_pool import WordPool
+    from session_store import create_session_store
+    from quiz_engine import QuizEngine, QuizNotFoundError
+    from leaderboard import Leaderboard
+    from game_session import RoundPrefetcher
+    from rate_limit import RateLimiter
+    from chat_context import ContextManager
+    from answer_cache import AnswerCache
+    from model_registry import models
+    from response_cache import ResponseCache, make_key
+    from single_flight import SingleFlight
+    from upstream import UpstreamClient, UpstreamError
+    from static_assets import StaticAssets
+    from structured_output import QUESTION_SCHEMA, SCENARIO_SCHEMA, WORD_SCHEMA, parse_items
+    import structured_output
+    import llm_provider
+    from content_bank import ContentBank
+    from dedup_index import DedupIndex
+    from scenario_graph import compile_adventure
+    import scenario_graph
+    import metrics
+    from metrics import log_event
+    from prompts import QUESTIONS_PROMPT, SCENARIOS_PROMPT, words_prompt
+
+with startup.phase('load_environment'):
+    # Try to load environment variables from .env file, but handle errors gracefully
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+        print("Environment variables loaded successfully")
+    except Exception as e:
+        print(f"Warning: Could not load .env file: {str(e)}")
+        print("Continuing without .env file")
     
-    # Try to manually read the .env file with different encodings
-    env_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.env')
-    if os.path.exists(env_path):
-        try:
-            # Try different encodings
-            for encoding in ['utf-8', 'utf-8-sig', 'latin-1', 'utf-16']:
-                try:
-                    with open(env_path, 'r', encoding=encoding) as f:
-                        for line in f:
-                            if line.strip() and not line.startswith('#'):
-                                key, value = line.strip().split('=', 1)
-                                os.environ[key] = value
-                    print(f"Successfully loaded .env file with {encoding} encoding")
-                    break
-                except Exception as enc_error:
-                    continue
-        except Exception as manual_error:
-            print(f"Failed to manually load .env file: {str(manual_error)}")
+        # Try to manually read the .env file with different encodings
+        env_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.env')
+        if os.path.exists(env_path):
+            try:
+                # Try different encodings
+                for encoding in ['utf-8', 'utf-8-sig', 'latin-1', 'utf-16']:
+                    try:
+                        with open(env_path, 'r', encoding=encoding) as f:
+                            for line in f:
+                                if line.strip() and not line.startswith('#'):
+                                    key, value = line.strip().split('=', 1)
+                                    os.environ[key] = value
+                        print(f"Successfully loaded .env file with {encoding} encoding")
+                        break
+                    except Exception as enc_error:
+                        continue
+            except Exception as manual_error:
+                print(f"Failed to manually load .env file: {str(manual_error)}")
 
 # Get API key from environment variables
 api_key = os.getenv('GEMINI_API_KEY')
@@ -40,90 +74,351 @@ if not api_key:
     print("Error: GEMINI_API_KEY not found in environment variables")
     print("Please create a .env file with your GEMINI_API_KEY or set it as an environment variable")
     print("Example .env file content: GEMINI_API_KEY=your_api_key_here")
-    exit(1)  # Exit the program if no API key is found
+    print("Static pages are still served; chat and content generation will use fallbacks")
 else:
     print("Using API key from environment variables")
 
-# Configure the Gemini API
-genai.configure(api_key=api_key)
-
 # Initialize Flask app with environment variable to disable dotenv loading
 os.environ["FLASK_SKIP_DOTENV"] = "1"  # Set environment variable before creating app
-app = Flask(__name__, static_folder='.')
+app = Flask(__name__, static_folder=None)
+
+def route_label():
+    # The matched URL rule, so metrics have one series per route rather than
+    # per path
+    rule = request.url_rule
+    return rule.rule if rule is not None else 'unmatched'
+
+# jsonify() goes through the app's JSON provider; timing it here measures
+# response serialization for every route
+class TimedJSONProvider(DefaultJSONProvider):
+    def response(self, *args, **kwargs):
+        with metrics.serialize_seconds.time(route_label()):
+            return super().response(*args, **kwargs)
+
+app.json = TimedJSONProvider(app)
+
+# Pages, stylesheets and scripts are precompressed and served from memory
+# (see static_assets.py)
+with startup.phase('static_assets'):
+    static_assets = StaticAssets(os.path.dirname(os.path.abspath(__file__)))
+
+# Vetted scenarios, words and questions for serving without Gemini
+# (see content_bank.py)
+with startup.phase('content_bank'):
+    content_bank = ContentBank(os.getenv('CONTENT_BANK_PATH') or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), 'content_bank.jsonl'))
 
 # Configure session
 app.secret_key = os.getenv('FLASK_SECRET_KEY', 'default-secret-key')
 
-# Store chat history and sessions
-chat_history = {}
-chat_sessions = {}
+# Store chat history per session, with LRU/idle-TTL eviction and a cap on
+# turns kept per session (see session_store.py). Set CHAT_SESSION_STORE to
+# "sqlite:<path>" to share sessions between gunicorn workers.
+chat_store = create_session_store(
+    max_sessions=int(os.getenv('CHAT_MAX_SESSIONS', 5000)),
+    ttl=int(os.getenv('CHAT_SESSION_TTL', 3600)),
+    max_turns=int(os.getenv('CHAT_MAX_TURNS', 40)),
+)
+
+# Only the last few turns are sent verbatim; older ones are folded into a
+# running summary so each request stays within a fixed token budget
+chat_context = ContextManager(
+    keep_turns=int(os.getenv('CHAT_CONTEXT_TURNS', 6)),
+    token_budget=int(os.getenv('CHAT_TOKEN_BUDGET', 3000)),
+)
+
+# Answers to common opening questions are reused across conversations
+# (see answer_cache.py). CHAT_ANSWER_CACHE_SIZE=0 turns this off.
+answer_cache = AnswerCache(
+    threshold=float(os.getenv('CHAT_ANSWER_CACHE_THRESHOLD', 0.85)),
+    max_entries=int(os.getenv('CHAT_ANSWER_CACHE_SIZE', 1000)),
+    ttl=int(os.getenv('CHAT_ANSWER_CACHE_TTL', 86400)),
+)
+
+# Generated questions, words and scenarios are fingerprinted so Gemini
+# repeating itself doesn't reach players (see dedup_index.py). The index is
+# shared by all workers; set DEDUP_INDEX_PATH to an empty string to turn it off.
+dedup_path = os.getenv('DEDUP_INDEX_PATH', 'dedup_index.db')
+dedup_index = DedupIndex(dedup_path) if dedup_path else None
+
+def dedup_filter(namespace, text_of):
+    if dedup_index is None:
+        return None
+    return lambda items: dedup_index.filter(namespace, items, text_of)
+
+# Scenarios that repeat earlier adventures are dropped only while this many
+# fresh ones are left; a shorter adventure would be worse than a repeat
+SCENARIO_MIN_FRESH = 7
+
+def generate_questions():
+    # Use the shared, preconfigured model instance
+    model = models.get('questions')
+    
+    # Generate the response
+    response = upstream.generate('questions', model, QUESTIONS_PROMPT)
+    
+    # Extract and validate the questions
+    with metrics.parse_seconds.time('questions'):
+        return parse_items(response.text, QUESTION_SCHEMA)
+
+def generate_words():
+    # Use the shared, preconfigured model instance
+    model = models.get('words')
+    
+    # One mixed batch for all difficulties; word_pool.py validates the words
+    # and sorts them by length
+    response = upstream.generate('words', model, words_prompt(WORD_BATCH_SIZE))
+    with metrics.parse_seconds.time('words'):
+        return parse_items(response.text, WORD_SCHEMA)
+
+# Generated scenarios are cached (in memory and in a SQLite file
+# shared by all workers) and refreshed in the background once they go stale.
+# Set CONTENT_CACHE_PATH to an empty string to keep the cache in memory only.
+content_cache = ResponseCache(
+    ttl=int(os.getenv('CONTENT_CACHE_TTL', 900)),
+    stale_ttl=int(os.getenv('CONTENT_CACHE_STALE_TTL', 86400)),
+    max_entries=int(os.getenv('CONTENT_CACHE_MAX_ENTRIES', 256)),
+    disk_path=os.getenv('CONTENT_CACHE_PATH', 'content_cache.db'),
+)
+
+# All model calls go through one client that enforces per-endpoint deadlines,
+# retries transient errors, trips a circuit breaker after repeated failures
+# (routes then serve fallback content immediately) and keeps each worker
+# under its share of the API quota
+upstream = UpstreamClient(
+    deadlines={'chat': 30, 'questions': 45, 'scenarios': 60, 'words': 30},
+    max_retries=int(os.getenv('UPSTREAM_MAX_RETRIES', 2)),
+    failure_threshold=int(os.getenv('UPSTREAM_FAILURE_THRESHOLD', 5)),
+    reset_timeout=int(os.getenv('UPSTREAM_RESET_TIMEOUT', 30)),
+    max_concurrency=int(os.getenv('UPSTREAM_MAX_CONCURRENCY', 32)),
+    rate_per_minute=int(os.getenv('UPSTREAM_RATE_PER_MINUTE', 600)),
+    observer=lambda endpoint, seconds, outcome: metrics.upstream_seconds.observe(seconds, endpoint, outcome),
+)
+
+# Concurrent requests for the same content share one in-flight model call
+generation_flight = SingleFlight(timeout=int(os.getenv('GENERATION_WAIT_TIMEOUT', 60)))
+
+# Questions are generated ahead of time by a background worker and served
+# from memory; see question_pool.py. The pool starts out with questions from
+# the content bank, so generation only has to add variety.
+question_pool = QuestionPool(generate_questions, dedup=dedup_filter('question', question_key))
+question_pool.add(content_bank.questions(count=question_pool.high_water))
+
+# Word game words are generated for all difficulties at once, sorted into
+# per-difficulty pools by length and served from memory (see word_pool.py).
+# The pools start out with words from the content bank.
+WORD_BATCH_SIZE = int(os.getenv('WORD_BATCH_SIZE', 60))
+word_pool = WordPool(generate_words, dedup=dedup_filter('word', lambda item: item['word']))
+for difficulty in ('easy', 'medium', 'hard'):
+    word_pool.add(content_bank.words(difficulty, count=word_pool.high_water))
+
+# Quizzes are scored on the server; the answer key never reaches the browser.
+# The answer key is kept in SQLite by default, so whichever gunicorn worker
+# receives an answer can score it.
+quiz_engine = QuizEngine(create_session_store(
+    os.getenv('QUIZ_SESSION_STORE', 'sqlite:quiz_sessions.db'),
+    table='quiz_sessions',
+    max_sessions=int(os.getenv('QUIZ_MAX_SESSIONS', 5000)),
+    ttl=int(os.getenv('QUIZ_SESSION_TTL', 3600)),
+    max_turns=0,
+))
+
+# Best scores per game and difficulty, persisted to SQLite in batches
+# (see leaderboard.py)
+leaderboard = Leaderboard(
+    os.getenv('LEADERBOARD_PATH', 'leaderboard.db'),
+    flush_interval=float(os.getenv('LEADERBOARD_FLUSH_INTERVAL', 2.0)),
+)
+
+# Per-client token buckets in front of the routes that spend Gemini calls,
+# shared by all workers through SQLite (see rate_limit.py). Rates are
+# requests per minute per session; an IP address gets RATE_LIMIT_IP_MULTIPLIER
+# times as much. A rate of 0 turns a group's limit off.
+rate_limiter = RateLimiter(
+    limits={
+        'chat': (int(os.getenv('RATE_LIMIT_CHAT_PER_MINUTE', 20)), 10),
+        'content': (int(os.getenv('RATE_LIMIT_CONTENT_PER_MINUTE', 30)), 15),
+    },
+    routes={
+        '/chat': 'chat',
+        '/chat/stream': 'chat',
+        '/get_questions': 'content',
+        '/get_scenarios': 'content',
+        '/get_words': 'content',
+        '/game_session': 'content',
+    },
+    path=os.getenv('RATE_LIMIT_PATH', 'rate_limits.db'),
+    ip_multiplier=int(os.getenv('RATE_LIMIT_IP_MULTIPLIER', 10)),
+)
+
+# Number of proxies in front of the app that append to X-Forwarded-For
+# (Render adds one); the client address is the entry the outermost of them
+# added, anything further left is client-supplied
+PROXY_HOPS = int(os.getenv('PROXY_HOPS', 1))
+
+def client_ip():
+    forwarded = [part.strip() for part in request.headers.get('X-Forwarded-For', '').split(',') if part.strip()]
+    if PROXY_HOPS and len(forwarded) >= PROXY_HOPS:
+        return forwarded[-PROXY_HOPS]
+    return request.remote_addr or 'unknown'
 
 # Define the quiz routes directly in chatbot.py to avoid import issues
 def setup_quiz_routes(app):
     @app.route('/get_questions', methods=['GET'])
     def get_questions():
+        session_id = request.cookies.get('session_id')
+        if not session_id:
+            session_id = str(uuid.uuid4())
+        
         try:
-            # Create a generative model instance
-            model = genai.GenerativeModel('gemini-1.5-flash')
-            
-            # Define the prompt to generate 10 sustainability quiz questions
-            prompt = """Generate 10 multiple-choice questions about environmental sustainability. 
-            Each question should have 4 options (A, B, C, D) with only one correct answer.
+            # Serve a randomized set the session hasn't seen yet
+            questions = question_pool.get_batch(session_id)
+            if not questions:
+                return jsonify({'error': 'Sorry, no questions are available right now. Please try again.'}), 503
             
-            Format the response as a JSON array with the following structure for each question:
-            {
-                "question": "The question text",
-                "options": ["Option A", "Option B", "Option C", "Option D"],
-                "correct_answer": "The correct option letter (A, B, C, or D)",
-                "explanation": "Brief explanation of why the answer is correct"
-            }
-            
-            Cover diverse sustainability topics such as climate change, renewable energy, biodiversity, 
-            waste management, water conservation, sustainable agriculture, pollution, and eco-friendly practices.
-            
-            Make the questions educational, engaging, and varying in difficulty.
-            
-            IMPORTANT: Return ONLY the JSON array with no additional text or formatting.
-            """
-            
-            # Generate the response
-            response = model.generate_content(prompt)
-            
-            # Extract the JSON from the response
-            response_text = response.text
-            
-            # Clean the response if it contains markdown code blocks
-            if "```json" in response_text:
-                response_text = response_text.split("```json")[1].split("```")[0].strip()
-            elif "```" in response_text:
-                response_text = response_text.split("```")[1].split("```")[0].strip()
-                
-            # Parse the JSON
-            questions = json.loads(response_text)
-            
-            # Shuffle the questions
-            random.shuffle(questions)
-            
-            return jsonify(questions)
+            # Start a quiz; answers are checked by /quiz/answer
+            quiz_id, public_questions = quiz_engine.start(questions, session_id)
+            resp = jsonify({
+                'quiz_id': quiz_id,
+                'questions': public_questions,
+                'points_per_question': quiz_engine.points_per_question,
+            })
+            resp.set_cookie('session_id', session_id, max_age=3600)  # 1 hour expiry
+            return resp
             
         except Exception as e:
             print(f"Error: {str(e)}")
             return jsonify({'error': f'Sorry, I encountered an error: {str(e)}'}), 500
 
+    @app.route('/quiz/answer', methods=['POST'])
+    def answer_question():
+        data = request.get_json(silent=True) or {}
+        try:
+            result = quiz_engine.answer(data.get('quiz_id', ''), data.get('index'), data.get('answer'))
+        except QuizNotFoundError:
+            return jsonify({'error': 'This quiz has expired. Please start a new one.'}), 404
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        return jsonify(result)
+
 # Set up quiz routes
 setup_quiz_routes(app)
 
+def warm_models():
+    try:
+        models.warm()
+    except UpstreamError as e:
+        print(f"Warning: Gemini models not warmed: {str(e)}")
+
+# The first request in each worker triggers SDK loading and model warm-up in
+# the background, so it is served without waiting for them
+@app.before_request
+def record_first_request():
+    if startup.first_request():
+        print(f"Startup timing: {json.dumps(startup.report())}")
+        threading.Thread(target=warm_models, daemon=True).start()
+
+# Per-request timing and request ids. A client-supplied X-Request-ID is
+# kept (so ids can be followed across proxies) and echoed on the response.
+# Set REQUEST_LOG=0 to turn off the JSON request log lines.
+REQUEST_LOG = os.getenv('REQUEST_LOG', '1') != '0'
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    request_id = request.headers.get('X-Request-ID', '')
+    if not request_id or len(request_id) > 64 or not request_id.isprintable():
+        request_id = uuid.uuid4().hex
+    g.request_id = request_id
+
+@app.after_request
+def record_request(response):
+    start = g.get('request_start')
+    if start is None:
+        return response
+    elapsed = time.perf_counter() - start
+    route = route_label()
+    metrics.http_requests.inc(route, request.method, str(response.status_code))
+    metrics.http_request_seconds.observe(elapsed, route, request.method)
+    response.headers['X-Request-ID'] = g.request_id
+    if REQUEST_LOG:
+        log_event('request', request_id=g.request_id, method=request.method, path=request.path,
+                  route=route, status=response.status_code, duration_ms=round(elapsed * 1000, 2))
+    return response
+
+# Over-limit requests are answered here, before the route runs
+@app.before_request
+def enforce_rate_limit():
+    route = route_label()
+    wait = rate_limiter.check(route, request.cookies.get('session_id'), client_ip())
+    if wait is None:
+        return None
+    metrics.rate_limited.inc(route)
+    message = "You're sending requests too quickly. Please wait a moment and try again."
+    resp = jsonify({'response': message, 'error': message})
+    resp.status_code = 429
+    resp.headers['Retry-After'] = str(max(1, int(wait + 0.999)))
+    return resp
+
+# Gauges read when /metrics is scraped
+metrics.registry.gauge('chat_sessions', 'Live chat sessions', lambda: chat_store.stats()['sessions'])
+metrics.registry.gauge('chat_history_bytes', 'Encoded size of all chat histories',
+                       lambda: chat_store.stats()['bytes'])
+metrics.registry.gauge('upstream_in_flight', 'Gemini calls in progress', lambda: upstream.stats()['in_flight'])
+metrics.registry.gauge('word_pool_size', 'Words ready to serve', lambda: word_pool.sizes(), ('difficulty',))
+metrics.registry.gauge('question_pool_size', 'Questions ready to serve',
+                       lambda: question_pool.stats()['size'])
+
+# Prometheus metrics for this worker (see metrics.py)
+@app.route('/metrics')
+def prometheus_metrics():
+    return Response(metrics.registry.render(), content_type=metrics.CONTENT_TYPE)
+
+# Liveness check that never touches the Gemini SDK
+@app.route('/healthz')
+def healthz():
+    return jsonify({'status': 'ok', 'llm_ready': llm_provider.is_ready()})
+
 @app.route('/')
 def index():
-    return send_from_directory('.', 'index.html')
+    return static_assets.response(static_assets.lookup('index.html'))
 
 @app.route('/quiz')
 def quiz():
-    return send_from_directory('.', 'quiz_game.html')
+    return static_assets.response(static_assets.lookup('quiz_game.html'))
+
+# Content-hashed stylesheets and scripts, cacheable forever
+@app.route('/static/<path:name>')
+def serve_hashed_static(name):
+    return static_assets.response(static_assets.lookup_hashed(name))
 
+# Only files listed in the static manifest are served
 @app.route('/<path:path>')
 def serve_static(path):
-    return send_from_directory('.', path)
+    return static_assets.response(static_assets.lookup(path))
+
+# Runtime statistics for the in-memory stores
+@app.route('/stats')
+def stats():
+    return jsonify({
+        'chat_sessions': chat_store.stats(),
+        'chat_context': chat_context.stats(),
+        'answer_cache': answer_cache.stats(),
+        'question_pool': question_pool.stats(),
+        'word_pool': word_pool.stats(),
+        'quiz': quiz_engine.stats(),
+        'leaderboard': leaderboard.stats(),
+        'game_session': round_prefetcher.stats(),
+        'rate_limit': rate_limiter.stats(),
+        'content_cache': content_cache.stats(),
+        'generation_flight': generation_flight.stats(),
+        'structured_output': structured_output.stats(),
+        'upstream': upstream.stats(),
+        'content_bank': content_bank.stats(),
+        'scenario_graph': scenario_graph.stats(),
+        'dedup_index': dedup_index.stats() if dedup_index is not None else None,
+        'startup': dict(startup.report(), llm=llm_provider.stats()),
+    })
 
 @app.route('/chat', methods=['POST'])
 def chat():
@@ -138,362 +433,312 @@ def chat():
         return jsonify({'response': 'Please provide a message', 'session_id': session_id}), 400
     
     try:
-        # Define the system prompt for environmental sustainability focus
-        system_prompt = """You are a Sustainability Expert Bot designed to educate users on all aspects of environmental sustainability. You have two main modes of interaction:
-
-1. INFORMATION MODE: If the user asks any questions which is not related to environment then you should politely reject the questin and When users ask general questions about sustainability topics, provide clear, concise, and educational responses. Keep explanations brief (maximum 3-4 short paragraphs) and focus on the most important points. Topics include climate change, renewable energy, biodiversity, SDGs, waste management, water conservation, green technologies, sustainable agriculture, deforestation, pollution, environmental policies, circular economy, sustainable transportation, and eco-friendly lifestyles.
-
-2. QUIZ MODE: When users specifically request a quiz or question (by using words like "quiz", "test me", "give me a question"), provide a brief quiz question. These should be structured as multiple-choice (A, B, C, D) or true/false questions, with concise explanations after the user responds.
-
-COMPARISON FORMAT: When users ask about differences or comparisons between two or more concepts (e.g., "What's the difference between solar and wind energy?"), format your response as an HTML table with columns. Each column should have a header with the concept name, and the content should be in bullet points. For example:
-
-<table class="comparison-table">
-  <tr>
-    <th>Solar Energy</th>
-    <th>Wind Energy</th>
-  </tr>
-  <tr>
-    <td>
-      <ul>
-        <li>Harvests energy from sunlight</li>
-        <li>Works best in sunny areas</li>
-        <li>No moving parts</li>
-      </ul>
-    </td>
-    <td>
-      <ul>
-        <li>Harvests energy from wind</li>
-        <li>Works best in windy areas</li>
-        <li>Has moving turbine blades</li>
-      </ul>
-    </td>
-  </tr>
-</table>
-3. If anyone asks you who is your developer you will answer in a very unique and polite manner that Pranay and Utkarsh has developed me and it should be in a very friendly manner.
-
-IMPORTANT: Maintain context throughout the conversation. If you've just asked a quiz question and the user responds with an answer (like "A", "B", "C", "D", "True", or "False"), recognize it as an answer to your previous question and provide feedback on whether they were correct, along with a brief explanation.
-
-Analyze each user message carefully to determine which mode is appropriate. If the message contains a direct question about sustainability, use INFORMATION MODE. If the message explicitly requests a quiz or question, use QUIZ MODE.
-
-Your tone should be friendly and engaging. Prioritize brevity and clarity in all responses. Use bullet points when appropriate to organize information. Limit your responses to 150-200 words whenever possible."""
-
-        # Get or create chat history for this session
-        if session_id not in chat_history:
-            chat_history[session_id] = []
-            # Add system prompt as first message in history
-            chat_history[session_id].append({"role": "user", "parts": [system_prompt]})
-            chat_history[session_id].append({"role": "model", "parts": ["I understand. I'll act as a Sustainability Expert Bot with the capabilities you described."]})
+        # Get or create chat history for this session. The system prompt is
+        # not stored per session; the chat model carries it as its system
+        # instruction.
+        record = chat_store.load(session_id)
         
-        # Add user message to history
-        chat_history[session_id].append({"role": "user", "parts": [user_message]})
+        # An opening question doesn't depend on any history, so a cached
+        # answer to a similar question can be served as is
+        first_turn = not record['history'] and not record.get('summary')
+        answer = answer_cache.lookup(user_message) if first_turn else None
         
-        # Create a new model instance
-        model = genai.GenerativeModel('gemini-1.5-flash')
+        # Add user message to history
+        record['history'].append({"role": "user", "parts": [user_message]})
         
-        # Generate a response using the chat history
-        response = model.generate_content(chat_history[session_id])
+        if answer is None:
+            # Use the shared, preconfigured chat model
+            model = models.get('chat')
+            
+            # Generate a response using the recent history and running summary
+            contents = chat_context.build(record)
+            answer = upstream.generate('chat', model, contents).text
+            if first_turn:
+                answer_cache.add(user_message, answer)
         
         # Add model response to history
-        chat_history[session_id].append({"role": "model", "parts": [response.text]})
+        record['history'].append({"role": "model", "parts": [answer]})
+        chat_store.save(session_id, record)
         
         # Set cookie in response
-        resp = jsonify({'response': response.text})
+        resp = jsonify({'response': answer})
         resp.set_cookie('session_id', session_id, max_age=3600)  # 1 hour expiry
         return resp
         
+    except UpstreamError as e:
+        # Gemini is failing or we're over quota: answer immediately
+        print(f"Upstream unavailable: {str(e)}")
+        return jsonify({'response': "Sorry, I'm a bit overloaded right now. Please try again in a moment."}), 503
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        return jsonify({'response': f'Sorry, I encountered an error: {str(e)}'}), 500
+
+def sse_event(payload, event=None):
+    # Format one Server-Sent Events message
+    message = f"event: {event}\n" if event else ""
+    return message + f"data: {json.dumps(payload)}\n\n"
+
+def cancel_stream(response):
+    # End a streaming call early: upstream.StreamingCall cancels the gRPC
+    # stream (so Gemini stops generating once nobody is listening) and gives
+    # back its concurrency slot
+    close = getattr(response, 'close', None)
+    if callable(close):
+        close()
+
+# Streaming variant of /chat: forwards the reply as Server-Sent Events while
+# Gemini generates it, so the first words show up without waiting for the
+# whole completion
+@app.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    data = request.json
+    user_message = data.get('message', '')
+    session_id = request.cookies.get('session_id')
+    
+    if not session_id:
+        session_id = str(uuid.uuid4())
+    
+    if not user_message:
+        return jsonify({'response': 'Please provide a message', 'session_id': session_id}), 400
+    
+    try:
+        record = chat_store.load(session_id)
+        first_turn = not record['history'] and not record.get('summary')
+        cached = answer_cache.lookup(user_message) if first_turn else None
+        record['history'].append({"role": "user", "parts": [user_message]})
+        if cached is None:
+            contents = chat_context.build(record)
+            response = upstream.generate('chat', models.get('chat'), contents, stream=True)
+        else:
+            # A cached answer to a similar opening question goes out as a
+            # single chunk
+            response = [cached]
+    except UpstreamError as e:
+        # Gemini is failing or we're over quota: answer immediately
+        print(f"Upstream unavailable: {str(e)}")
+        return jsonify({'response': "Sorry, I'm a bit overloaded right now. Please try again in a moment."}), 503
     except Exception as e:
         print(f"Error: {str(e)}")
         return jsonify({'response': f'Sorry, I encountered an error: {str(e)}'}), 500
+    
+    def events():
+        chunks = []
+        completed = False
+        try:
+            for chunk in response:
+                text = chunk if cached is not None else chunk.text
+                if text:
+                    chunks.append(text)
+                    yield sse_event({'text': text})
+            completed = True
+            
+            # Only a complete reply is added to the session history
+            answer = ''.join(chunks)
+            record['history'].append({"role": "model", "parts": [answer]})
+            chat_store.save(session_id, record)
+            if first_turn and cached is None:
+                answer_cache.add(user_message, answer)
+            yield sse_event({}, event='done')
+        except GeneratorExit:
+            # Client went away; the finally block cancels the upstream call
+            raise
+        except Exception as e:
+            print(f"Error: {str(e)}")
+            yield sse_event({'error': f'Sorry, I encountered an error: {str(e)}'}, event='error')
+        finally:
+            if not completed:
+                cancel_stream(response)
+    
+    resp = Response(events(), mimetype='text/event-stream')
+    resp.headers['Cache-Control'] = 'no-cache'
+    resp.headers['X-Accel-Buffering'] = 'no'  # Don't let proxies buffer the stream
+    resp.set_cookie('session_id', session_id, max_age=3600)  # 1 hour expiry
+    return resp
 
 # Add this function after the setup_quiz_routes function
 
 # Add this route to serve the Eco-Adventure game
 @app.route('/eco-adventure')
 def eco_adventure():
-    return send_from_directory('.', 'eco_adventure.html')
+    return static_assets.response(static_assets.lookup('eco_adventure.html'))
 
-@app.route('/get_scenarios', methods=['GET'])
-def get_scenarios():
+def generate_scenarios():
+    # Use the shared, preconfigured model instance
+    model = models.get('scenarios')
+    
+    # Generate the scenarios
+    response = upstream.generate('scenarios', model, SCENARIOS_PROMPT)
+    
+    # Extract the scenarios that match the expected structure
+    with metrics.parse_seconds.time('scenarios'):
+        scenarios = parse_items(response.text, SCENARIO_SCHEMA)
+    
+    if dedup_index is not None:
+        fresh = dedup_index.filter('scenario', scenarios, lambda scenario: scenario['description'])
+        if len(fresh) >= SCENARIO_MIN_FRESH:
+            scenarios = fresh
+    
+    # Validate the adventure as a graph: repair broken links and point values,
+    # drop unreachable scenarios and reject it if too little is left, so a
+    # bad adventure is never cached
+    return compile_adventure(scenarios).scenarios
+
+# Successive /game_session rounds of one player rotate through this many
+# cached adventures, so "play again" gets a different one; every player
+# shares the same few, so they cost a few generations per cache TTL
+SCENARIO_VARIANTS = 4
+
+def scenario_round(route, variant=0):
     try:
-        # Create a generative model instance
-        model = genai.GenerativeModel('gemini-1.5-flash')
-        
-        # Define the prompt to generate eco-adventure scenarios
-        prompt = """Generate 10 interactive scenarios for an environmental adventure game. 
-        Each scenario should present an environmental dilemma with choices that have different ecological impacts.
-        
-        Format the response as a JSON array with the following structure for each scenario:
-        {
-            "id": 1,  // Scenario number (1-10)
-            "description": "Detailed description of the environmental scenario",
-            "environment": "forest", // One of: forest, ocean, urban, desert
-            "hint": "An educational hint about the environmental issue",
-            "choices": [
-                {
-                    "id": "1A",
-                    "text": "First choice option",
-                    "points": 15,  // Eco points awarded for this choice (can be negative)
-                    "feedback": "Feedback about the impact of this choice",
-                    "next": 2  // ID of the next scenario
-                },
-                // 2-4 choices per scenario
-            ]
-        }
-        
-        Make sure:
-        1. Each scenario has 3-4 choices with varying environmental impacts
-        2. Points range from -10 (harmful to environment) to +15 (very beneficial)
-        3. Each choice leads to the next sequential scenario (choice.next = current scenario ID + 1)
-        4. The final scenario (id: 10) should have choices that lead to scenario 11
-        5. Include detailed, educational feedback for each choice
-        6. Scenarios should cover diverse environmental issues (pollution, conservation, energy, etc.)
-        7. Make descriptions and choices realistic and educational
-        """
-        
-        # Generate the scenarios
-        response = model.generate_content(prompt)
-        
-        # Parse the response
-        scenarios_text = response.text
-        
-        # Extract the JSON part from the response
-        import re
-        import json
-        
-        # Try to find JSON in the response
-        json_match = re.search(r'\[\s*\{.*\}\s*\]', scenarios_text, re.DOTALL)
-        
-        if json_match:
-            scenarios_json = json_match.group(0)
-            scenarios = json.loads(scenarios_json)
-        else:
-            # If no JSON array is found, try to parse the entire response
-            try:
-                scenarios = json.loads(scenarios_text)
-            except:
-                # Fallback to a simpler approach - look for the first [ and last ]
-                start = scenarios_text.find('[')
-                end = scenarios_text.rfind(']') + 1
-                if start != -1 and end != 0:
-                    try:
-                        scenarios = json.loads(scenarios_text[start:end])
-                    except:
-                        # If all parsing attempts fail, return fallback scenarios
-                        return jsonify(get_fallback_scenarios())
-                else:
-                    return jsonify(get_fallback_scenarios())
-        
-        # Validate and clean up the scenarios
-        for scenario in scenarios:
-            # Ensure all required fields are present
-            if 'id' not in scenario or 'description' not in scenario or 'choices' not in scenario:
-                continue
-                
-            # Ensure choices have all required fields
-            for choice in scenario['choices']:
-                if 'next' not in choice:
-                    # Default to next scenario
-                    choice['next'] = scenario['id'] + 1
-                
-                # Ensure points exist
-                if 'points' not in choice:
-                    choice['points'] = 0
-        
-        return jsonify(scenarios)
+        # Variant 0 is the adventure /get_scenarios serves
+        params = {'variant': variant} if variant else {}
+        key = make_key('scenarios', params, SCENARIOS_PROMPT, models.spec('scenarios')['model_name'])
+        return content_cache.get_or_compute(key, lambda: generation_flight.do(key, generate_scenarios))
     
     except Exception as e:
         print(f"Error generating scenarios: {e}")
-        return jsonify(get_fallback_scenarios())
+        metrics.fallbacks.inc(route, 'error')
+        return get_fallback_scenarios()
+
+@app.route('/get_scenarios', methods=['GET'])
+def get_scenarios():
+    return jsonify(scenario_round('/get_scenarios'))
 
 def get_fallback_scenarios():
-    # This function returns the same fallback scenarios as in your JavaScript
-    # You can copy them from your getFallbackScenarios() function
-    return [
-        {
-            "id": 1,
-            "description": "<p>You are hiking in a forest when you find a turtle tangled in plastic waste. The turtle appears to be struggling and in distress.</p><p>What do you do?</p>",
-            "environment": "forest",
-            "hint": "Turtles can be injured by plastic waste. Consider both immediate help and long-term solutions.",
-            "choices": [
-                {
-                    "id": "1A",
-                    "text": "Remove the plastic carefully and release the turtle",
-                    "points": 10,
-                    "feedback": "You carefully remove the plastic without harming the turtle. It slowly moves away, free from the harmful debris. You feel good knowing you've directly helped a creature in need.",
-                    "next": 2
-                },
-                {
-                    "id": "1B",
-                    "text": "Ignore it and keep walking",
-                    "points": -5,
-                    "feedback": "You continue your hike, leaving the turtle struggling. As you walk away, you can't help but feel a sense of guilt knowing you could have helped.",
-                    "next": 2
-                },
-                {
-                    "id": "1C",
-                    "text": "Call a wildlife rescue team",
-                    "points": 5,
-                    "feedback": "You call a local wildlife rescue team. They thank you for reporting it and promise to send someone right away. You wait until they arrive to make sure the turtle gets help.",
-                    "next": 2
-                }
-            ]
-        },
-        # Add the rest of your fallback scenarios here
-        # For brevity, I've only included the first one
-    ]
+    # A fresh adventure assembled from the offline content bank
+    return compile_adventure(content_bank.scenarios()).scenarios
 
 @app.route('/get_words', methods=['GET'])
 def get_words():
+    # Get parameters. The game mode doesn't change which words are served,
+    # so only the difficulty matters.
+    difficulty = request.args.get('difficulty', 'medium')
+    if difficulty not in ('easy', 'medium', 'hard'):
+        difficulty = 'medium'
+    return jsonify(word_round(difficulty, '/get_words'))
+
+def word_round(difficulty, route):
     try:
-        # Get parameters
-        difficulty = request.args.get('difficulty', 'medium')
-        game_mode = request.args.get('mode', 'hangman')
-        
-        # Create a generative model instance
-        model = genai.GenerativeModel('gemini-1.5-flash')
-        
-        # Define the prompt based on difficulty
-        word_count = 10
-        if difficulty == 'easy':
-            max_length = 6
-            prompt = f"Generate {word_count} sustainability-related words that are easy to guess (4-6 letters). "
-        elif difficulty == 'hard':
-            max_length = 12
-            prompt = f"Generate {word_count} challenging sustainability-related words (8-12 letters). "
-        else:  # medium
-            max_length = 8
-            prompt = f"Generate {word_count} sustainability-related words of medium difficulty (6-8 letters). "
-        
-        prompt += f"""Include technical terms related to environmental sustainability, conservation, renewable energy, etc.
-        
-        Format the response as a JSON array with the following structure:
-        [
-            {{"word": "RECYCLE", "hint": "Process of converting waste into reusable material"}},
-            {{"word": "SOLAR", "hint": "Relating to energy from the sun"}},
-            ...
-        ]
-        
-        Make sure:
-        1. All words are single words (no spaces or hyphens)
-        2. Words are related to environmental sustainability
-        3. Hints are clear but don't directly give away the answer
-        4. Words are appropriate for a {difficulty} difficulty level
-        5. All words are in UPPERCASE
-        """
-        
-        # Generate the words
-        response = model.generate_content(prompt)
-        
-        # Parse the response
-        words_text = response.text
-        
-        # Extract the JSON part from the response
-        import re
-        import json
-        
-        # Try to find JSON in the response
-        json_match = re.search(r'\[\s*\{.*\}\s*\]', words_text, re.DOTALL)
-        
-        if json_match:
-            words_json = json_match.group(0)
-            words = json.loads(words_json)
-        else:
-            # If no JSON array is found, try to parse the entire response
-            try:
-                words = json.loads(words_text)
-            except:
-                # Fallback to a simpler approach - look for the first [ and last ]
-                start = words_text.find('[')
-                end = words_text.rfind(']') + 1
-                if start != -1 and end != 0:
-                    try:
-                        words = json.loads(words_text[start:end])
-                    except:
-                        # If all parsing attempts fail, return fallback words
-                        return jsonify(get_fallback_words(difficulty))
-                else:
-                    return jsonify(get_fallback_words(difficulty))
-        
-        # Validate and clean up the words
-        validated_words = []
-        for word_obj in words:
-            if 'word' not in word_obj or 'hint' not in word_obj:
-                continue
-                
-            word = word_obj['word'].strip().upper()
-            
-            # Skip words that are too long or have spaces/special characters
-            if len(word) > max_length or not word.isalpha():
-                continue
-                
-            validated_words.append({
-                'word': word,
-                'hint': word_obj['hint']
-            })
-        
-        # If we don't have enough valid words, add some from fallback
-        if len(validated_words) < 5:
-            fallback = get_fallback_words(difficulty)
-            validated_words.extend(fallback[:10 - len(validated_words)])
-        
-        return jsonify(validated_words)
+        words = word_pool.get_batch(difficulty)
+        if len(words) < word_pool.batch_size:
+            # Top up from the content bank if the pool is short
+            metrics.fallbacks.inc(route, 'short_pool')
+            have = {word_obj['word'] for word_obj in words}
+            words.extend(content_bank.words(
+                difficulty, count=word_pool.batch_size - len(words),
+                exclude=lambda item: item['word'] in have))
+        return words
     
     except Exception as e:
         print(f"Error generating words: {e}")
-        return jsonify(get_fallback_words(difficulty))
+        metrics.fallbacks.inc(route, 'error')
+        return get_fallback_words(difficulty)
 
 def get_fallback_words(difficulty='medium'):
-    # Fallback word lists in case the API fails
-    easy_words = [
-        {"word": "RECYCLE", "hint": "Process of converting waste into reusable material"},
-        {"word": "GREEN", "hint": "Color associated with environmental movements"},
-        {"word": "EARTH", "hint": "Our home planet"},
-        {"word": "WATER", "hint": "Essential resource for all life"},
-        {"word": "SOLAR", "hint": "Relating to energy from the sun"},
-        {"word": "PLANT", "hint": "Living organism that produces oxygen"},
-        {"word": "CLEAN", "hint": "Free from pollution"},
-        {"word": "WASTE", "hint": "Unwanted or unusable material"},
-        {"word": "REUSE", "hint": "Use again or more than once"},
-        {"word": "ECO", "hint": "Prefix relating to the environment"}
-    ]
+    # Words from the offline content bank in case the API fails
+    return content_bank.words(difficulty)
+
+# A game round in one request: /game_session returns the round's content and
+# a ticket for the next round, which is prepared in the background while this
+# one is played (see game_session.py). Rounds are built like the /get_*
+# routes build them; a quiz is started when its round is served.
+round_prefetcher = RoundPrefetcher(
+    {
+        'quiz': lambda params, session_id, number: question_pool.get_batch(session_id, record=False),
+        'eco_adventure': lambda params, session_id, number: scenario_round(
+            '/game_session', variant=number % SCENARIO_VARIANTS),
+        'word_game': lambda params, session_id, number: word_round(params['difficulty'], '/game_session'),
+    },
+    # Quiz questions count as seen and served only when the round is played
+    on_serve={'quiz': question_pool.mark_served},
+    max_tickets=int(os.getenv('GAME_TICKET_MAX', 2000)),
+    ttl=int(os.getenv('GAME_TICKET_TTL', 600)),
+    workers=int(os.getenv('GAME_PREFETCH_WORKERS', 4)),
+)
+
+@app.route('/game_session', methods=['POST'])
+def game_session():
+    data = request.get_json(silent=True) or {}
+    game = data.get('game')
+    if game not in round_prefetcher.builders:
+        return jsonify({'error': 'Unknown game'}), 400
+    params = {}
+    if game == 'word_game':
+        difficulty = data.get('difficulty', 'medium')
+        params['difficulty'] = difficulty if difficulty in ('easy', 'medium', 'hard') else 'medium'
+    session_id = request.cookies.get('session_id') or str(uuid.uuid4())
+    # Preparing the next round may call Gemini too, so it takes a second
+    # token from the client's rate limit buckets; without one, no ticket
+    prefetch = rate_limiter.check(route_label(), session_id, client_ip()) is None
+    
+    try:
+        content, prefetched, ticket = round_prefetcher.start(
+            game, params, session_id, data.get('ticket'), prefetch=prefetch)
+        if game == 'quiz':
+            if not content:
+                return jsonify({'error': 'Sorry, no questions are available right now. Please try again.'}), 503
+            quiz_id, public_questions = quiz_engine.start(content, session_id)
+            content = {
+                'quiz_id': quiz_id,
+                'questions': public_questions,
+                'points_per_question': quiz_engine.points_per_question,
+            }
+    except Exception as e:
+        print(f"Error starting game round: {str(e)}")
+        return jsonify({'error': f'Sorry, I encountered an error: {str(e)}'}), 500
     
-    medium_words = [
-        {"word": "COMPOST", "hint": "Decayed organic material used as plant fertilizer"},
-        {"word": "CLIMATE", "hint": "Long-term weather patterns in an area"},
-        {"word": "ORGANIC", "hint": "Produced without artificial chemicals"},
-        {"word": "ECOLOGY", "hint": "Study of interactions between organisms and environment"},
-        {"word": "BIOFUEL", "hint": "Fuel derived from organic matter"},
-        {"word": "CARBON", "hint": "Element that forms the basis of greenhouse gases"},
-        {"word": "HABITAT", "hint": "Natural home of an animal or plant"},
-        {"word": "WETLAND", "hint": "Land area saturated with water"},
-        {"word": "OZONE", "hint": "Layer in the atmosphere that protects from UV radiation"},
-        {"word": "FOREST", "hint": "Large area covered with trees"}
-    ]
+    resp = jsonify({'game': game, 'round': content, 'prefetched': prefetched, 'ticket': ticket})
+    resp.set_cookie('session_id', session_id, max_age=3600)  # 1 hour expiry
+    return resp
+
+def leaderboard_params(data):
+    game = data.get('game', '')
+    difficulty = data.get('difficulty') or 'normal'
+    return game, difficulty
+
+@app.route('/scores', methods=['POST'])
+def submit_score():
+    data = request.get_json(silent=True) or {}
+    game, difficulty = leaderboard_params(data)
+    session_id = request.cookies.get('session_id') or str(uuid.uuid4())
     
-    hard_words = [
-        {"word": "BIODIVERSITY", "hint": "Variety of plant and animal life in a habitat"},
-        {"word": "SUSTAINABLE", "hint": "Able to be maintained at a certain rate or level"},
-        {"word": "CONSERVATION", "hint": "Protection of natural resources"},
-        {"word": "DEFORESTATION", "hint": "Clearing of forests on a large scale"},
-        {"word": "PHOTOVOLTAIC", "hint": "Converting light into electricity"},
-        {"word": "HYDROELECTRIC", "hint": "Generating electricity using flowing water"},
-        {"word": "PERMACULTURE", "hint": "Agricultural ecosystem intended to be sustainable"},
-        {"word": "DESERTIFICATION", "hint": "Process by which fertile land becomes desert"},
-        {"word": "EUTROPHICATION", "hint": "Excessive richness of nutrients in a body of water"},
-        {"word": "GEOTHERMAL", "hint": "Relating to heat from the earth's interior"}
-    ]
+    try:
+        result = leaderboard.submit(game, difficulty, session_id, data.get('name'), data.get('score'))
+        result['leaders'] = leaderboard.top(game, difficulty)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    if difficulty == 'easy':
-        return easy_words
-    elif difficulty == 'hard':
-        return hard_words
-    else:
-        return medium_words
+    resp = jsonify(result)
+    resp.set_cookie('session_id', session_id, max_age=3600)  # 1 hour expiry
+    return resp
+
+@app.route('/leaderboard', methods=['GET'])
+def get_leaderboard():
+    game, difficulty = leaderboard_params(request.args)
+    try:
+        limit = max(1, min(int(request.args.get('limit', 10)), 100))
+        return jsonify({'game': game, 'difficulty': difficulty,
+                        'leaders': leaderboard.top(game, difficulty, limit)})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/leaderboard/rank', methods=['GET'])
+def get_leaderboard_rank():
+    game, difficulty = leaderboard_params(request.args)
+    try:
+        rank = leaderboard.rank(game, difficulty, request.cookies.get('session_id', ''))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if rank is None:
+        return jsonify({'error': 'No score recorded yet'}), 404
+    return jsonify(rank)
 
 # Add route to serve the Word Game HTML
 @app.route('/word-game')
 def word_game():
-    return send_from_directory('.', 'word_game.html')
+    return static_assets.response(static_assets.lookup('word_game.html'))
+
+startup.mark_ready()
 
 # At the bottom of the file, replace the app.run() line with:
 if __name__ == '__main__':
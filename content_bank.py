@@ -0,0 +1,187 @@
+import json
+import os
+import random
+
+# Offline bank of vetted game content.
+#
+# content_bank.jsonl holds one JSON record per line: scenarios for the
+# Eco-Adventure game, words for the word games and quiz questions, each
+# tagged with a "type" (a leading "meta" record carries the file version).
+# The file is read once at startup. Items are kept as plain dicts in one
+# list per type, and small indexes map (field, value) -> positions, so a
+# lookup by difficulty, environment, topic or word length is a dict access
+# plus a random sample. Routes serve from the bank when Gemini is slow or
+# unavailable, and the question pool is seeded from it so generation only
+# has to add variety.
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'content_bank.jsonl')
+
+DIFFICULTIES = ('easy', 'medium', 'hard')
+ENVIRONMENTS = ('forest', 'ocean', 'urban', 'desert')
+
+# Word game limits, shared with word_pool.py: longer words don't fit the
+# game's letter boxes
+MIN_WORD_LENGTH = 4
+MAX_WORD_LENGTH = 12
+
+# Fields each item type is indexed by
+INDEXED_FIELDS = {
+    'scenario': ('environment', 'topic'),
+    'question': ('difficulty', 'topic'),
+    'word': ('difficulty', 'length', 'topic'),
+}
+
+
+def word_difficulty(word):
+    # Word game difficulty follows word length
+    length = len(word)
+    if length <= 6:
+        return 'easy'
+    if length <= 8:
+        return 'medium'
+    return 'hard'
+
+
+class ContentBank:
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self.version = None
+        self.items = {kind: [] for kind in INDEXED_FIELDS}
+        # kind -> {(field, value): tuple of positions in self.items[kind]}
+        self.indexes = {kind: {} for kind in INDEXED_FIELDS}
+        self.skipped = 0
+        if path:
+            self.load(path)
+
+    def load(self, path):
+        items = {kind: [] for kind in INDEXED_FIELDS}
+        skipped = 0
+        version = None
+        try:
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        skipped += 1
+                        continue
+                    kind = record.pop('type', None)
+                    if kind == 'meta':
+                        version = record.get('version')
+                    elif kind in items:
+                        item = self._prepare(kind, record)
+                        if item is None:
+                            skipped += 1
+                        else:
+                            items[kind].append(item)
+                    else:
+                        skipped += 1
+        except OSError as e:
+            print(f"Warning: Could not load content bank: {str(e)}")
+
+        indexes = {}
+        for kind, kind_items in items.items():
+            index = {}
+            for position, item in enumerate(kind_items):
+                for field in INDEXED_FIELDS[kind]:
+                    index.setdefault((field, item.get(field)), []).append(position)
+            indexes[kind] = {key: tuple(positions) for key, positions in index.items()}
+
+        self.items = items
+        self.indexes = indexes
+        self.version = version
+        self.skipped = skipped
+
+    def _prepare(self, kind, record):
+        # Returns the record ready to index, or None if it can't be served
+        if kind == 'word':
+            record['word'] = str(record.get('word', '')).strip().upper()
+            if not (MIN_WORD_LENGTH <= len(record['word']) <= MAX_WORD_LENGTH
+                    and record['word'].isascii() and record['word'].isalpha()):
+                return None
+            record.setdefault('difficulty', word_difficulty(record['word']))
+            record['length'] = len(record['word'])
+        return record
+
+    def _pick(self, kind, count, filters, exclude=None):
+        # Random sample of up to `count` items matching every filter.
+        # `exclude` is a predicate for items the caller has already used.
+        kind_items = self.items[kind]
+        filters = {field: value for field, value in filters.items() if value is not None}
+        if filters:
+            # Start from the smallest index entry, then check the rest
+            candidates = min(
+                (self.indexes[kind].get((field, value), ()) for field, value in filters.items()),
+                key=len,
+            )
+            if len(filters) == 1:
+                positions = candidates
+            else:
+                positions = [
+                    position for position in candidates
+                    if all(kind_items[position].get(field) == value for field, value in filters.items())
+                ]
+        else:
+            positions = range(len(kind_items))
+
+        if exclude is not None:
+            positions = [position for position in positions if not exclude(kind_items[position])]
+        positions = random.sample(positions, min(count, len(positions)))
+        return [kind_items[position] for position in positions]
+
+    def words(self, difficulty='medium', count=10, length=None, topic=None, exclude=None):
+        picked = self._pick('word', count, {'difficulty': difficulty, 'length': length, 'topic': topic}, exclude)
+        return [{'word': item['word'], 'hint': item['hint']} for item in picked]
+
+    def questions(self, count=10, difficulty=None, topic=None, exclude=None):
+        picked = self._pick('question', count, {'difficulty': difficulty, 'topic': topic}, exclude)
+        return [
+            {
+                'question': item['question'],
+                'options': list(item['options']),
+                'correct_answer': item['correct_answer'],
+                'explanation': item['explanation'],
+            }
+            for item in picked
+        ]
+
+    def scenarios(self, count=10, environment=None, topic=None):
+        # A ready-to-play adventure: scenarios numbered 1..count, each choice
+        # leading to the next one and the last to count + 1 (the ending)
+        picked = self._pick('scenario', count, {'environment': environment, 'topic': topic})
+        adventure = []
+        for number, item in enumerate(picked, 1):
+            adventure.append({
+                'id': number,
+                'description': item['description'],
+                'environment': item['environment'],
+                'hint': item['hint'],
+                'choices': [
+                    {
+                        'id': f"{number}{'ABCD'[position]}",
+                        'text': choice['text'],
+                        'points': choice['points'],
+                        'feedback': choice['feedback'],
+                        'next': number + 1,
+                    }
+                    for position, choice in enumerate(item['choices'])
+                ],
+            })
+        return adventure
+
+    def stats(self):
+        stats = {'version': self.version, 'skipped': self.skipped}
+        for kind, kind_items in self.items.items():
+            stats[kind + 's'] = len(kind_items)
+        stats['words_by_difficulty'] = {
+            difficulty: len(self.indexes['word'].get(('difficulty', difficulty), ()))
+            for difficulty in DIFFICULTIES
+        }
+        stats['scenarios_by_environment'] = {
+            environment: len(self.indexes['scenario'].get(('environment', environment), ()))
+            for environment in ENVIRONMENTS
+        }
+        return stats
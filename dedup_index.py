@@ -0,0 +1,274 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from array import array
+
+# Near-duplicate detection for generated content.
+#
+# Every generated item (quiz question, word, scenario) is reduced to
+# normalized text and cut into character shingles. A MinHash signature of
+# SIGNATURE_SIZE values is computed with one-permutation hashing: each
+# shingle is hashed once, the hash picks a bin and the bin keeps its
+# minimum, and empty bins borrow from the next filled one. The fraction of
+# equal values between two signatures estimates the Jaccard similarity of
+# their shingle sets.
+#
+# Signatures are split into BANDS bands for locality-sensitive hashing:
+# items that agree on a whole band share a bucket, so a lookup only compares
+# signatures with the few items found in its buckets (one indexed query),
+# independent of how many items are stored. Identical texts are caught first
+# by an exact hash.
+#
+# The index is a SQLite file, so it survives restarts and is shared by all
+# gunicorn workers. Each item costs one row with a 256-byte signature plus
+# one (bucket, item) row per band. Items are pruned after their namespace's
+# `max_age`, so content can come back eventually.
+
+SIGNATURE_SIZE = 64
+BANDS = 16
+
+# Per namespace: shingle length in characters, the estimated Jaccard
+# similarity from which an item counts as a duplicate and how many seconds
+# an item is remembered. A single word has too few shingles for a reliable
+# estimate (and PETROL and PETROLEUM are both fine words), so words only
+# match near-identical spellings. The sustainability vocabulary is small,
+# so words are only kept out for a day.
+NAMESPACES = {
+    'question': {'shingle': 5, 'threshold': 0.7, 'max_age': 30 * 86400},
+    'scenario': {'shingle': 5, 'threshold': 0.7, 'max_age': 30 * 86400},
+    'word': {'shingle': 3, 'threshold': 0.9, 'max_age': 86400},
+}
+
+TAG_RE = re.compile(r'<[^>]+>')
+NON_ALNUM_RE = re.compile(r'[^a-z0-9]+')
+
+_MASK32 = 0xFFFFFFFF
+# Offset added per bin skipped when densifying, so a borrowed value differs
+# from the original
+_ROTATION = 0x9E3779B1
+
+
+def normalize(text):
+    text = TAG_RE.sub(' ', str(text)).lower()
+    return NON_ALNUM_RE.sub(' ', text).strip()
+
+
+def shingles(text, size):
+    text = normalize(text)
+    if not text:
+        return set()
+    # Mark the ends so short texts still produce distinguishing shingles
+    text = f"^{text}$"
+    if len(text) <= size:
+        return {text}
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def signature(shingle_set):
+    bins = [None] * SIGNATURE_SIZE
+    for shingle in shingle_set:
+        value = int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'little')
+        position = value % SIGNATURE_SIZE
+        value = (value >> 6) & _MASK32
+        if bins[position] is None or value < bins[position]:
+            bins[position] = value
+
+    # Fill empty bins from the next non-empty one
+    if any(value is not None for value in bins):
+        for position in range(SIGNATURE_SIZE):
+            if bins[position] is None:
+                distance = 1
+                while bins[(position + distance) % SIGNATURE_SIZE] is None:
+                    distance += 1
+                source = bins[(position + distance) % SIGNATURE_SIZE]
+                bins[position] = (source + distance * _ROTATION) & _MASK32
+    return array('I', [value or 0 for value in bins])
+
+
+def similarity(first, second):
+    return sum(1 for a, b in zip(first, second) if a == b) / SIGNATURE_SIZE
+
+
+def band_keys(namespace, sig):
+    raw = sig.tobytes()
+    width = len(raw) // BANDS
+    keys = []
+    for band in range(BANDS):
+        digest = hashlib.blake2b(
+            f"{namespace}:{band}:".encode('utf-8') + raw[band * width:(band + 1) * width],
+            digest_size=8,
+        ).digest()
+        keys.append(int.from_bytes(digest, 'little', signed=True))
+    return keys
+
+
+def exact_key(namespace, text):
+    digest = hashlib.blake2b(f"{namespace}:{normalize(text)}".encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little', signed=True)
+
+
+class DedupIndex:
+    def __init__(self, path, namespaces=NAMESPACES, prune_every=500):
+        self.path = path
+        self.namespaces = namespaces
+        self.prune_every = prune_every
+
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._adds_since_prune = 0
+        self._counters = {namespace: {'checked': 0, 'added': 0, 'exact': 0, 'near': 0}
+                          for namespace in namespaces}
+        self._lookup_seconds = 0.0
+        self._lookups = 0
+
+        conn = self._connect()
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS dedup_items ('
+            'id INTEGER PRIMARY KEY, namespace TEXT NOT NULL, exact INTEGER NOT NULL, '
+            'signature BLOB NOT NULL, created REAL NOT NULL)'
+        )
+        conn.execute('CREATE INDEX IF NOT EXISTS dedup_items_exact ON dedup_items (exact)')
+        conn.execute('CREATE INDEX IF NOT EXISTS dedup_items_age ON dedup_items (namespace, created)')
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS dedup_buckets ('
+            'bucket INTEGER NOT NULL, item INTEGER NOT NULL, '
+            'PRIMARY KEY (bucket, item)) WITHOUT ROWID'
+        )
+
+    def _connect(self):
+        # One connection per thread and per process (see session_store.py).
+        # Autocommit mode, so transactions are begun explicitly.
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _fingerprint(self, namespace, text):
+        config = self.namespaces[namespace]
+        sig = signature(shingles(text, config['shingle']))
+        return exact_key(namespace, text), sig, band_keys(namespace, sig)
+
+    def _find(self, conn, namespace, exact, sig, keys):
+        # Returns (kind, similarity) of the closest stored item: 'exact',
+        # 'near' or None
+        threshold = self.namespaces[namespace]['threshold']
+        if conn.execute('SELECT 1 FROM dedup_items WHERE exact = ? LIMIT 1', (exact,)).fetchone():
+            return 'exact', 1.0
+        placeholders = ','.join('?' * len(keys))
+        rows = conn.execute(
+            f'SELECT signature FROM dedup_items WHERE id IN '
+            f'(SELECT DISTINCT item FROM dedup_buckets WHERE bucket IN ({placeholders}))',
+            keys,
+        ).fetchall()
+        best = 0.0
+        for (blob,) in rows:
+            stored = array('I')
+            stored.frombytes(blob)
+            best = max(best, similarity(sig, stored))
+        return ('near' if best >= threshold else None), best
+
+    def check(self, namespace, text):
+        # True if the text duplicates a stored item; doesn't store it
+        exact, sig, keys = self._fingerprint(namespace, text)
+        started = time.perf_counter()
+        kind, _ = self._find(self._connect(), namespace, exact, sig, keys)
+        self._record(namespace, kind, started, added=False)
+        return kind is not None
+
+    def add(self, namespace, text):
+        # Stores the text unless it duplicates a stored item; returns True if
+        # it was new. The lookup and insert are one transaction, so two
+        # workers can't both add the same item.
+        exact, sig, keys = self._fingerprint(namespace, text)
+        started = time.perf_counter()
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            kind, _ = self._find(conn, namespace, exact, sig, keys)
+            if kind is None:
+                cursor = conn.execute(
+                    'INSERT INTO dedup_items (namespace, exact, signature, created) VALUES (?, ?, ?, ?)',
+                    (namespace, exact, sig.tobytes(), time.time()),
+                )
+                conn.executemany(
+                    'INSERT OR IGNORE INTO dedup_buckets (bucket, item) VALUES (?, ?)',
+                    [(key, cursor.lastrowid) for key in keys],
+                )
+            conn.execute('COMMIT')
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            raise
+        self._record(namespace, kind, started, added=kind is None)
+        if kind is None and self._adds_since_prune >= self.prune_every:
+            self.prune()
+        return kind is None
+
+    def _record(self, namespace, kind, started, added):
+        with self._lock:
+            counters = self._counters[namespace]
+            counters['checked'] += 1
+            if kind is not None:
+                counters[kind] += 1
+            if added:
+                counters['added'] += 1
+                self._adds_since_prune += 1
+            self._lookups += 1
+            self._lookup_seconds += time.perf_counter() - started
+
+    def filter(self, namespace, items, text_of):
+        # The items whose text isn't a duplicate, adding them to the index.
+        # Storage errors let everything through.
+        fresh = []
+        for item in items:
+            try:
+                if not self.add(namespace, text_of(item)):
+                    continue
+            except sqlite3.Error as e:
+                print(f"Error checking for duplicates: {str(e)}")
+            fresh.append(item)
+        return fresh
+
+    def prune(self):
+        with self._lock:
+            self._adds_since_prune = 0
+        now = time.time()
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            for namespace, config in self.namespaces.items():
+                rows = conn.execute(
+                    'SELECT id, signature FROM dedup_items WHERE namespace = ? AND created < ?',
+                    (namespace, now - config['max_age']),
+                ).fetchall()
+                # Bucket rows are found again from the stored signatures
+                buckets = []
+                for item, blob in rows:
+                    sig = array('I')
+                    sig.frombytes(blob)
+                    buckets.extend((key, item) for key in band_keys(namespace, sig))
+                conn.executemany('DELETE FROM dedup_buckets WHERE bucket = ? AND item = ?', buckets)
+                conn.executemany('DELETE FROM dedup_items WHERE id = ?', [(item,) for item, _ in rows])
+            conn.execute('COMMIT')
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            raise
+
+    def stats(self):
+        with self._lock:
+            stats = {namespace: dict(counters) for namespace, counters in self._counters.items()}
+            stats['lookup_ms'] = round(self._lookup_seconds / self._lookups * 1000, 3) if self._lookups else None
+        try:
+            stats['items'] = dict(self._connect().execute(
+                'SELECT namespace, COUNT(*) FROM dedup_items GROUP BY namespace').fetchall())
+        except sqlite3.Error as e:
+            print(f"Error reading dedup index: {str(e)}")
+        return stats
@@ -17,6 +17,10 @@ document.addEventListener('DOMContentLoaded', function() {
     const impactSummaryElement = document.getElementById('impact-summary');
     const playAgainBtn = document.getElementById('play-again-btn');
     const shareResultBtn = document.getElementById('share-result-btn');
+    const saveScoreBtn = document.getElementById('save-score-btn');
+    const playerNameInput = document.getElementById('player-name');
+    const playerRankElement = document.getElementById('player-rank');
+    const leaderboardList = document.getElementById('leaderboard-list');
     const hintModal = document.getElementById('hint-modal');
     const hintText = document.getElementById('hint-text');
     const closeModal = document.querySelector('.close-modal');
@@ -28,6 +32,9 @@ document.addEventListener('DOMContentLoaded', function() {
     let gameHistory = [];
     let scenariosData = [];
     let choiceSelected = false;
+    // Ticket for the next adventure, which the server prepares while this
+    // one is played
+    let nextRoundTicket = null;
 
     // Event Listeners
     startBtn.addEventListener('click', startGame);
@@ -35,6 +42,7 @@ document.addEventListener('DOMContentLoaded', function() {
     restartBtn.addEventListener('click', restartGame);
     playAgainBtn.addEventListener('click', restartGame);
     shareResultBtn.addEventListener('click', shareResults);
+    saveScoreBtn.addEventListener('click', saveScore);
     closeModal.addEventListener('click', () => {
         hintModal.classList.add('hidden');
         document.body.style.overflow = '';
@@ -51,7 +59,15 @@ document.addEventListener('DOMContentLoaded', function() {
     // Start the game
     // Add this near the top of your file with other variable declarations
     let scenarios = [];
+    let scenarioById = new Map();
     let useFallbackScenarios = false;
+
+    // Index the adventure once so each choice is a single lookup. Server
+    // adventures are numbered 1..n and every path ends at id n + 1.
+    function setScenarios(list) {
+        scenarios = list;
+        scenarioById = new Map(list.map(s => [s.id, s]));
+    }
     
     // Modify your startGame function to fetch scenarios
     function startGame() {
@@ -65,8 +81,12 @@ document.addEventListener('DOMContentLoaded', function() {
         ecoPointsElement.textContent = ecoPoints;
         currentChapterElement.textContent = currentChapter;
         
-        // Fetch scenarios from the API
-        fetch('/get_scenarios')
+        // Fetch this adventure, or the prepared one on a replay
+        fetch('/game_session', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ game: 'eco_adventure', ticket: nextRoundTicket })
+        })
             .then(response => {
                 if (!response.ok) {
                     throw new Error('Network response was not ok');
@@ -74,21 +94,23 @@ document.addEventListener('DOMContentLoaded', function() {
                 return response.json();
             })
             .then(data => {
-                scenarios = data;
+                nextRoundTicket = data.ticket;
+                setScenarios(data.round);
                 console.log('Loaded scenarios:', scenarios);
                 
-                // Simulate loading for better UX (minimum 1.5 seconds)
+                // Simulate loading for better UX (minimum 1.5 seconds), but
+                // not when the adventure was ready in advance
                 setTimeout(() => {
                     loadingScreen.classList.add('hidden');
                     gameScreen.classList.remove('hidden');
                     loadScenario(1); // Start with the first scenario
-                }, 1500);
+                }, data.prefetched ? 0 : 1500);
             })
             .catch(error => {
                 console.error('Error fetching scenarios:', error);
                 // Fall back to local scenarios if API fails
                 useFallbackScenarios = true;
-                scenarios = getFallbackScenarios();
+                setScenarios(getFallbackScenarios());
                 
                 setTimeout(() => {
                     loadingScreen.classList.add('hidden');
@@ -101,7 +123,7 @@ document.addEventListener('DOMContentLoaded', function() {
     // Update your loadScenario function to use the fetched scenarios
     function loadScenario(scenarioId) {
         // Find the scenario with the matching ID
-        currentScenario = scenarios.find(s => s.id === scenarioId);
+        currentScenario = scenarioById.get(scenarioId);
         
         if (!currentScenario) {
             // If we can't find the scenario, end the game
@@ -200,8 +222,8 @@ document.addEventListener('DOMContentLoaded', function() {
                 continueBtn.addEventListener('click', () => {
                     currentChapter++;
                     
-                    // Check if we've reached the chapter limit (10)
-                    if (currentChapter > 10) {
+                    // The adventure ends at the terminal node
+                    if (!scenarioById.has(choice.next)) {
                         endGame();
                     } else {
                         loadScenario(choice.next);
@@ -215,8 +237,8 @@ document.addEventListener('DOMContentLoaded', function() {
             setTimeout(() => {
                 currentChapter++;
                 
-                // Check if we've reached the chapter limit (10)
-                if (currentChapter > 10) {
+                // The adventure ends at the terminal node
+                if (!scenarioById.has(choice.next)) {
                     endGame();
                 } else {
                     loadScenario(choice.next);
@@ -275,6 +297,7 @@ document.addEventListener('DOMContentLoaded', function() {
         endingScreen.classList.remove('hidden');
         
         finalEcoPointsElement.textContent = ecoPoints;
+        showLeaderboard();
         
         // Determine ending based on eco points
         let endingMessage, impactSummary;
@@ -409,6 +432,69 @@ document.addEventListener('DOMContentLoaded', function() {
         }, 100);
     }
 
+    // Leaderboard: load the top scores and let the player save theirs
+    function showLeaderboard() {
+        saveScoreBtn.disabled = false;
+        playerNameInput.value = localStorage.getItem('playerName') || '';
+        playerRankElement.textContent = '';
+        leaderboardList.innerHTML = '';
+        
+        fetch('/leaderboard?game=eco_adventure&difficulty=normal')
+            .then(response => {
+                if (!response.ok) {
+                    throw new Error('Network response was not ok');
+                }
+                return response.json();
+            })
+            .then(data => renderLeaders(data.leaders))
+            .catch(error => console.error('Error loading leaderboard:', error));
+    }
+    
+    function saveScore() {
+        const name = playerNameInput.value.trim();
+        localStorage.setItem('playerName', name);
+        saveScoreBtn.disabled = true;
+        
+        fetch('/scores', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ game: 'eco_adventure', difficulty: 'normal', name: name, score: ecoPoints })
+        })
+            .then(response => {
+                if (!response.ok) {
+                    throw new Error('Network response was not ok');
+                }
+                return response.json();
+            })
+            .then(result => {
+                playerRankElement.textContent = result.improved ?
+                    `You are ranked #${result.rank} of ${result.players} players!` :
+                    `Your best score of ${result.score} is ranked #${result.rank} of ${result.players}.`;
+                renderLeaders(result.leaders, result.rank);
+            })
+            .catch(error => {
+                console.error('Error saving score:', error);
+                saveScoreBtn.disabled = false;
+                showToast('Could not save your score');
+            });
+    }
+    
+    function renderLeaders(leaders, myRank) {
+        leaderboardList.innerHTML = '';
+        leaders.forEach(entry => {
+            const item = document.createElement('li');
+            if (entry.rank === myRank) {
+                item.classList.add('me');
+            }
+            const name = document.createElement('span');
+            name.textContent = entry.name;
+            const points = document.createElement('span');
+            points.textContent = entry.score;
+            item.append(name, points);
+            leaderboardList.appendChild(item);
+        });
+    }
+    
     // Share results on social media or copy to clipboard
     function shareResults() {
         const text = `I scored ${ecoPoints} Eco-Points in the Eco-Adventure game! My environmental choices led me to become a ${getPlayerTitle()}. How eco-friendly are your choices? Play now and find out!`;
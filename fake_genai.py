@@ -0,0 +1,218 @@
+import json
+import os
+import random
+import sys
+import threading
+import time
+import types
+
+# Local stand-in for google.generativeai, used by benchmark.py and for
+# running the app without network access or an API key.
+#
+# install() registers this module as google.generativeai, so it must run
+# before chatbot is imported. Behaviour is controlled by environment
+# variables, read on every call:
+#
+#   FAKE_GENAI_LATENCY        seconds per generate_content call (default 0.5)
+#   FAKE_GENAI_JITTER         +/- random seconds added to the latency (default 0.1)
+#   FAKE_GENAI_FAILURE_RATE   fraction of calls that raise (default 0)
+#   FAKE_GENAI_RESPONSE_SIZE  items per generated batch (default 10); chat
+#                             replies are about 20 words per item
+#
+# Content is picked from the prompt: quiz questions, adventure scenarios and
+# word lists come back as JSON in the shape the real model is asked for
+# (sometimes wrapped in markdown fences), anything else gets a chat reply.
+
+TOPICS = ['solar power', 'composting', 'wetlands', 'ocean plastic', 'carbon capture',
+          'urban heat islands', 'drip irrigation', 'coral reefs', 'wind farms', 'rewilding']
+WORDS = ['SOLAR', 'GREEN', 'WATER', 'CARBON', 'FOREST', 'COMPOST', 'CLIMATE', 'WETLAND',
+         'ECOLOGY', 'BIOFUEL', 'RENEWABLE', 'GEOTHERMAL', 'MANGROVE', 'PERMAFROST',
+         'WATERSHED', 'UPCYCLING', 'BIOMASS', 'HABITAT', 'GREEN ROOF', 'E-WASTE']
+ENVIRONMENTS = ['forest', 'ocean', 'urban', 'desert']
+
+_lock = threading.Lock()
+calls = {'total': 0, 'failed': 0, 'streamed': 0}
+
+
+class FakeGenAIError(Exception):
+    pass
+
+
+def _setting(name, default):
+    return float(os.getenv(name, default))
+
+
+def _sleep():
+    latency = _setting('FAKE_GENAI_LATENCY', 0.5)
+    jitter = _setting('FAKE_GENAI_JITTER', 0.1)
+    delay = max(0.0, latency + random.uniform(-jitter, jitter))
+    time.sleep(delay)
+    return delay
+
+
+def _fenced(payload):
+    text = json.dumps(payload, indent=2)
+    return f"```json\n{text}\n```" if random.random() < 0.5 else text
+
+
+def _questions(size):
+    return _fenced([
+        {
+            "question": f"Which statement about {random.choice(TOPICS)} is true? (#{random.randrange(10 ** 9)})",
+            "options": ["It saves water", "It reduces emissions", "It protects habitats", "All of the above"],
+            "correct_answer": random.choice('ABCD'),
+            "explanation": "Sustainable practices usually have several overlapping benefits.",
+        }
+        for _ in range(size)
+    ])
+
+
+def _scenarios(size):
+    scenarios = []
+    for scenario_id in range(1, size + 1):
+        scenarios.append({
+            "id": scenario_id,
+            "description": f"<p>You encounter a problem involving {random.choice(TOPICS)}.</p><p>What do you do?</p>",
+            "environment": random.choice(ENVIRONMENTS),
+            "hint": "Think about long-term impact as well as the immediate fix.",
+            "choices": [
+                {
+                    "id": f"{scenario_id}{letter}",
+                    "text": f"Option {letter}",
+                    "points": points,
+                    "feedback": "Here is how that choice affects the environment.",
+                    "next": scenario_id + 1,
+                }
+                for letter, points in zip('ABC', (15, 5, -10))
+            ],
+        })
+    return _fenced(scenarios)
+
+
+def _words(size):
+    return _fenced([
+        {"word": random.choice(WORDS), "hint": "A sustainability term"}
+        for _ in range(size * 2)
+    ])
+
+
+def _chat(size):
+    sentence = "Sustainability means meeting our needs without compromising future generations. "
+    return sentence * max(1, size * 2)
+
+
+def _prompt_text(contents):
+    if isinstance(contents, str):
+        return contents
+    return json.dumps(contents, default=str)
+
+
+def _respond(contents):
+    size = int(_setting('FAKE_GENAI_RESPONSE_SIZE', 10))
+    prompt = _prompt_text(contents)
+    if 'multiple-choice questions' in prompt:
+        return _questions(size)
+    if 'adventure game' in prompt:
+        return _scenarios(size)
+    if 'sustainability-related words' in prompt:
+        return _words(size)
+    return _chat(size)
+
+
+class GenerateContentResponse:
+    def __init__(self, text, chunks=None):
+        self.text = text
+        self._chunks = chunks
+
+    def __iter__(self):
+        for chunk in self._chunks or [self.text]:
+            yield GenerateContentResponse(chunk)
+
+    def resolve(self):
+        pass
+
+
+class _StreamingIterator:
+    # Mirrors the cancel() hook of the SDK's streaming iterator
+    def __init__(self, chunks, delay):
+        self._chunks = chunks
+        self._delay = delay
+        self.cancelled = False
+
+    def __iter__(self):
+        for chunk in self._chunks:
+            if self.cancelled:
+                return
+            time.sleep(self._delay)
+            yield GenerateContentResponse(chunk)
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class StreamingResponse:
+    def __init__(self, text):
+        chunks = [text[i:i + 40] for i in range(0, len(text), 40)] or ['']
+        latency = _setting('FAKE_GENAI_LATENCY', 0.5)
+        self._iterator = _StreamingIterator(chunks, latency * 0.8 / len(chunks))
+
+    def __iter__(self):
+        return iter(self._iterator)
+
+    def resolve(self):
+        pass
+
+
+class GenerativeModel:
+    def __init__(self, model_name='gemini-1.5-flash', system_instruction=None,
+                 generation_config=None, safety_settings=None, **kwargs):
+        self.model_name = model_name
+        self.system_instruction = system_instruction
+        self.generation_config = generation_config
+        self.safety_settings = safety_settings
+
+    def generate_content(self, contents, stream=False, **kwargs):
+        with _lock:
+            calls['total'] += 1
+            if stream:
+                calls['streamed'] += 1
+
+        if stream:
+            # Time to first chunk is a fraction of the full latency
+            time.sleep(_setting('FAKE_GENAI_LATENCY', 0.5) * 0.2)
+        else:
+            _sleep()
+
+        if random.random() < _setting('FAKE_GENAI_FAILURE_RATE', 0):
+            with _lock:
+                calls['failed'] += 1
+            raise FakeGenAIError("Simulated upstream failure")
+
+        text = _respond(contents)
+        if stream:
+            return StreamingResponse(text)
+        return GenerateContentResponse(text)
+
+    def count_tokens(self, contents):
+        return types.SimpleNamespace(total_tokens=len(_prompt_text(contents)) // 4 + 1)
+
+
+def configure(api_key=None, **kwargs):
+    pass
+
+
+def install():
+    # Make `import google.generativeai` resolve to this module
+    module = sys.modules[__name__]
+    google = sys.modules.get('google')
+    if google is None:
+        try:
+            import google
+        except ImportError:
+            google = types.ModuleType('google')
+            google.__path__ = []
+            sys.modules['google'] = google
+    google.generativeai = module
+    sys.modules['google.generativeai'] = module
+    os.environ.setdefault('GEMINI_API_KEY', 'fake-key')
+    return module
@@ -0,0 +1,161 @@
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+# Game rounds with the next round prepared in the background.
+#
+# Starting a round returns its content plus a ticket for the following round,
+# which a small thread pool starts building straight away, while the player
+# is still playing. "Play again" hands the ticket back and gets the prepared
+# content without waiting for Gemini. A ticket that is still being built is
+# waited for (up to `wait_timeout`), since the build is already under way.
+# A ticket only works for the session and round parameters it was issued
+# for; anything else (unknown, expired, other difficulty) builds the round
+# on the spot. Builders get the round's number in the session (0 for a
+# round built without a ticket), so they can vary what they prepare from one
+# round to the next. Builders only pick content; an optional `on_serve` hook per
+# game records it (say, as seen by the session) once the round is actually
+# served, so rounds prepared for tickets that are never used cost nothing.
+#
+# Tickets are held in memory per process, at most `max_tickets`, oldest
+# dropped first, and expire `ttl` seconds after they were issued. Each
+# session keeps one ticket per game: a new round replaces the previous
+# ticket. With several gunicorn workers, a replay answered by another worker
+# than the one holding its ticket builds the round normally.
+
+
+class _Ticket:
+    __slots__ = ('game', 'params', 'owner', 'number', 'future', 'created')
+
+    def __init__(self, game, params, owner, number, future, created):
+        self.game = game
+        self.params = params
+        self.owner = owner
+        self.number = number
+        self.future = future
+        self.created = created
+
+
+class RoundPrefetcher:
+    def __init__(self, builders, on_serve=None, max_tickets=2000, ttl=600, workers=4, wait_timeout=30):
+        # builders: game -> fn(params, session_id, round_number) returning a
+        # round's content; on_serve: game -> fn(content, session_id)
+        self.builders = builders
+        self.on_serve = on_serve or {}
+        self.max_tickets = max_tickets
+        self.ttl = ttl
+        self.workers = workers
+        self.wait_timeout = wait_timeout
+
+        self._tickets = OrderedDict()  # ticket id -> _Ticket, oldest first
+        self._by_owner = {}  # (session id, game) -> ticket id
+        self._executor = None
+        self._executor_pid = None
+        self._lock = threading.Lock()
+        self._counters = {'issued': 0, 'ready': 0, 'waited': 0, 'missed': 0, 'failed': 0,
+                          'expired': 0, 'evicted': 0, 'replaced': 0}
+
+    def _pool(self):
+        # Threads don't survive a fork; each gunicorn worker starts its own.
+        # Must be called with self._lock held.
+        if self._executor is None or self._executor_pid != os.getpid():
+            if self._executor_pid is not None and self._executor_pid != os.getpid():
+                # Tickets issued before the fork point at the parent's threads
+                self._tickets.clear()
+                self._by_owner.clear()
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='round-prefetch')
+            self._executor_pid = os.getpid()
+        return self._executor
+
+    def _drop(self, ticket_id, counter):
+        # Must be called with self._lock held
+        ticket = self._tickets.pop(ticket_id)
+        if self._by_owner.get((ticket.owner, ticket.game)) == ticket_id:
+            del self._by_owner[(ticket.owner, ticket.game)]
+        ticket.future.cancel()
+        self._counters[counter] += 1
+
+    def build(self, game, params, session_id, round_number=0):
+        return self.builders[game](params, session_id, round_number)
+
+    def issue(self, game, params, session_id, round_number=1):
+        # Start preparing round `round_number`; returns its ticket
+        ticket_id = secrets.token_urlsafe(16)
+        now = time.time()
+        with self._lock:
+            future = self._pool().submit(self.build, game, params, session_id, round_number)
+            previous = self._by_owner.get((session_id, game))
+            if previous is not None:
+                self._drop(previous, 'replaced')
+            self._tickets[ticket_id] = _Ticket(game, params, session_id, round_number, future, now)
+            self._by_owner[(session_id, game)] = ticket_id
+            self._counters['issued'] += 1
+
+            while self._tickets:
+                oldest_id, oldest = next(iter(self._tickets.items()))
+                if now - oldest.created > self.ttl:
+                    self._drop(oldest_id, 'expired')
+                elif len(self._tickets) > self.max_tickets:
+                    self._drop(oldest_id, 'evicted')
+                else:
+                    break
+        return ticket_id
+
+    def redeem(self, ticket_id, game, params, session_id):
+        # (round number, prepared content) for a ticket, or None if the round
+        # has to be built now
+        if not ticket_id:
+            return None
+        with self._lock:
+            ticket = self._tickets.get(ticket_id)
+            if (ticket is None or ticket.owner != session_id or ticket.game != game
+                    or ticket.params != params):
+                self._counters['missed'] += 1
+                return None
+            self._tickets.pop(ticket_id)
+            if self._by_owner.get((session_id, game)) == ticket_id:
+                del self._by_owner[(session_id, game)]
+            if time.time() - ticket.created > self.ttl:
+                ticket.future.cancel()
+                self._counters['expired'] += 1
+                return None
+            self._counters['ready' if ticket.future.done() else 'waited'] += 1
+
+        try:
+            return ticket.number, ticket.future.result(timeout=self.wait_timeout)
+        except FutureTimeoutError:
+            print(f"Prefetched {game} round not ready after {self.wait_timeout}s")
+        except Exception as e:
+            print(f"Error prefetching {game} round: {str(e)}")
+        with self._lock:
+            self._counters['failed'] += 1
+        return None
+
+    def start(self, game, params, session_id, ticket_id=None, prefetch=True):
+        # (content of this round, whether it was prefetched, ticket for the
+        # next one or None with prefetch=False)
+        redeemed = self.redeem(ticket_id, game, params, session_id)
+        prefetched = redeemed is not None
+        if prefetched:
+            round_number, content = redeemed
+        else:
+            round_number, content = 0, self.build(game, params, session_id)
+        # Recorded before the next round is picked, so it can't repeat this one
+        if game in self.on_serve:
+            self.on_serve[game](content, session_id)
+        if not prefetch:
+            return content, prefetched, None
+        return content, prefetched, self.issue(game, params, session_id, round_number + 1)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats['tickets'] = len(self._tickets)
+            stats['building'] = sum(1 for ticket in self._tickets.values() if not ticket.future.done())
+            redeemed = stats['ready'] + stats['waited']
+            attempts = redeemed + stats['missed']
+            stats['hit_rate'] = round(redeemed / attempts, 3) if attempts else None
+        return stats
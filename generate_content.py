@@ -0,0 +1,321 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# Offline bulk generation of game content.
+#
+# Calls Gemini with the same prompts and models the web app uses, from a
+# pool of worker threads that share one rate limit (an UpstreamClient, so
+# calls also get deadlines, retries and a circuit breaker). The workers
+# only call the model and parse the JSON. Each batch then goes through
+# validation (the same checks the pools and the adventure compiler apply)
+# and near-duplicate filtering (dedup_index.py, seeded with the base content
+# bank), in the main thread. Accepted items are appended to
+# <output>.partial as they arrive. An interrupted run picks up from there:
+# run the same command again.
+#
+# When every target is met, or generation stops producing anything new, the
+# base bank and the new items are written to --output with a meta record
+# carrying the next version number. Point CONTENT_BANK_PATH at that file to
+# serve it.
+#
+#   python generate_content.py --questions 500 --words 1000 --scenarios 200
+#   python generate_content.py --fake --questions 50 --output /tmp/bank.jsonl
+
+KINDS = ('question', 'word', 'scenario')
+# Model (and upstream endpoint) used for each kind
+ENDPOINTS = {'question': 'questions', 'word': 'words', 'scenario': 'scenarios'}
+
+
+def load_records(path):
+    # (meta record or None, list of content records) from a JSONL bank
+    meta, records = None, []
+    if not path or not os.path.exists(path):
+        return meta, records
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A line cut short by a crash
+                continue
+            if record.get('type') == 'meta':
+                meta = record
+            elif record.get('type') in KINDS:
+                records.append(record)
+    return meta, records
+
+
+def dedup_text(record):
+    # The text a record is fingerprinted by, as the web app does
+    from question_pool import question_key
+    if record['type'] == 'question':
+        return question_key(record)
+    if record['type'] == 'word':
+        return record['word']
+    return record['description']
+
+
+def to_records(kind, items):
+    # Validate parsed items and convert them to content bank records.
+    # Returns (records, rejected count).
+    from question_pool import is_valid_question
+    from scenario_graph import ScenarioGraphError, compile_adventure
+    from word_pool import clean_word
+
+    if kind == 'question':
+        records = [
+            {
+                'type': 'question', 'topic': 'general', 'difficulty': 'medium',
+                'question': item['question'].strip(), 'options': item['options'],
+                'correct_answer': item['correct_answer'], 'explanation': item.get('explanation', ''),
+            }
+            for item in items if is_valid_question(item)
+        ]
+    elif kind == 'word':
+        records = []
+        for item in items:
+            cleaned = clean_word(item)
+            if cleaned is not None:
+                records.append({'type': 'word', 'word': cleaned['word'], 'hint': cleaned['hint'],
+                                'topic': 'general'})
+    else:
+        try:
+            scenarios = compile_adventure(items).scenarios
+        except ScenarioGraphError:
+            scenarios = []
+        records = [
+            {
+                'type': 'scenario', 'environment': scenario['environment'], 'topic': 'general',
+                'description': scenario['description'], 'hint': scenario['hint'],
+                'choices': [{'text': choice['text'], 'points': choice['points'], 'feedback': choice['feedback']}
+                            for choice in scenario['choices']],
+            }
+            for scenario in scenarios
+        ]
+    return records, len(items) - len(records)
+
+
+class Pipeline:
+    def __init__(self, args):
+        from dedup_index import DedupIndex
+        from model_registry import models
+        from upstream import UpstreamClient
+
+        self.args = args
+        self.models = models
+        self.targets = {'question': args.questions, 'word': args.words, 'scenario': args.scenarios}
+        self.partial_path = args.output + '.partial'
+        self.upstream = UpstreamClient(
+            deadlines={'questions': 60, 'scenarios': 90, 'words': 60},
+            max_retries=args.max_retries,
+            max_concurrency=args.workers,
+            rate_per_minute=args.rate_per_minute,
+        )
+
+        self.base_meta, self.base_records = load_records(args.base)
+        _, self.new_records = load_records(self.partial_path)
+        self.have = {kind: 0 for kind in KINDS}
+        for record in self.new_records:
+            self.have[record['type']] += 1
+
+        # The fingerprint index is rebuilt from the base bank and the
+        # checkpoint on every start, so it always matches what was written
+        dedup_path = args.output + '.dedup.db'
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(dedup_path + suffix):
+                os.remove(dedup_path + suffix)
+        self.dedup_path = dedup_path
+        self.dedup = DedupIndex(dedup_path)
+        for record in self.base_records + self.new_records:
+            self.dedup.add(record['type'], dedup_text(record))
+
+        self.stats = {kind: {'calls': 0, 'failed': 0, 'parsed': 0, 'invalid': 0, 'duplicates': 0,
+                             'accepted': 0} for kind in KINDS}
+        # Consecutive calls per kind that added nothing new
+        self.stale = {kind: 0 for kind in KINDS}
+        # Running estimate of new items per call, used to decide how many
+        # calls to keep in flight
+        self.yield_per_call = {kind: 10.0 for kind in KINDS}
+
+    def prompt(self, kind):
+        from prompts import QUESTIONS_PROMPT, SCENARIOS_PROMPT, words_prompt
+        if kind == 'question':
+            return QUESTIONS_PROMPT
+        if kind == 'word':
+            return words_prompt(self.args.word_batch)
+        return SCENARIOS_PROMPT
+
+    def call(self, kind):
+        # Runs in a worker thread: one model call, parsed
+        from structured_output import QUESTION_SCHEMA, SCENARIO_SCHEMA, WORD_SCHEMA, parse_items
+        schema = {'question': QUESTION_SCHEMA, 'word': WORD_SCHEMA, 'scenario': SCENARIO_SCHEMA}[kind]
+        endpoint = ENDPOINTS[kind]
+        response = self.upstream.generate(endpoint, self.models.get(endpoint), self.prompt(kind))
+        return parse_items(response.text, schema)
+
+    def remaining(self, kind):
+        return max(0, self.targets[kind] - self.have[kind])
+
+    def active(self, kind):
+        return self.remaining(kind) > 0 and self.stale[kind] < self.args.patience
+
+    def run(self):
+        calls = sum(stats['calls'] for stats in self.stats.values())
+        in_flight = {}  # future -> kind
+        with ThreadPoolExecutor(max_workers=self.args.workers) as executor, \
+                open(self.partial_path, 'a', encoding='utf-8') as checkpoint:
+            while True:
+                # Keep the workers busy with the kinds that still need items,
+                # without asking for much more than is missing
+                for kind in KINDS:
+                    while (self.active(kind) and len(in_flight) < self.args.workers
+                           and calls < self.args.max_calls):
+                        pending = sum(1 for pending_kind in in_flight.values() if pending_kind == kind)
+                        if pending * self.yield_per_call[kind] >= self.remaining(kind):
+                            break
+                        in_flight[executor.submit(self.call, kind)] = kind
+                        calls += 1
+                if not in_flight:
+                    break
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    kind = in_flight.pop(future)
+                    self.collect(kind, future, checkpoint)
+
+    def collect(self, kind, future, checkpoint):
+        stats = self.stats[kind]
+        stats['calls'] += 1
+        try:
+            items = future.result()
+        except Exception as e:
+            stats['failed'] += 1
+            self.stale[kind] += 1
+            print(f"[{kind}] call failed: {str(e)}")
+            return
+
+        stats['parsed'] += len(items)
+        records, invalid = to_records(kind, items)
+        stats['invalid'] += invalid
+        accepted = 0
+        for record in records:
+            if self.remaining(kind) == 0:
+                break
+            if not self.dedup.add(kind, dedup_text(record)):
+                stats['duplicates'] += 1
+                continue
+            checkpoint.write(json.dumps(record, ensure_ascii=False) + '\n')
+            self.new_records.append(record)
+            self.have[kind] += 1
+            accepted += 1
+        checkpoint.flush()
+        os.fsync(checkpoint.fileno())
+
+        stats['accepted'] += accepted
+        self.stale[kind] = 0 if accepted else self.stale[kind] + 1
+        self.yield_per_call[kind] = max(1.0, 0.7 * self.yield_per_call[kind] + 0.3 * accepted)
+        print(f"[{kind}] +{accepted} ({self.have[kind]}/{self.targets[kind]}), "
+              f"{invalid} invalid, {len(records) - accepted} duplicate or surplus")
+
+    def write_output(self):
+        version = self.args.version or ((self.base_meta or {}).get('version') or 0) + 1
+        counts = {kind + 's': 0 for kind in KINDS}
+        for record in self.base_records + self.new_records:
+            counts[record['type'] + 's'] += 1
+        meta = {
+            'type': 'meta',
+            'version': version,
+            'generated_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'base_version': (self.base_meta or {}).get('version'),
+            'counts': counts,
+        }
+        temporary = self.args.output + '.tmp'
+        with open(temporary, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(meta, separators=(',', ':')) + '\n')
+            for record in self.base_records + self.new_records:
+                f.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n')
+        os.replace(temporary, self.args.output)
+        return meta
+
+    def cleanup(self):
+        os.remove(self.partial_path)
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(self.dedup_path + suffix):
+                os.remove(self.dedup_path + suffix)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate game content in bulk for the content bank')
+    parser.add_argument('--questions', type=int, default=0, help='New quiz questions to generate')
+    parser.add_argument('--words', type=int, default=0, help='New word game words to generate')
+    parser.add_argument('--scenarios', type=int, default=0, help='New adventure scenarios to generate')
+    parser.add_argument('--output', default='content_bank.generated.jsonl')
+    parser.add_argument('--base', default=os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                       'content_bank.jsonl'),
+                        help="Existing bank to extend; pass '' to write only new content")
+    parser.add_argument('--version', type=int, help='Version for the output (default: base version + 1)')
+    parser.add_argument('--workers', type=int, default=8, help='Concurrent model calls')
+    parser.add_argument('--rate-per-minute', type=int, default=60, help='Model calls per minute, all workers together')
+    parser.add_argument('--max-retries', type=int, default=2)
+    parser.add_argument('--max-calls', type=int, default=1000, help='Stop after this many model calls')
+    parser.add_argument('--patience', type=int, default=5,
+                        help='Give up on a kind after this many calls in a row add nothing new')
+    parser.add_argument('--word-batch', type=int, default=60, help='Words requested per call')
+    parser.add_argument('--fake', action='store_true', help='Use the local fake model (fake_genai.py)')
+    args = parser.parse_args()
+
+    if not (args.questions or args.words or args.scenarios):
+        parser.error('nothing to generate: pass --questions, --words and/or --scenarios')
+
+    if args.fake:
+        import fake_genai
+        fake_genai.install()
+    else:
+        try:
+            from dotenv import load_dotenv
+            load_dotenv()
+        except ImportError:
+            pass
+        if not os.getenv('GEMINI_API_KEY'):
+            parser.error('GEMINI_API_KEY is not set (use --fake to try the pipeline without it)')
+
+    pipeline = Pipeline(args)
+    if pipeline.new_records:
+        print(f"Resuming from {pipeline.partial_path}: "
+              + ', '.join(f"{pipeline.have[kind]} {kind}s" for kind in KINDS))
+
+    started = time.perf_counter()
+    try:
+        pipeline.run()
+    except KeyboardInterrupt:
+        print(f"\nInterrupted; progress is saved in {pipeline.partial_path}. Run the same command to resume.")
+        sys.exit(130)
+    elapsed = time.perf_counter() - started
+
+    print(f"\nFinished in {elapsed:.1f}s")
+    for kind in KINDS:
+        stats = pipeline.stats[kind]
+        if pipeline.targets[kind]:
+            print(f"  {kind + 's':<10} {pipeline.have[kind]}/{pipeline.targets[kind]}  "
+                  + '  '.join(f"{name}={value}" for name, value in stats.items()))
+
+    short = [kind for kind in KINDS if pipeline.remaining(kind)]
+    if short:
+        print("Targets not met for " + ', '.join(kind + 's' for kind in short)
+              + " (model stopped producing new items or --max-calls was reached)")
+
+    meta = pipeline.write_output()
+    pipeline.cleanup()
+    print(f"Wrote {args.output} (version {meta['version']}): "
+          + ', '.join(f"{count} {name}" for name, count in meta['counts'].items()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,31 @@
+import os
+
+# Gunicorn settings used by Render (render.yaml) and the Procfile.
+#
+# Almost all of the time spent serving /chat, /get_questions, /get_scenarios
+# and /get_words is waiting on Gemini over the network. With the default
+# sync worker every in-flight model call pins a whole process, so the app can
+# only serve as many concurrent requests as it has workers. The threaded
+# worker gives each process a pool of threads instead; a thread blocked on
+# network I/O releases the GIL, so one process can hold many upstream calls
+# open at once while sharing its in-memory pools and caches between them.
+#
+# Capacity is roughly workers * threads concurrent requests. Tune with the
+# environment variables below; see load_test.py for measuring it.
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+# One process by default: chat history (CHAT_SESSION_STORE=memory), the answer
+# cache, in-flight generations and next-round tickets are per process, and
+# threads already provide the concurrency. Use more workers only with the
+# SQLite session store.
+workers = int(os.getenv('WEB_CONCURRENCY', 1))
+threads = int(os.getenv('GUNICORN_THREADS', 64))
+
+# Streaming chat replies and cold content generation can take a while
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 120))
+graceful_timeout = 30
+keepalive = 5
+
+accesslog = '-'
@@ -0,0 +1,278 @@
+import bisect
+import os
+import sqlite3
+import threading
+import time
+
+# Persistent game leaderboards.
+#
+# Each board (game, difficulty) keeps every player's best score. Scores are
+# bounded integers (see GAMES), so a board counts players per score value in
+# a Fenwick tree: a player's rank is one prefix sum, O(log range) however
+# many players there are. The best `top_k` entries are kept in a sorted list
+# that is updated on each improvement, so a top-K read is a slice.
+#
+# SQLite is the source of truth. Submissions update the in-memory board at
+# once and are written in batches by a background thread every
+# `flush_interval` seconds, or sooner once `batch_size` are pending. The same
+# thread reads rows other gunicorn workers have written since its last sync,
+# so every worker's boards converge within one interval.
+
+GAMES = {
+    'eco_adventure': {'difficulties': ('normal',), 'range': (-100, 150)},
+    'word_game': {'difficulties': ('easy', 'medium', 'hard'), 'range': (-500, 1000)},
+}
+
+MAX_NAME_LENGTH = 24
+
+# Rows written by other workers shortly before our last sync may commit after
+# it; re-reading this many seconds of history catches them (applying a row
+# twice is harmless)
+SYNC_OVERLAP = 5.0
+
+
+class FenwickTree:
+    def __init__(self, size):
+        self.size = size
+        self._tree = [0] * (size + 1)
+
+    def add(self, index, delta):
+        index += 1
+        while index <= self.size:
+            self._tree[index] += delta
+            index += index & -index
+
+    def prefix(self, index):
+        # Sum of counts at positions 0..index
+        index += 1
+        total = 0
+        while index > 0:
+            total += self._tree[index]
+            index -= index & -index
+        return total
+
+
+class Board:
+    def __init__(self, low, high, top_k):
+        self.low = low
+        self.high = high
+        self.top_k = top_k
+        self.counts = FenwickTree(high - low + 1)
+        self.best = {}  # player -> (score, name)
+        # Best entries as (-score, sequence, player), so ties rank by who
+        # got there first
+        self.top = []
+        self._sequence = 0
+
+    def update(self, player, name, score):
+        # Record a score; returns True if it is the player's new best
+        previous = self.best.get(player)
+        if previous is not None and score <= previous[0]:
+            if name != previous[1]:
+                self.best[player] = (previous[0], name)
+            return False
+
+        if previous is not None:
+            self.counts.add(previous[0] - self.low, -1)
+            for position, entry in enumerate(self.top):
+                if entry[2] == player:
+                    del self.top[position]
+                    break
+        self.counts.add(score - self.low, 1)
+        self.best[player] = (score, name)
+
+        self._sequence += 1
+        entry = (-score, self._sequence, player)
+        if len(self.top) < self.top_k or entry < self.top[-1]:
+            bisect.insort(self.top, entry)
+            del self.top[self.top_k:]
+        return True
+
+    def rank(self, player):
+        entry = self.best.get(player)
+        if entry is None:
+            return None
+        # Players with a strictly higher score, plus one
+        higher = len(self.best) - self.counts.prefix(entry[0] - self.low)
+        return {'rank': higher + 1, 'score': entry[0], 'name': entry[1], 'players': len(self.best)}
+
+    def leaders(self, k):
+        return [
+            {'rank': position, 'name': self.best[player][1], 'score': -negative_score}
+            for position, (negative_score, _, player) in enumerate(self.top[:k], 1)
+        ]
+
+
+class Leaderboard:
+    def __init__(self, path, games=GAMES, top_k=100, flush_interval=2.0, batch_size=500):
+        self.path = path
+        self.games = games
+        self.top_k = top_k
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+
+        self._boards = {}
+        for game, config in games.items():
+            low, high = config['range']
+            for difficulty in config['difficulties']:
+                self._boards[(game, difficulty)] = Board(low, high, top_k)
+
+        self._pending = {}  # (game, difficulty, player) -> (name, score, time)
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._local = threading.local()
+        self._worker = None
+        self._worker_pid = None
+        self._synced_until = 0.0
+        self._counters = {'submitted': 0, 'improved': 0, 'rejected': 0, 'flushes': 0,
+                          'rows_written': 0, 'rows_synced': 0, 'errors': 0}
+
+        conn = self._connect()
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS scores ('
+            'game TEXT NOT NULL, difficulty TEXT NOT NULL, player TEXT NOT NULL, '
+            'name TEXT NOT NULL, score INTEGER NOT NULL, updated REAL NOT NULL, '
+            'PRIMARY KEY (game, difficulty, player))'
+        )
+        conn.execute('CREATE INDEX IF NOT EXISTS scores_updated ON scores (updated)')
+        conn.commit()
+        self._sync(conn)
+
+    def _connect(self):
+        # One connection per thread and per process (see session_store.py)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    # -- background writer -------------------------------------------------
+
+    def start(self):
+        # Threads don't survive a fork; each worker starts its own writer
+        if self._worker is not None and self._worker_pid == os.getpid() and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is not None and self._worker_pid == os.getpid() and self._worker.is_alive():
+                return
+            if self._worker_pid is not None and self._worker_pid != os.getpid():
+                # Writes queued before the fork belong to the parent
+                self._pending = {}
+            self._worker_pid = os.getpid()
+            self._worker = threading.Thread(target=self._run, name='leaderboard-writer', daemon=True)
+            self._worker.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(timeout=self.flush_interval)
+            self._wakeup.clear()
+            try:
+                conn = self._connect()
+                self.flush(conn)
+                self._sync(conn)
+            except sqlite3.Error as e:
+                print(f"Error writing leaderboard: {str(e)}")
+                with self._lock:
+                    self._counters['errors'] += 1
+
+    def flush(self, conn=None):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+        conn = conn or self._connect()
+        try:
+            conn.executemany(
+                'INSERT INTO scores (game, difficulty, player, name, score, updated) '
+                'VALUES (?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT (game, difficulty, player) DO UPDATE SET '
+                'name = excluded.name, '
+                'score = MAX(scores.score, excluded.score), '
+                'updated = excluded.updated',
+                [(game, difficulty, player, name, score, updated)
+                 for (game, difficulty, player), (name, score, updated) in pending.items()],
+            )
+            conn.commit()
+        except sqlite3.Error:
+            # Keep the batch for the next attempt, unless newer writes for
+            # the same players have been queued since
+            conn.rollback()
+            with self._lock:
+                for key, row in pending.items():
+                    self._pending.setdefault(key, row)
+            raise
+        with self._lock:
+            self._counters['flushes'] += 1
+            self._counters['rows_written'] += len(pending)
+        return len(pending)
+
+    def _sync(self, conn):
+        # Apply rows written since the last sync, by this or any other worker
+        since = self._synced_until
+        now = time.time()
+        rows = conn.execute(
+            'SELECT game, difficulty, player, name, score FROM scores WHERE updated >= ? ORDER BY updated',
+            (since - SYNC_OVERLAP if since else 0,),
+        ).fetchall()
+        with self._lock:
+            for game, difficulty, player, name, score in rows:
+                board = self._boards.get((game, difficulty))
+                if board is not None and board.low <= score <= board.high:
+                    board.update(player, name, score)
+            self._synced_until = now
+            self._counters['rows_synced'] += len(rows)
+
+    # -- API ---------------------------------------------------------------
+
+    def board(self, game, difficulty):
+        board = self._boards.get((game, difficulty))
+        if board is None:
+            raise ValueError(f"Unknown leaderboard: {game}/{difficulty}")
+        return board
+
+    def submit(self, game, difficulty, player, name, score):
+        board = self.board(game, difficulty)
+        if isinstance(score, bool) or not isinstance(score, int) or not board.low <= score <= board.high:
+            with self._lock:
+                self._counters['rejected'] += 1
+            raise ValueError(f"Score must be a whole number between {board.low} and {board.high}")
+        name = ' '.join(str(name or '').split())[:MAX_NAME_LENGTH] or 'Anonymous'
+
+        self.start()
+        with self._lock:
+            self._counters['submitted'] += 1
+            improved = board.update(player, name, score)
+            if improved:
+                self._counters['improved'] += 1
+            best = board.best[player][0]
+            key = (game, difficulty, player)
+            self._pending[key] = (name, best, time.time())
+            wake = len(self._pending) >= self.batch_size
+            result = board.rank(player)
+        if wake:
+            self._wakeup.set()
+        result['improved'] = improved
+        return result
+
+    def top(self, game, difficulty, k=10):
+        board = self.board(game, difficulty)
+        with self._lock:
+            return board.leaders(min(k, self.top_k))
+
+    def rank(self, game, difficulty, player):
+        board = self.board(game, difficulty)
+        with self._lock:
+            return board.rank(player)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats['pending'] = len(self._pending)
+            stats['players'] = {
+                f"{game}/{difficulty}": len(board.best)
+                for (game, difficulty), board in self._boards.items()
+            }
+        return stats
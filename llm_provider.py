@@ -0,0 +1,51 @@
+import os
+import threading
+import time
+
+from upstream import UpstreamError
+
+# Lazily initialized access to the Gemini SDK.
+#
+# Importing google.generativeai pulls in a large gRPC/protobuf import tree,
+# so it is deferred until the first model is actually needed. Static pages
+# and health checks never pay for it, and a worker can start serving before
+# the SDK is loaded. get_genai() imports and configures the SDK exactly once
+# per process and records how long that took.
+
+
+class LLMUnavailableError(UpstreamError):
+    pass
+
+
+_lock = threading.Lock()
+_genai = None
+_timings = {}
+
+
+def get_genai():
+    global _genai
+    if _genai is not None:
+        return _genai
+    with _lock:
+        if _genai is None:
+            api_key = os.getenv('GEMINI_API_KEY')
+            if not api_key:
+                raise LLMUnavailableError("GEMINI_API_KEY is not set")
+
+            start = time.perf_counter()
+            import google.generativeai as genai
+            _timings['import_ms'] = round((time.perf_counter() - start) * 1000, 1)
+
+            start = time.perf_counter()
+            genai.configure(api_key=api_key)
+            _timings['configure_ms'] = round((time.perf_counter() - start) * 1000, 1)
+            _genai = genai
+    return _genai
+
+
+def is_ready():
+    return _genai is not None
+
+
+def stats():
+    return dict(_timings, ready=is_ready())
@@ -0,0 +1,103 @@
+import argparse
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+# Simple concurrent load generator for the web app.
+#
+# Fires --requests requests at --url from --concurrency client threads and
+# reports throughput, latency percentiles and the peak number of requests
+# that were in flight at once. Compare worker configurations by running it
+# against the same route under each, e.g.
+#
+#   gunicorn chatbot:app --worker-class sync --workers 2    # before
+#   gunicorn chatbot:app -c gunicorn.conf.py                # after
+#   python load_test.py --url http://localhost:5000/get_words?difficulty=hard --concurrency 100
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run_load(url, total_requests, concurrency, method='GET', body=None, timeout=60, headers=None):
+    data = json.dumps(body).encode('utf-8') if body is not None else None
+    headers = dict(headers or {})
+    if data is not None:
+        headers.setdefault('Content-Type', 'application/json')
+
+    latencies = []
+    errors = []
+    statuses = {}
+    lock = threading.Lock()
+    in_flight = [0, 0]  # current, peak
+
+    def one_request(_):
+        request = urllib.request.Request(url, data=data, method=method, headers=headers)
+        with lock:
+            in_flight[0] += 1
+            in_flight[1] = max(in_flight[1], in_flight[0])
+        start = time.perf_counter()
+        status = None
+        try:
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                response.read()
+                status = response.status
+        except urllib.error.HTTPError as e:
+            status = e.code
+        except Exception as e:
+            with lock:
+                errors.append(str(e))
+        elapsed = time.perf_counter() - start
+        with lock:
+            in_flight[0] -= 1
+            if status is not None:
+                latencies.append(elapsed)
+                statuses[status] = statuses.get(status, 0) + 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(one_request, range(total_requests)))
+    duration = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        'url': url,
+        'requests': total_requests,
+        'concurrency': concurrency,
+        'duration_s': round(duration, 3),
+        'throughput_rps': round(len(latencies) / duration, 2) if duration else 0.0,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 1),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 1),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 1),
+        'max_ms': round(latencies[-1] * 1000, 1) if latencies else 0.0,
+        'peak_in_flight': in_flight[1],
+        'statuses': statuses,
+        'errors': len(errors),
+        'error_samples': errors[:3],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Concurrent load test for one route')
+    parser.add_argument('--url', required=True)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--method', default='GET')
+    parser.add_argument('--json', help='JSON request body, e.g. \'{"message": "What is composting?"}\'')
+    parser.add_argument('--timeout', type=float, default=60)
+    args = parser.parse_args()
+
+    body = json.loads(args.json) if args.json else None
+    method = 'POST' if body is not None and args.method == 'GET' else args.method
+    result = run_load(args.url, args.requests, args.concurrency, method=method, body=body, timeout=args.timeout)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,200 @@
+import bisect
+import json
+import threading
+import time
+
+# Prometheus metrics and structured request logs.
+#
+# Metrics are plain counters and histograms kept in dicts keyed by label
+# values; recording one is a dict lookup and a few additions under a lock,
+# so it is cheap enough for every request. render() formats everything in
+# the Prometheus text exposition format for /metrics. Gauges are callbacks
+# evaluated at scrape time, so the hot path never has to maintain them.
+#
+# Metrics are per process: with several gunicorn workers, each scrape of
+# /metrics is answered by whichever worker accepts it.
+#
+# log_event() prints one JSON object per line, for request logs and other
+# events that should be machine readable.
+
+# Latency buckets in seconds, from static files served from memory up to
+# Gemini calls near their deadline
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def value(self, *label_values):
+        with self._lock:
+            return self._values.get(label_values, 0)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for label_values, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_labels(self.labels, label_values)} {_number(value)}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [count per bucket (last one is +Inf), sum]
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, seconds, *label_values):
+        # Counts are kept per bucket and made cumulative when rendered
+        position = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            entry = self._values.get(label_values)
+            if entry is None:
+                entry = [[0] * (len(self.buckets) + 1), 0.0]
+                self._values[label_values] = entry
+            entry[0][position] += 1
+            entry[1] += seconds
+
+    def time(self, *label_values):
+        histogram = self
+
+        class _Timer:
+            def __enter__(self):
+                self.start = time.perf_counter()
+
+            def __exit__(self, *exc):
+                histogram.observe(time.perf_counter() - self.start, *label_values)
+                return False
+
+        return _Timer()
+
+    def count(self, *label_values):
+        with self._lock:
+            entry = self._values.get(label_values)
+            return sum(entry[0]) if entry else 0
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            items = sorted((label_values, (list(counts), total))
+                           for label_values, (counts, total) in self._values.items())
+        for label_values, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = f'le="{_number(float(bound))}"'
+                lines.append(f'{self.name}_bucket{_labels(self.labels, label_values, le)} {cumulative}')
+            labels = _labels(self.labels, label_values)
+            lines.append(f'{self.name}_sum{labels} {round(total, 6)}')
+            lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+class Gauge:
+    def __init__(self, name, help_text, callback, labels=()):
+        # `callback` returns a number, or a dict of label values -> number
+        self.name = name
+        self.help_text = help_text
+        self.callback = callback
+        self.labels = tuple(labels)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} gauge']
+        try:
+            value = self.callback()
+        except Exception as e:
+            print(f"Error reading gauge {self.name}: {str(e)}")
+            return lines
+        if isinstance(value, dict):
+            for label_values, number in sorted(value.items()):
+                if not isinstance(label_values, tuple):
+                    label_values = (label_values,)
+                lines.append(f'{self.name}{_labels(self.labels, label_values)} {_number(number)}')
+        else:
+            lines.append(f'{self.name} {_number(value)}')
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, labels=()):
+        return self._register(Counter(name, help_text, labels))
+
+    def histogram(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, help_text, labels, buckets))
+
+    def gauge(self, name, help_text, callback, labels=()):
+        return self._register(Gauge(name, help_text, callback, labels))
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+http_requests = registry.counter(
+    'http_requests_total', 'HTTP requests by route, method and status', ('route', 'method', 'status'))
+http_request_seconds = registry.histogram(
+    'http_request_duration_seconds', 'Time to produce a response, by route', ('route', 'method'))
+upstream_seconds = registry.histogram(
+    'upstream_call_duration_seconds', 'Gemini call latency, retries included', ('endpoint', 'outcome'))
+parse_seconds = registry.histogram(
+    'parse_duration_seconds', 'Time spent parsing model output', ('endpoint',))
+serialize_seconds = registry.histogram(
+    'serialize_duration_seconds', 'Time spent encoding JSON responses', ('route',))
+rate_limited = registry.counter(
+    'rate_limited_total', 'Requests rejected by the rate limiter', ('route',))
+fallbacks = registry.counter(
+    'fallback_responses_total', 'Responses served from fallback content', ('route', 'reason'))
+
+
+def log_event(event, **fields):
+    record = {'ts': round(time.time(), 3), 'event': event}
+    record.update(fields)
+    print(json.dumps(record, default=str), flush=True)
@@ -0,0 +1,80 @@
+import threading
+
+from llm_provider import get_genai
+from prompts import CHAT_SYSTEM_PROMPT
+
+# Configured Gemini model objects, built once per process and shared by all
+# requests. Each endpoint registers its model name, system instruction,
+# generation config and safety settings here instead of constructing a new
+# GenerativeModel on every request. The SDK itself is only imported when
+# the first model is built (see llm_provider.py).
+
+DEFAULT_MODEL = 'gemini-1.5-flash'
+
+DEFAULT_SAFETY_SETTINGS = {
+    'HARASSMENT': 'BLOCK_MEDIUM_AND_ABOVE',
+    'HATE_SPEECH': 'BLOCK_MEDIUM_AND_ABOVE',
+    'SEXUALLY_EXPLICIT': 'BLOCK_MEDIUM_AND_ABOVE',
+    'DANGEROUS_CONTENT': 'BLOCK_MEDIUM_AND_ABOVE',
+}
+
+
+class ModelRegistry:
+    def __init__(self):
+        self._specs = {}
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, model_name=DEFAULT_MODEL, system_instruction=None,
+                 generation_config=None, safety_settings=DEFAULT_SAFETY_SETTINGS):
+        self._specs[name] = {
+            'model_name': model_name,
+            'system_instruction': system_instruction,
+            'generation_config': generation_config,
+            'safety_settings': safety_settings,
+        }
+        self._models.pop(name, None)
+
+    def spec(self, name):
+        return self._specs[name]
+
+    def get(self, name):
+        model = self._models.get(name)
+        if model is None:
+            with self._lock:
+                model = self._models.get(name)
+                if model is None:
+                    spec = self._specs[name]
+                    model = get_genai().GenerativeModel(
+                        spec['model_name'],
+                        system_instruction=spec['system_instruction'],
+                        generation_config=spec['generation_config'],
+                        safety_settings=spec['safety_settings'],
+                    )
+                    self._models[name] = model
+        return model
+
+    def warm(self):
+        # Build every registered model up front, e.g. at startup
+        for name in list(self._specs):
+            self.get(name)
+
+
+models = ModelRegistry()
+
+# Chatbot: the system prompt is sent as a native system instruction rather
+# than as a fake first exchange in every conversation
+models.register(
+    'chat',
+    system_instruction=CHAT_SYSTEM_PROMPT,
+    generation_config={'temperature': 0.7, 'max_output_tokens': 1024},
+)
+
+# Game content generators: JSON mode so responses parse in one pass, and a
+# higher temperature to keep batches varied
+models.register('questions', generation_config={
+    'temperature': 0.9, 'max_output_tokens': 4096, 'response_mime_type': 'application/json'})
+models.register('scenarios', generation_config={
+    'temperature': 0.9, 'max_output_tokens': 8192, 'response_mime_type': 'application/json'})
+models.register('words', generation_config={
+    'temperature': 0.9, 'max_output_tokens': 4096, 'response_mime_type': 'application/json'})
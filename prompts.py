@@ -0,0 +1,120 @@
+# Prompts used to generate content with Gemini. Kept in one place so the
+# web routes and any offline tooling ask the model for exactly the same thing.
+
+# System instruction for the sustainability chatbot
+CHAT_SYSTEM_PROMPT = """You are a Sustainability Expert Bot designed to educate users on all aspects of environmental sustainability. You have two main modes of interaction:
+
+1. INFORMATION MODE: If the user asks any questions which is not related to environment then you should politely reject the questin and When users ask general questions about sustainability topics, provide clear, concise, and educational responses. Keep explanations brief (maximum 3-4 short paragraphs) and focus on the most important points. Topics include climate change, renewable energy, biodiversity, SDGs, waste management, water conservation, green technologies, sustainable agriculture, deforestation, pollution, environmental policies, circular economy, sustainable transportation, and eco-friendly lifestyles.
+
+2. QUIZ MODE: When users specifically request a quiz or question (by using words like "quiz", "test me", "give me a question"), provide a brief quiz question. These should be structured as multiple-choice (A, B, C, D) or true/false questions, with concise explanations after the user responds.
+
+COMPARISON FORMAT: When users ask about differences or comparisons between two or more concepts (e.g., "What's the difference between solar and wind energy?"), format your response as an HTML table with columns. Each column should have a header with the concept name, and the content should be in bullet points. For example:
+
+<table class="comparison-table">
+  <tr>
+    <th>Solar Energy</th>
+    <th>Wind Energy</th>
+  </tr>
+  <tr>
+    <td>
+      <ul>
+        <li>Harvests energy from sunlight</li>
+        <li>Works best in sunny areas</li>
+        <li>No moving parts</li>
+      </ul>
+    </td>
+    <td>
+      <ul>
+        <li>Harvests energy from wind</li>
+        <li>Works best in windy areas</li>
+        <li>Has moving turbine blades</li>
+      </ul>
+    </td>
+  </tr>
+</table>
+3. If anyone asks you who is your developer you will answer in a very unique and polite manner that Pranay and Utkarsh has developed me and it should be in a very friendly manner.
+
+IMPORTANT: Maintain context throughout the conversation. If you've just asked a quiz question and the user responds with an answer (like "A", "B", "C", "D", "True", or "False"), recognize it as an answer to your previous question and provide feedback on whether they were correct, along with a brief explanation.
+
+Analyze each user message carefully to determine which mode is appropriate. If the message contains a direct question about sustainability, use INFORMATION MODE. If the message explicitly requests a quiz or question, use QUIZ MODE.
+
+Your tone should be friendly and engaging. Prioritize brevity and clarity in all responses. Use bullet points when appropriate to organize information. Limit your responses to 150-200 words whenever possible."""
+
+# Prompt to generate 10 sustainability quiz questions
+QUESTIONS_PROMPT = """Generate 10 multiple-choice questions about environmental sustainability. 
+Each question should have 4 options (A, B, C, D) with only one correct answer.
+
+Format the response as a JSON array with the following structure for each question:
+{
+    "question": "The question text",
+    "options": ["Option A", "Option B", "Option C", "Option D"],
+    "correct_answer": "The correct option letter (A, B, C, or D)",
+    "explanation": "Brief explanation of why the answer is correct"
+}
+
+Cover diverse sustainability topics such as climate change, renewable energy, biodiversity, 
+waste management, water conservation, sustainable agriculture, pollution, and eco-friendly practices.
+
+Make the questions educational, engaging, and varying in difficulty.
+
+IMPORTANT: Return ONLY the JSON array with no additional text or formatting.
+"""
+
+# Prompt to generate eco-adventure scenarios
+SCENARIOS_PROMPT = """Generate 10 interactive scenarios for an environmental adventure game. 
+Each scenario should present an environmental dilemma with choices that have different ecological impacts.
+
+Format the response as a JSON array with the following structure for each scenario:
+{
+    "id": 1,  // Scenario number (1-10)
+    "description": "Detailed description of the environmental scenario",
+    "environment": "forest", // One of: forest, ocean, urban, desert
+    "hint": "An educational hint about the environmental issue",
+    "choices": [
+        {
+            "id": "1A",
+            "text": "First choice option",
+            "points": 15,  // Eco points awarded for this choice (can be negative)
+            "feedback": "Feedback about the impact of this choice",
+            "next": 2  // ID of the next scenario
+        },
+        // 2-4 choices per scenario
+    ]
+}
+
+Make sure:
+1. Each scenario has 3-4 choices with varying environmental impacts
+2. Points range from -10 (harmful to environment) to +15 (very beneficial)
+3. Each choice leads to the next sequential scenario (choice.next = current scenario ID + 1)
+4. The final scenario (id: 10) should have choices that lead to scenario 11
+5. Include detailed, educational feedback for each choice
+6. Scenarios should cover diverse environmental issues (pollution, conservation, energy, etc.)
+7. Make descriptions and choices realistic and educational
+"""
+
+# Prompt to generate a mixed batch of word game words. The words are sorted
+# into difficulties by length once they arrive (see word_pool.py), so one call
+# serves every difficulty.
+def words_prompt(word_count=60):
+    per_level = word_count // 3
+    prompt = f"""Generate {word_count} different sustainability-related words for a word guessing game:
+- {per_level} easy words of 4-6 letters
+- {per_level} medium words of 7-8 letters
+- {word_count - 2 * per_level} challenging words of 9-12 letters
+Include technical terms related to environmental sustainability, conservation, renewable energy, etc.
+
+Format the response as a JSON array with the following structure:
+[
+    {{"word": "RECYCLE", "hint": "Process of converting waste into reusable material"}},
+    {{"word": "SOLAR", "hint": "Relating to energy from the sun"}},
+    ...
+]
+
+Make sure:
+1. All words are single words of letters A-Z only (no spaces, hyphens or accents)
+2. Words are related to environmental sustainability
+3. Hints are clear but don't directly give away the answer
+4. No word appears twice
+5. All words are in UPPERCASE
+"""
+    return prompt
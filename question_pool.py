@@ -0,0 +1,226 @@
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+
+# In-memory pool of pre-generated quiz questions.
+#
+# A background worker keeps the pool topped up by calling `generator` (any
+# callable returning a list of question dicts), so /get_questions can hand
+# out a randomized set from memory instead of waiting on the model. The pool
+# remembers which questions each session has already been served and prefers
+# unseen ones. Questions are retired after `max_serves` uses so the pool keeps
+# turning over, and a refill is triggered whenever it drops below `low_water`.
+# An optional `dedup` callable filters each generated batch (for example
+# through dedup_index.py), dropping near-duplicates of earlier questions.
+
+
+def question_key(question):
+    # Normalized question text used to recognise the same question twice
+    return ' '.join(str(question.get('question', '')).lower().split())
+
+
+def is_valid_question(question):
+    if not isinstance(question, dict):
+        return False
+    options = question.get('options')
+    return (
+        bool(question.get('question'))
+        and isinstance(options, list)
+        and len(options) == 4
+        and question.get('correct_answer') in ('A', 'B', 'C', 'D')
+    )
+
+
+class QuestionPool:
+    def __init__(self, generator, batch_size=10, low_water=30, high_water=60,
+                 max_serves=25, max_sessions=5000, retry_delay=5.0, dedup=None):
+        self.generator = generator
+        self.dedup = dedup
+        self.batch_size = batch_size
+        self.low_water = low_water
+        self.high_water = high_water
+        self.max_serves = max_serves
+        self.max_sessions = max_sessions
+        self.retry_delay = retry_delay
+
+        # Live questions, keyed by normalized text -> [question, serve count]
+        self._questions = OrderedDict()
+        # session_id -> set of question keys already served to that session
+        self._seen = OrderedDict()
+
+        self._lock = threading.Lock()
+        self._fill_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._worker = None
+        self._worker_pid = None
+
+        self._counters = {
+            'generated': 0,
+            'duplicates': 0,
+            'near_duplicates': 0,
+            'invalid': 0,
+            'served': 0,
+            'refills': 0,
+            'sync_fills': 0,
+            'errors': 0,
+        }
+
+    # -- background refill -------------------------------------------------
+
+    def start(self):
+        # Threads don't survive a fork, so gunicorn workers each start their
+        # own refill thread the first time they touch the pool.
+        if self._worker is not None and self._worker_pid == os.getpid() and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is not None and self._worker_pid == os.getpid() and self._worker.is_alive():
+                return
+            self._worker_pid = os.getpid()
+            self._worker = threading.Thread(target=self._run, name='question-pool-refill', daemon=True)
+            self._worker.start()
+
+    def request_refill(self):
+        self._wakeup.set()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(timeout=60)
+            self._wakeup.clear()
+            while len(self._questions) < self.high_water:
+                if not self.refill_once():
+                    time.sleep(self.retry_delay)
+                    break
+
+    def refill_once(self):
+        # Generate one batch and add it to the pool; returns False on failure
+        try:
+            batch = self.generator()
+        except Exception as e:
+            print(f"Error refilling question pool: {str(e)}")
+            with self._lock:
+                self._counters['errors'] += 1
+            return False
+        self.add(batch, dedup=self.dedup)
+        with self._lock:
+            self._counters['refills'] += 1
+        return True
+
+    def add(self, questions, dedup=None):
+        candidates = []
+        with self._lock:
+            for question in questions or []:
+                if not is_valid_question(question):
+                    self._counters['invalid'] += 1
+                elif question_key(question) in self._questions:
+                    self._counters['duplicates'] += 1
+                else:
+                    candidates.append(question)
+
+        if dedup is not None and candidates:
+            # Outside the lock: the check may hit the disk
+            fresh = dedup(candidates)
+            with self._lock:
+                self._counters['near_duplicates'] += len(candidates) - len(fresh)
+            candidates = fresh
+
+        added = 0
+        with self._lock:
+            for question in candidates:
+                key = question_key(question)
+                if key in self._questions:
+                    self._counters['duplicates'] += 1
+                    continue
+                self._questions[key] = [question, 0]
+                added += 1
+            self._counters['generated'] += added
+        return added
+
+    # -- serving -----------------------------------------------------------
+
+    def get_batch(self, session_id=None, count=None, record=True):
+        # With record=False the batch is only picked: serve counts and the
+        # session's seen questions are left alone until mark_served()
+        count = count or self.batch_size
+        self.start()
+
+        if len(self._questions) < count:
+            # Cold pool: the first request in a worker has to wait for one
+            # batch. The fill lock stops concurrent requests from each
+            # calling the generator; they wait and then read the same batch.
+            with self._fill_lock:
+                if len(self._questions) < count:
+                    with self._lock:
+                        self._counters['sync_fills'] += 1
+                    self.refill_once()
+
+        with self._lock:
+            seen = self._session_seen(session_id)
+            seen_keys = seen if seen is not None else ()
+            unseen = [key for key in self._questions if key not in seen_keys]
+            if len(unseen) >= count:
+                keys = random.sample(unseen, count)
+            else:
+                # Not enough fresh questions for this session: serve what is
+                # unseen and pad with the least-served ones it has seen.
+                keys = list(unseen)
+                random.shuffle(keys)
+                repeats = sorted(
+                    (key for key in self._questions if key in seen_keys),
+                    key=lambda key: self._questions[key][1],
+                )
+                keys.extend(repeats[:count - len(keys)])
+
+            batch = [dict(self._questions[key][0]) for key in keys]
+            if record:
+                self._record_served(keys, seen)
+            remaining_unseen = len(unseen) - min(len(unseen), count)
+            needs_refill = len(self._questions) < self.low_water or remaining_unseen < count
+
+        if needs_refill:
+            self.request_refill()
+        return batch
+
+    def mark_served(self, questions, session_id=None):
+        # Record a batch picked with record=False as served to the session
+        with self._lock:
+            self._record_served([question_key(question) for question in questions],
+                                self._session_seen(session_id))
+
+    def _record_served(self, keys, seen):
+        # Must be called with self._lock held. Questions retired since the
+        # batch was picked are only added to the session's seen set.
+        for key in keys:
+            entry = self._questions.get(key)
+            if entry is not None:
+                entry[1] += 1
+                if entry[1] >= self.max_serves:
+                    del self._questions[key]
+            if seen is not None:
+                seen.add(key)
+        self._counters['served'] += len(keys)
+
+    def _session_seen(self, session_id):
+        # Must be called with self._lock held
+        if not session_id:
+            return None
+        seen = self._seen.get(session_id)
+        if seen is None:
+            seen = set()
+            self._seen[session_id] = seen
+            while len(self._seen) > self.max_sessions:
+                self._seen.popitem(last=False)
+        else:
+            self._seen.move_to_end(session_id)
+            if len(seen) > 4 * self.high_water:
+                # Forget questions that have since been retired from the pool
+                seen.intersection_update(self._questions)
+        return seen
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats['size'] = len(self._questions)
+            stats['sessions'] = len(self._seen)
+        return stats
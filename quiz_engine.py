@@ -0,0 +1,149 @@
+import threading
+import uuid
+from collections import OrderedDict
+
+from question_pool import question_key
+
+# Server-side quiz sessions.
+#
+# start() issues a quiz id for a batch of questions and returns them without
+# their answers. The answer key lives in a session store record (see
+# session_store.py; use the SQLite backend so every gunicorn worker can
+# score any quiz), and answer() checks one submission with a single record
+# lookup, updating the running score in the record.
+#
+# Every answer also updates per-question counters (attempts, correct answers
+# and how often each option was picked), so accuracy and difficulty are
+# maintained incrementally instead of by rescanning submissions. The
+# counters are per process and keep the `max_tracked` most recently
+# answered questions.
+
+LETTERS = ('A', 'B', 'C', 'D')
+
+
+class QuizNotFoundError(KeyError):
+    pass
+
+
+class QuizEngine:
+    def __init__(self, store, points_per_question=10, max_tracked=5000):
+        self.store = store
+        self.points_per_question = points_per_question
+        self.max_tracked = max_tracked
+
+        # question key -> [text, attempts, correct, picks per option]
+        self._questions = OrderedDict()
+        self._lock = threading.Lock()
+        self._quiz_locks = [threading.Lock() for _ in range(64)]
+        self._counters = {'started': 0, 'answers': 0, 'correct': 0, 'repeats': 0,
+                          'completed': 0, 'not_found': 0}
+
+    def start(self, questions, session_id=None):
+        quiz_id = uuid.uuid4().hex
+        record = {
+            'session_id': session_id,
+            'key': [[question_key(q), q['correct_answer'], q.get('explanation', '')] for q in questions],
+            'answers': [None] * len(questions),
+            'score': 0,
+            'correct': 0,
+        }
+        self.store.save(quiz_id, record)
+        with self._lock:
+            self._counters['started'] += 1
+        public = [{'question': q['question'], 'options': q['options']} for q in questions]
+        return quiz_id, public
+
+    def answer(self, quiz_id, index, letter):
+        if letter not in LETTERS:
+            raise ValueError("Answer must be one of A, B, C or D")
+        # Only answers to quizzes sharing a lock stripe wait for each other
+        # while the record is read and written; the engine lock covers the
+        # in-memory counters alone
+        with self._quiz_locks[hash(quiz_id) % len(self._quiz_locks)]:
+            record = self.store.load(quiz_id)
+            if 'key' not in record:
+                with self._lock:
+                    self._counters['not_found'] += 1
+                raise QuizNotFoundError(quiz_id)
+            if (isinstance(index, bool) or not isinstance(index, int)
+                    or not 0 <= index < len(record['key'])):
+                raise ValueError("Question index out of range")
+
+            key, correct_answer, explanation = record['key'][index]
+            repeat = record['answers'][index] is not None
+            if repeat:
+                # Answers are final; report the original result again
+                letter = record['answers'][index]
+            is_correct = letter == correct_answer
+
+            if not repeat:
+                record['answers'][index] = letter
+                if is_correct:
+                    record['correct'] += 1
+                    record['score'] += self.points_per_question
+                self.store.save(quiz_id, record)
+
+        answered = sum(1 for given in record['answers'] if given is not None)
+        finished = answered == len(record['key'])
+        with self._lock:
+            if repeat:
+                self._counters['repeats'] += 1
+            else:
+                self._record_answer(key, letter, is_correct)
+                if finished:
+                    self._counters['completed'] += 1
+
+        return {
+            'correct': is_correct,
+            'answer': letter,
+            'correct_answer': correct_answer,
+            'explanation': explanation,
+            'score': record['score'],
+            'answered': answered,
+            'total': len(record['key']),
+            'finished': finished,
+        }
+
+    def _record_answer(self, key, letter, is_correct):
+        # Must be called with self._lock held
+        entry = self._questions.get(key)
+        if entry is None:
+            entry = [key, 0, 0, [0] * len(LETTERS)]
+            self._questions[key] = entry
+            while len(self._questions) > self.max_tracked:
+                self._questions.popitem(last=False)
+        else:
+            self._questions.move_to_end(key)
+        entry[1] += 1
+        entry[2] += 1 if is_correct else 0
+        entry[3][LETTERS.index(letter)] += 1
+        self._counters['answers'] += 1
+        self._counters['correct'] += 1 if is_correct else 0
+
+    def question_stats(self, key):
+        with self._lock:
+            entry = self._questions.get(key)
+            if entry is None:
+                return None
+            return self._describe(entry)
+
+    def _describe(self, entry):
+        _, attempts, correct, picks = entry
+        accuracy = correct / attempts if attempts else 0.0
+        return {
+            'question': entry[0],
+            'attempts': attempts,
+            'accuracy': round(accuracy, 3),
+            'difficulty': round(1 - accuracy, 3),
+            'picks': dict(zip(LETTERS, picks)),
+        }
+
+    def stats(self, hardest=5, min_attempts=5):
+        with self._lock:
+            stats = dict(self._counters)
+            stats['tracked_questions'] = len(self._questions)
+            stats['accuracy'] = round(stats['correct'] / stats['answers'], 3) if stats['answers'] else None
+            rated = [entry for entry in self._questions.values() if entry[1] >= min_attempts]
+            rated.sort(key=lambda entry: entry[2] / entry[1])
+            stats['hardest'] = [self._describe(entry) for entry in rated[:hardest]]
+        return stats
@@ -29,6 +29,10 @@ document.addEventListener('DOMContentLoaded', function() {
     
     // Game variables
     let questions = [];
+    let quizId = null;
+    // Ticket for the next round, which the server prepares while this one
+    // is played
+    let nextRoundTicket = null;
     let currentQuestionIndex = 0;
     let score = 0;
     let selectedOption = null;
@@ -49,8 +53,12 @@ document.addEventListener('DOMContentLoaded', function() {
             console.log('Background music autoplay prevented:', error);
         });
         
-        // Fetch questions from the API
-        fetch('/get_questions')
+        // Fetch this round's questions, or the prepared ones on a replay
+        fetch('/game_session', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ game: 'quiz', ticket: nextRoundTicket })
+        })
             .then(response => {
                 if (!response.ok) {
                     throw new Error('Network response was not ok');
@@ -58,15 +66,20 @@ document.addEventListener('DOMContentLoaded', function() {
                 return response.json();
             })
             .then(data => {
-                questions = data;
+                // Questions arrive without answers; each answer is checked
+                // by the server
+                nextRoundTicket = data.ticket;
+                quizId = data.round.quiz_id;
+                questions = data.round.questions;
                 totalQuestionsElement.textContent = questions.length;
                 
-                // Simulate loading for better UX (minimum 1.5 seconds)
+                // Simulate loading for better UX (minimum 1.5 seconds), but
+                // not when the round was ready in advance
                 setTimeout(() => {
                     loadingScreen.classList.add('hidden');
                     quizScreen.classList.remove('hidden');
                     loadQuestion(0);
-                }, 1500);
+                }, data.prefetched ? 0 : 1500);
             })
             .catch(error => {
                 console.error('Error fetching questions:', error);
@@ -104,32 +117,62 @@ document.addEventListener('DOMContentLoaded', function() {
                 <div class="option-text">${option}</div>
             `;
             
-            optionElement.addEventListener('click', () => selectOption(optionElement, optionLetters[i], question.correct_answer));
+            optionElement.addEventListener('click', () => selectOption(optionElement, optionLetters[i]));
             optionsContainer.appendChild(optionElement);
         });
     }
     
     // Handle option selection
-    function selectOption(optionElement, selectedLetter, correctAnswer) {
+    function selectOption(optionElement, selectedLetter) {
         // Prevent selecting another option after one is selected
         if (selectedOption) return;
         
         selectedOption = selectedLetter;
-        const isCorrect = selectedLetter === correctAnswer;
+        
+        // Disable all options while the answer is checked
+        Array.from(optionsContainer.children).forEach(option => {
+            option.style.pointerEvents = 'none';
+        });
+        
+        fetch('/quiz/answer', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ quiz_id: quizId, index: currentQuestionIndex, answer: selectedLetter })
+        })
+            .then(response => {
+                if (!response.ok) {
+                    throw new Error('Network response was not ok');
+                }
+                return response.json();
+            })
+            .then(result => showAnswer(optionElement, result))
+            .catch(error => {
+                console.error('Error checking answer:', error);
+                alert('Failed to check your answer. Please try again.');
+                selectedOption = null;
+                Array.from(optionsContainer.children).forEach(option => {
+                    option.style.pointerEvents = '';
+                });
+            });
+    }
+    
+    // Show the server's verdict for the selected option
+    function showAnswer(optionElement, result) {
+        const isCorrect = result.correct;
         
         // Mark selected option as correct or incorrect
         optionElement.classList.add(isCorrect ? 'correct' : 'incorrect');
         
         // Mark correct answer if user selected wrong
         if (!isCorrect) {
-            const correctIndex = correctAnswer.charCodeAt(0) - 'A'.charCodeAt(0);
+            const correctIndex = result.correct_answer.charCodeAt(0) - 'A'.charCodeAt(0);
             optionsContainer.children[correctIndex].classList.add('correct');
         }
         
-        // Update score if correct
+        // The score is kept by the server
+        score = result.score;
+        scoreElement.textContent = score;
         if (isCorrect) {
-            score += 10;
-            scoreElement.textContent = score;
             correctSound.play().catch(e => console.log('Audio play prevented:', e));
         } else {
             incorrectSound.play().catch(e => console.log('Audio play prevented:', e));
@@ -137,13 +180,8 @@ document.addEventListener('DOMContentLoaded', function() {
         
         // Show feedback
         feedbackIcon.className = 'feedback-icon ' + (isCorrect ? 'correct' : 'incorrect');
-        feedbackText.textContent = questions[currentQuestionIndex].explanation;
+        feedbackText.textContent = result.explanation;
         feedbackContainer.classList.remove('hidden');
-        
-        // Disable all options
-        Array.from(optionsContainer.children).forEach(option => {
-            option.style.pointerEvents = 'none';
-        });
     }
     
     // Load the next question
@@ -1,61 +1,108 @@
 import os
 from flask import Flask, request, jsonify, send_from_directory
-import google.generativeai as genai
-import json
-import random
+import uuid
+from question_pool import QuestionPool
+from content_bank import ContentBank
+from quiz_engine import QuizEngine, QuizNotFoundError
+from session_store import create_session_store
+from game_session import RoundPrefetcher
+from model_registry import models
+from prompts import QUESTIONS_PROMPT
+from structured_output import QUESTION_SCHEMA, parse_items
+
+def generate_questions():
+    # Use the shared, preconfigured model instance
+    model = models.get('questions')
+    
+    # Generate the response
+    response = model.generate_content(QUESTIONS_PROMPT)
+    
+    # Extract and validate the questions
+    return parse_items(response.text, QUESTION_SCHEMA)
 
 # This function will be called by chatbot.py
-def setup_quiz_routes(app):
+def setup_quiz_routes(app, generator=generate_questions):
+    # Questions are generated ahead of time and served from memory, starting
+    # with a set from the offline content bank
+    question_pool = QuestionPool(generator)
+    question_pool.add(ContentBank().questions(count=question_pool.high_water))
+    quiz_engine = QuizEngine(create_session_store(table='quiz_sessions', max_turns=0))
+    
     @app.route('/get_questions', methods=['GET'])
     def get_questions():
+        session_id = request.cookies.get('session_id')
+        if not session_id:
+            session_id = str(uuid.uuid4())
+        
         try:
-            # Create a generative model instance
-            model = genai.GenerativeModel('gemini-1.5-flash')
-            
-            # Define the prompt to generate 10 sustainability quiz questions
-            prompt = """Generate 10 multiple-choice questions about environmental sustainability. 
-            Each question should have 4 options (A, B, C, D) with only one correct answer.
-            
-            Format the response as a JSON array with the following structure for each question:
-            {
-                "question": "The question text",
-                "options": ["Option A", "Option B", "Option C", "Option D"],
-                "correct_answer": "The correct option letter (A, B, C, or D)",
-                "explanation": "Brief explanation of why the answer is correct"
-            }
-            
-            Cover diverse sustainability topics such as climate change, renewable energy, biodiversity, 
-            waste management, water conservation, sustainable agriculture, pollution, and eco-friendly practices.
-            
-            Make the questions educational, engaging, and varying in difficulty.
-            
-            IMPORTANT: Return ONLY the JSON array with no additional text or formatting.
-            """
-            
-            # Generate the response
-            response = model.generate_content(prompt)
-            
-            # Extract the JSON from the response
-            response_text = response.text
+            # Serve a randomized set the session hasn't seen yet
+            questions = question_pool.get_batch(session_id)
+            if not questions:
+                return jsonify({'error': 'Sorry, no questions are available right now. Please try again.'}), 503
             
-            # Clean the response if it contains markdown code blocks
-            if "```json" in response_text:
-                response_text = response_text.split("```json")[1].split("```")[0].strip()
-            elif "```" in response_text:
-                response_text = response_text.split("```")[1].split("```")[0].strip()
-                
-            # Parse the JSON
-            questions = json.loads(response_text)
-            
-            # Shuffle the questions
-            random.shuffle(questions)
-            
-            return jsonify(questions)
+            # Start a quiz; answers are checked by /quiz/answer
+            quiz_id, public_questions = quiz_engine.start(questions, session_id)
+            resp = jsonify({
+                'quiz_id': quiz_id,
+                'questions': public_questions,
+                'points_per_question': quiz_engine.points_per_question,
+            })
+            resp.set_cookie('session_id', session_id, max_age=3600)  # 1 hour expiry
+            return resp
             
         except Exception as e:
             print(f"Error: {str(e)}")
             return jsonify({'error': f'Sorry, I encountered an error: {str(e)}'}), 500
 
+    @app.route('/quiz/answer', methods=['POST'])
+    def answer_question():
+        data = request.get_json(silent=True) or {}
+        try:
+            result = quiz_engine.answer(data.get('quiz_id', ''), data.get('index'), data.get('answer'))
+        except QuizNotFoundError:
+            return jsonify({'error': 'This quiz has expired. Please start a new one.'}), 404
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        return jsonify(result)
+    
+    # quiz_game.js starts rounds here; the next round's questions are picked
+    # in the background while this one is played (see game_session.py)
+    round_prefetcher = RoundPrefetcher(
+        {'quiz': lambda params, session_id, number: question_pool.get_batch(session_id, record=False)},
+        on_serve={'quiz': question_pool.mark_served},
+    )
+    
+    @app.route('/game_session', methods=['POST'])
+    def game_session():
+        data = request.get_json(silent=True) or {}
+        if data.get('game') != 'quiz':
+            return jsonify({'error': 'Unknown game'}), 400
+        session_id = request.cookies.get('session_id') or str(uuid.uuid4())
+        
+        try:
+            questions, prefetched, ticket = round_prefetcher.start('quiz', {}, session_id, data.get('ticket'))
+            if not questions:
+                return jsonify({'error': 'Sorry, no questions are available right now. Please try again.'}), 503
+            quiz_id, public_questions = quiz_engine.start(questions, session_id)
+        except Exception as e:
+            print(f"Error: {str(e)}")
+            return jsonify({'error': f'Sorry, I encountered an error: {str(e)}'}), 500
+        
+        resp = jsonify({
+            'game': 'quiz',
+            'round': {
+                'quiz_id': quiz_id,
+                'questions': public_questions,
+                'points_per_question': quiz_engine.points_per_question,
+            },
+            'prefetched': prefetched,
+            'ticket': ticket,
+        })
+        resp.set_cookie('session_id', session_id, max_age=3600)  # 1 hour expiry
+        return resp
+    
+    return question_pool, quiz_engine
+
 # Only run this if the file is executed directly (not imported)
 if __name__ == '__main__':
     # Try to load environment variables from .env file, but handle errors gracefully
@@ -81,8 +128,7 @@ if __name__ == '__main__':
     app = Flask(__name__, static_folder='.')
     app.config['FLASK_SKIP_DOTENV'] = True
     
-    # Configure the Gemini API
-    genai.configure(api_key=api_key)
+    # The Gemini SDK is imported and configured on first use (llm_provider.py)
     
     @app.route('/')
     def index():
@@ -0,0 +1,293 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Per-client rate limiting for the routes that spend Gemini calls.
+#
+# Routes belong to limit groups (chat, content, ...), each with a token
+# bucket rate and burst. A request takes one token from two buckets: the
+# client's session (session_id cookie) and its IP address. The IP bucket is
+# `ip_multiplier` times larger and refills `ip_multiplier` times faster,
+# since a classroom behind one NAT address shares it, and it is what stops a
+# client that simply drops its cookie.
+# A request without a session is only checked against its IP.
+#
+# With a `path`, buckets live in a SQLite table shared by every gunicorn
+# worker. Taking a token is one conditional UPSERT per bucket, in a single
+# transaction, so the check is atomic across processes; a full bucket is
+# the same as no row, so idle rows are deleted periodically. Without a path
+# the buckets are an in-memory LRU private to the process.
+#
+# Every decision is also counted per (group, client) for capacity planning,
+# where the client is its IP or a hash of its session id (session ids are
+# credentials and never leave this module). With SQLite, counts accumulate
+# in memory and are added to the per-day `usage` table by a background
+# thread every `flush_interval` seconds; in memory, they are kept per
+# process for the `max_usage_keys` most recent clients.
+
+
+class BucketStore:
+    # In-memory token buckets: key -> [tokens, updated], least recent first
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, keys, now):
+        # `keys` is a list of (key, capacity, tokens per second). Takes a
+        # token from every bucket, or from none; returns seconds until a
+        # retry can succeed, 0 if the tokens were taken.
+        with self._lock:
+            levels = []
+            for key, capacity, rate in keys:
+                bucket = self._buckets.get(key)
+                tokens = capacity if bucket is None else min(capacity, bucket[0] + (now - bucket[1]) * rate)
+                levels.append(tokens)
+            if min(levels) < 1:
+                return max((1 - tokens) / rate for tokens, (_, _, rate) in zip(levels, keys) if tokens < 1)
+            for (key, capacity, _), tokens in zip(keys, levels):
+                self._buckets[key] = [tokens - 1, now]
+                self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return 0
+
+    def prune(self, idle_before):
+        with self._lock:
+            stale = [key for key, (_, updated) in self._buckets.items() if updated < idle_before]
+            for key in stale:
+                del self._buckets[key]
+
+    def size(self):
+        with self._lock:
+            return len(self._buckets)
+
+
+class SqliteBucketStore:
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        conn = self._connect()
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS buckets ('
+            'key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)'
+        )
+        conn.execute('CREATE INDEX IF NOT EXISTS buckets_updated ON buckets (updated)')
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS usage ('
+            'day TEXT NOT NULL, grp TEXT NOT NULL, client TEXT NOT NULL, '
+            'allowed INTEGER NOT NULL, limited INTEGER NOT NULL, '
+            'PRIMARY KEY (day, grp, client))'
+        )
+
+    def _connect(self):
+        # One connection per thread and per process (see session_store.py).
+        # Autocommit mode, so transactions are begun explicitly.
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def take(self, keys, now):
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            for key, capacity, rate in keys:
+                # Refill and take a token, only if one is available
+                cursor = conn.execute(
+                    'INSERT INTO buckets (key, tokens, updated) VALUES (?, ?, ?) '
+                    'ON CONFLICT (key) DO UPDATE SET '
+                    'tokens = MIN(?, tokens + (excluded.updated - updated) * ?) - 1, '
+                    'updated = excluded.updated '
+                    'WHERE MIN(?, tokens + (excluded.updated - updated) * ?) >= 1',
+                    (key, capacity - 1, now, capacity, rate, capacity, rate),
+                )
+                if cursor.rowcount == 0:
+                    tokens, updated = conn.execute(
+                        'SELECT tokens, updated FROM buckets WHERE key = ?', (key,)
+                    ).fetchone()
+                    conn.execute('ROLLBACK')
+                    tokens = min(capacity, tokens + (now - updated) * rate)
+                    return max((1 - tokens) / rate, 0.001)
+            conn.execute('COMMIT')
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            raise
+        return 0
+
+    def prune(self, idle_before):
+        self._connect().execute('DELETE FROM buckets WHERE updated < ?', (idle_before,))
+
+    def size(self):
+        return self._connect().execute('SELECT COUNT(*) FROM buckets').fetchone()[0]
+
+    def add_usage(self, rows):
+        conn = self._connect()
+        conn.execute('BEGIN')
+        try:
+            conn.executemany(
+                'INSERT INTO usage (day, grp, client, allowed, limited) VALUES (?, ?, ?, ?, ?) '
+                'ON CONFLICT (day, grp, client) DO UPDATE SET '
+                'allowed = allowed + excluded.allowed, limited = limited + excluded.limited',
+                rows,
+            )
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    def top_usage(self, day, limit):
+        return self._connect().execute(
+            'SELECT grp, client, allowed, limited FROM usage WHERE day = ? '
+            'ORDER BY allowed + limited DESC LIMIT ?',
+            (day, limit),
+        ).fetchall()
+
+
+class RateLimiter:
+    def __init__(self, limits, routes, path=None, ip_multiplier=10, flush_interval=10.0,
+                 max_usage_keys=10000):
+        # limits: group -> (requests per minute, burst); routes: URL rule ->
+        # group. A group with a rate of 0 is not limited.
+        self.limits = {group: (rate / 60.0, burst) for group, (rate, burst) in limits.items() if rate > 0}
+        self.routes = {rule: group for rule, group in routes.items() if group in self.limits}
+        self.ip_multiplier = ip_multiplier
+        self.flush_interval = flush_interval
+        self.max_usage_keys = max_usage_keys
+        self.store = SqliteBucketStore(path) if path else BucketStore()
+        self.shared = bool(path)
+
+        # (group, client) -> [allowed, limited]; for the SQLite store these
+        # are the counts not yet written to the usage table
+        self._usage = OrderedDict()
+        self._lock = threading.Lock()
+        self._worker = None
+        self._worker_pid = None
+        self._counters = {'allowed': 0, 'limited': 0, 'errors': 0}
+        self._by_group = {group: {'allowed': 0, 'limited': 0} for group in self.limits}
+
+    # -- background writer -------------------------------------------------
+
+    def start(self):
+        # Threads don't survive a fork; each gunicorn worker starts its own
+        if self._worker is not None and self._worker_pid == os.getpid() and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is not None and self._worker_pid == os.getpid() and self._worker.is_alive():
+                return
+            if self._worker_pid is not None and self._worker_pid != os.getpid() and self.shared:
+                # Counts taken before the fork belong to the parent
+                self._usage = OrderedDict()
+            self._worker_pid = os.getpid()
+            self._worker = threading.Thread(target=self._run, name='rate-limit-writer', daemon=True)
+            self._worker.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+                # A bucket left alone long enough to refill completely is
+                # the same as a new one
+                longest = max(burst / rate for rate, burst in self.limits.values())
+                self.store.prune(time.time() - longest)
+            except sqlite3.Error as e:
+                print(f"Error writing rate limit usage: {str(e)}")
+                with self._lock:
+                    self._counters['errors'] += 1
+
+    def flush(self):
+        if not self.shared:
+            return 0
+        with self._lock:
+            pending, self._usage = self._usage, OrderedDict()
+        if not pending:
+            return 0
+        day = time.strftime('%Y-%m-%d', time.gmtime())
+        try:
+            self.store.add_usage([(day, group, client, allowed, limited)
+                                  for (group, client), (allowed, limited) in pending.items()])
+        except sqlite3.Error:
+            with self._lock:
+                for key, counts in pending.items():
+                    entry = self._usage.setdefault(key, [0, 0])
+                    entry[0] += counts[0]
+                    entry[1] += counts[1]
+            raise
+        return len(pending)
+
+    # -- API ---------------------------------------------------------------
+
+    def check(self, rule, session_id, ip):
+        # Returns None if the request may go ahead, otherwise the number of
+        # seconds the client should wait
+        group = self.routes.get(rule)
+        if group is None:
+            return None
+        rate, burst = self.limits[group]
+        keys = [(f"{group}:ip:{ip}", burst * self.ip_multiplier, rate * self.ip_multiplier)]
+        if session_id:
+            keys.append((f"{group}:session:{session_id}", burst, rate))
+        if session_id:
+            client = 'session:' + hashlib.sha256(session_id.encode('utf-8')).hexdigest()[:16]
+        else:
+            client = f"ip:{ip}"
+
+        if self.shared:
+            self.start()
+        try:
+            wait = self.store.take(keys, time.time())
+        except sqlite3.Error as e:
+            # Never turn a storage problem into an outage
+            print(f"Error checking rate limit: {str(e)}")
+            with self._lock:
+                self._counters['errors'] += 1
+            return None
+
+        outcome = 'limited' if wait else 'allowed'
+        with self._lock:
+            self._counters[outcome] += 1
+            self._by_group[group][outcome] += 1
+            entry = self._usage.get((group, client))
+            if entry is None:
+                entry = [0, 0]
+                self._usage[(group, client)] = entry
+                while len(self._usage) > self.max_usage_keys:
+                    self._usage.popitem(last=False)
+            else:
+                self._usage.move_to_end((group, client))
+            entry[0 if outcome == 'allowed' else 1] += 1
+        return wait or None
+
+    def top_usage(self, limit=10):
+        # Heaviest clients today (with SQLite) or since the process started
+        if self.shared:
+            rows = self.store.top_usage(time.strftime('%Y-%m-%d', time.gmtime()), limit)
+        else:
+            with self._lock:
+                rows = [(group, client, allowed, limited)
+                        for (group, client), (allowed, limited) in self._usage.items()]
+            rows.sort(key=lambda row: row[2] + row[3], reverse=True)
+            rows = rows[:limit]
+        return [{'group': group, 'client': client, 'allowed': allowed, 'limited': limited}
+                for group, client, allowed, limited in rows]
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats['groups'] = {group: dict(counts) for group, counts in self._by_group.items()}
+            stats['backend'] = 'sqlite' if self.shared else 'memory'
+        try:
+            stats['buckets'] = self.store.size()
+            stats['top_clients'] = self.top_usage()
+        except sqlite3.Error as e:
+            print(f"Error reading rate limit usage: {str(e)}")
+        return stats
@@ -0,0 +1,180 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Cache for generated game content.
+#
+# Entries are keyed on (endpoint, normalized parameters, prompt hash, model
+# name), so changing a prompt or model automatically stops old content from
+# being served. An entry is fresh for `ttl` seconds; for `stale_ttl` seconds
+# after that it is still served immediately while a background thread
+# regenerates it (stale-while-revalidate). Entries live in a size-bounded LRU
+# in memory and, optionally, in a SQLite file so they survive restarts and
+# are shared between gunicorn workers.
+
+
+def make_key(endpoint, params, prompt, model_name):
+    prompt_hash = hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+    raw = json.dumps([endpoint, params, prompt_hash, model_name], sort_keys=True)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, ttl=900, stale_ttl=86400, max_entries=256, disk_path=None):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.disk_path = disk_path
+
+        # key -> (created time, value), least recently used first
+        self._entries = OrderedDict()
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._counters = {
+            'hits': 0,
+            'misses': 0,
+            'stale': 0,
+            'disk_hits': 0,
+            'refreshes': 0,
+            'refresh_errors': 0,
+            'evictions': 0,
+        }
+
+        if self.disk_path:
+            conn = self._connect()
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS content_cache ('
+                'key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL)'
+            )
+            conn.commit()
+
+    # -- disk tier ---------------------------------------------------------
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.disk_path, timeout=10)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _disk_get(self, key):
+        if not self.disk_path:
+            return None
+        try:
+            row = self._connect().execute(
+                'SELECT created, value FROM content_cache WHERE key = ?', (key,)
+            ).fetchone()
+        except sqlite3.Error as e:
+            print(f"Error reading content cache: {str(e)}")
+            return None
+        if row is None:
+            return None
+        return row[0], json.loads(row[1])
+
+    def _disk_put(self, key, created, value):
+        if not self.disk_path:
+            return
+        try:
+            conn = self._connect()
+            conn.execute(
+                'INSERT OR REPLACE INTO content_cache (key, value, created) VALUES (?, ?, ?)',
+                (key, json.dumps(value), created),
+            )
+            # Drop entries that are too old to be served even as stale
+            conn.execute(
+                'DELETE FROM content_cache WHERE created < ?',
+                (time.time() - self.ttl - self.stale_ttl,),
+            )
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"Error writing content cache: {str(e)}")
+
+    # -- memory tier -------------------------------------------------------
+
+    def _remember(self, key, created, value):
+        with self._lock:
+            self._entries[key] = (created, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters['evictions'] += 1
+
+    def put(self, key, value):
+        created = time.time()
+        self._remember(key, created, value)
+        self._disk_put(key, created, value)
+
+    def _lookup(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is None or time.time() - entry[0] >= self.ttl:
+            # Another worker may already have stored something newer
+            disk_entry = self._disk_get(key)
+            if disk_entry is not None and (entry is None or disk_entry[0] > entry[0]):
+                self._remember(key, *disk_entry)
+                with self._lock:
+                    self._counters['disk_hits'] += 1
+                entry = disk_entry
+        return entry
+
+    # -- public API --------------------------------------------------------
+
+    def get_or_compute(self, key, compute):
+        # `compute` must raise on failure so errors and fallback content are
+        # never cached
+        entry = self._lookup(key)
+        if entry is not None:
+            age = time.time() - entry[0]
+            if age < self.ttl:
+                with self._lock:
+                    self._counters['hits'] += 1
+                return entry[1]
+            if age < self.ttl + self.stale_ttl:
+                with self._lock:
+                    self._counters['stale'] += 1
+                self._refresh_in_background(key, compute)
+                return entry[1]
+
+        with self._lock:
+            self._counters['misses'] += 1
+        value = compute()
+        self.put(key, value)
+        return value
+
+    def _refresh_in_background(self, key, compute):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                self.put(key, compute())
+                with self._lock:
+                    self._counters['refreshes'] += 1
+            except Exception as e:
+                print(f"Error refreshing cached content: {str(e)}")
+                with self._lock:
+                    self._counters['refresh_errors'] += 1
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=refresh, name='content-cache-refresh', daemon=True).start()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats['entries'] = len(self._entries)
+            stats['refreshing'] = len(self._refreshing)
+        stats['disk'] = bool(self.disk_path)
+        return stats
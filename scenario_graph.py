@@ -0,0 +1,208 @@
+import threading
+
+# Validation and compilation of Eco-Adventure scenario graphs.
+#
+# An adventure is a list of scenarios whose choices link to each other via
+# `next`. Generated adventures are compiled before they are cached or
+# served:
+#   - scenarios and choices that are missing required fields are dropped,
+#     duplicate ids keep their first occurrence
+#   - points are coerced to integers and clamped to POINTS_RANGE
+#   - links must point forward; dangling, backward or self links are
+#     repaired to the following scenario, and links past the last scenario
+#     go to the terminal node
+#   - scenarios that can't be reached from the first one are removed
+#   - the rest are renumbered 1..n, with n + 1 as the terminal node (11 for
+#     a ten-scenario adventure), so the client can index them directly
+# Because every link points forward, every path ends at the terminal node.
+# A graph with fewer than `min_length` scenarios left is rejected with
+# ScenarioGraphError.
+#
+# The compiled Adventure keeps the links and points as tuples indexed by
+# scenario number, and precomputes for every scenario the lowest and highest
+# score still reachable from it, which is served with the scenario as
+# `score_bounds`.
+
+POINTS_RANGE = (-10, 15)
+ENVIRONMENTS = ('forest', 'ocean', 'urban', 'desert')
+CHOICE_LETTERS = 'ABCDEFGH'
+
+_lock = threading.Lock()
+_counters = {'compiled': 0, 'rejected': 0, 'repaired_links': 0, 'clamped_points': 0,
+             'dropped_scenarios': 0, 'dropped_choices': 0, 'unreachable': 0}
+
+
+class ScenarioGraphError(ValueError):
+    pass
+
+
+def _count(name, amount=1):
+    if amount:
+        with _lock:
+            _counters[name] += amount
+
+
+def _as_int(value):
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float):
+        return int(round(value))
+    if isinstance(value, str):
+        try:
+            return int(value.strip())
+        except ValueError:
+            return None
+    return None
+
+
+def _text(value):
+    return value.strip() if isinstance(value, str) else ''
+
+
+class Adventure:
+    def __init__(self, scenarios, links, points, repairs):
+        self.scenarios = scenarios
+        # links[i][j] / points[i][j]: target id and points of choice j of
+        # scenario i + 1
+        self.links = links
+        self.points = points
+        self.terminal_id = len(scenarios) + 1
+        self.repairs = repairs
+
+        # Score bounds from each scenario to the end, computed back to front
+        # since every link points forward
+        low = [0] * (self.terminal_id + 1)
+        high = [0] * (self.terminal_id + 1)
+        for scenario_id in range(len(scenarios), 0, -1):
+            options = list(zip(links[scenario_id - 1], points[scenario_id - 1]))
+            low[scenario_id] = min(p + low[target] for target, p in options)
+            high[scenario_id] = max(p + high[target] for target, p in options)
+        self.low = tuple(low)
+        self.high = tuple(high)
+
+        for scenario_id, scenario in enumerate(scenarios, 1):
+            scenario['score_bounds'] = {'min': low[scenario_id], 'max': high[scenario_id]}
+
+    @property
+    def min_score(self):
+        return self.low[1]
+
+    @property
+    def max_score(self):
+        return self.high[1]
+
+    def step(self, scenario_id, choice_index):
+        # (next scenario id, points) for a choice, without walking the list
+        return self.links[scenario_id - 1][choice_index], self.points[scenario_id - 1][choice_index]
+
+    def bounds(self, scenario_id):
+        return self.low[scenario_id], self.high[scenario_id]
+
+
+def _clean_scenario(scenario):
+    # Returns a normalized copy of the scenario, or None if it's unusable
+    if not isinstance(scenario, dict):
+        return None
+    scenario_id = _as_int(scenario.get('id'))
+    description = _text(scenario.get('description'))
+    if scenario_id is None or not description or not isinstance(scenario.get('choices'), list):
+        return None
+
+    choices = []
+    for choice in scenario['choices']:
+        if not isinstance(choice, dict) or not _text(choice.get('text')):
+            _count('dropped_choices')
+            continue
+        points = _as_int(choice.get('points'))
+        if points is None:
+            points = 0
+        clamped = min(max(points, POINTS_RANGE[0]), POINTS_RANGE[1])
+        if clamped != points:
+            _count('clamped_points')
+        choices.append({
+            'text': _text(choice['text']),
+            'points': clamped,
+            'feedback': _text(choice.get('feedback')),
+            'next': _as_int(choice.get('next')),
+        })
+    if not choices or len(choices) > len(CHOICE_LETTERS):
+        return None
+
+    environment = _text(scenario.get('environment')).lower()
+    return {
+        'id': scenario_id,
+        'description': description,
+        'environment': environment if environment in ENVIRONMENTS else 'forest',
+        'hint': _text(scenario.get('hint')),
+        'choices': choices,
+    }
+
+
+def compile_adventure(scenarios, min_length=3):
+    # Validate, repair and compile a list of scenario dicts into an Adventure
+    nodes = []
+    seen_ids = set()
+    for scenario in scenarios or []:
+        node = _clean_scenario(scenario)
+        if node is None or node['id'] in seen_ids:
+            _count('dropped_scenarios')
+            continue
+        seen_ids.add(node['id'])
+        nodes.append(node)
+    nodes.sort(key=lambda node: node['id'])
+
+    # Resolve links to positions; len(nodes) stands for the terminal node
+    position_of = {node['id']: position for position, node in enumerate(nodes)}
+    last_id = nodes[-1]['id'] if nodes else 0
+    repairs = 0
+    for position, node in enumerate(nodes):
+        for choice in node['choices']:
+            target = choice['next']
+            if target is not None and target > last_id:
+                choice['next'] = len(nodes)
+            elif target in position_of and position_of[target] > position:
+                choice['next'] = position_of[target]
+            else:
+                choice['next'] = position + 1
+                repairs += 1
+    _count('repaired_links', repairs)
+
+    # Keep only scenarios reachable from the first one
+    reachable = set()
+    if nodes:
+        reachable.add(0)
+        for position, node in enumerate(nodes):
+            if position in reachable:
+                reachable.update(choice['next'] for choice in node['choices'])
+    kept = [position for position in range(len(nodes)) if position in reachable]
+    _count('unreachable', len(nodes) - len(kept))
+
+    if len(kept) < min_length:
+        _count('rejected')
+        raise ScenarioGraphError(
+            f"Adventure has {len(kept)} usable scenarios, at least {min_length} are needed")
+
+    # Renumber 1..n; the terminal node becomes n + 1
+    new_id = {position: number for number, position in enumerate(kept, 1)}
+    new_id[len(nodes)] = len(kept) + 1
+    compiled, links, points = [], [], []
+    for position in kept:
+        node = nodes[position]
+        number = new_id[position]
+        node['id'] = number
+        for letter, choice in zip(CHOICE_LETTERS, node['choices']):
+            choice['id'] = f"{number}{letter}"
+            choice['next'] = new_id[choice['next']]
+        compiled.append(node)
+        links.append(tuple(choice['next'] for choice in node['choices']))
+        points.append(tuple(choice['points'] for choice in node['choices']))
+
+    _count('compiled')
+    return Adventure(compiled, tuple(links), tuple(points), repairs)
+
+
+def stats():
+    with _lock:
+        return dict(_counters)
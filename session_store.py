@@ -0,0 +1,225 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Chat session storage.
+#
+# Each session is a record {"history": [turns...], "summary": "..."} where a
+# turn is {"role": "user"|"model", "parts": [text]} as passed to Gemini.
+# Callers may keep other small JSON-serializable bookkeeping in the record.
+# Records are kept JSON-encoded, which keeps per-session memory compact and
+# gives an exact byte count for accounting. Both backends evict sessions that
+# have been idle longer than `ttl` seconds, cap the number of sessions (least
+# recently used first) and cap the number of turns kept per session.
+#
+# MemorySessionStore is private to one process. SqliteSessionStore keeps the
+# records in a local SQLite file so every gunicorn worker sees the same
+# conversations. Other per-user records (such as quizzes) can use the same
+# backends with their own table.
+
+
+def empty_record():
+    return {'history': [], 'summary': ''}
+
+
+def trim_history(history, max_turns):
+    # Keep the most recent turns, starting on a user turn so the history
+    # handed to the model always alternates user/model correctly
+    if max_turns and len(history) > max_turns:
+        history = history[-max_turns:]
+        while history and history[0].get('role') != 'user':
+            history = history[1:]
+    return history
+
+
+class MemorySessionStore:
+    def __init__(self, max_sessions=5000, ttl=3600, max_turns=40):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.max_turns = max_turns
+
+        # session_id -> (last access time, encoded record), oldest first
+        self._records = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._counters = {'evicted_lru': 0, 'evicted_ttl': 0, 'truncated': 0}
+
+    def load(self, session_id):
+        now = time.time()
+        with self._lock:
+            entry = self._records.get(session_id)
+            if entry is None:
+                return empty_record()
+            if now - entry[0] > self.ttl:
+                self._remove(session_id)
+                self._counters['evicted_ttl'] += 1
+                return empty_record()
+            self._records[session_id] = (now, entry[1])
+            self._records.move_to_end(session_id)
+            return json.loads(entry[1])
+
+    def save(self, session_id, record):
+        history = trim_history(record.get('history', []), self.max_turns)
+        data = json.dumps(dict(record, history=history))
+
+        with self._lock:
+            if len(history) != len(record.get('history', [])):
+                self._counters['truncated'] += 1
+            if session_id in self._records:
+                self._remove(session_id)
+            self._records[session_id] = (time.time(), data)
+            self._bytes += len(data)
+            self._evict()
+
+    def delete(self, session_id):
+        with self._lock:
+            if session_id in self._records:
+                self._remove(session_id)
+
+    def _remove(self, session_id):
+        # Must be called with self._lock held
+        _, data = self._records.pop(session_id)
+        self._bytes -= len(data)
+
+    def _evict(self):
+        # Must be called with self._lock held. Records are ordered by last
+        # access, so idle ones are always at the front.
+        cutoff = time.time() - self.ttl
+        while self._records:
+            session_id, (last_access, _) = next(iter(self._records.items()))
+            if last_access >= cutoff:
+                break
+            self._remove(session_id)
+            self._counters['evicted_ttl'] += 1
+        while len(self._records) > self.max_sessions:
+            session_id = next(iter(self._records))
+            self._remove(session_id)
+            self._counters['evicted_lru'] += 1
+
+    def stats(self):
+        with self._lock:
+            self._evict()
+            stats = dict(self._counters)
+            stats['backend'] = 'memory'
+            stats['sessions'] = len(self._records)
+            stats['bytes'] = self._bytes
+        return stats
+
+
+class SqliteSessionStore:
+    def __init__(self, path, max_sessions=5000, ttl=3600, max_turns=40, evict_every=100,
+                 table='chat_sessions'):
+        self.path = path
+        self.table = table
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.max_turns = max_turns
+        self.evict_every = evict_every
+
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._counters = {'evicted_lru': 0, 'evicted_ttl': 0, 'truncated': 0}
+
+        conn = self._connect()
+        conn.execute(
+            f'CREATE TABLE IF NOT EXISTS {self.table} ('
+            'id TEXT PRIMARY KEY, data TEXT NOT NULL, updated REAL NOT NULL)'
+        )
+        conn.execute(f'CREATE INDEX IF NOT EXISTS {self.table}_updated ON {self.table} (updated)')
+        conn.commit()
+
+    def _connect(self):
+        # One connection per thread (and per process, since connections
+        # must not be shared across a fork)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def load(self, session_id):
+        conn = self._connect()
+        row = conn.execute(
+            f'SELECT data, updated FROM {self.table} WHERE id = ?', (session_id,)
+        ).fetchone()
+        if row is None:
+            return empty_record()
+        now = time.time()
+        if now - row[1] > self.ttl:
+            conn.execute(f'DELETE FROM {self.table} WHERE id = ?', (session_id,))
+            conn.commit()
+            with self._lock:
+                self._counters['evicted_ttl'] += 1
+            return empty_record()
+        conn.execute(f'UPDATE {self.table} SET updated = ? WHERE id = ?', (now, session_id))
+        conn.commit()
+        return json.loads(row[0])
+
+    def save(self, session_id, record):
+        history = trim_history(record.get('history', []), self.max_turns)
+        data = json.dumps(dict(record, history=history))
+
+        conn = self._connect()
+        conn.execute(
+            f'INSERT OR REPLACE INTO {self.table} (id, data, updated) VALUES (?, ?, ?)',
+            (session_id, data, time.time()),
+        )
+        conn.commit()
+
+        with self._lock:
+            if len(history) != len(record.get('history', [])):
+                self._counters['truncated'] += 1
+            self._writes += 1
+            evict = self._writes % self.evict_every == 0
+        if evict:
+            self._evict(conn)
+
+    def delete(self, session_id):
+        conn = self._connect()
+        conn.execute(f'DELETE FROM {self.table} WHERE id = ?', (session_id,))
+        conn.commit()
+
+    def _evict(self, conn):
+        # Eviction is amortized over writes rather than done on every save
+        expired = conn.execute(
+            f'DELETE FROM {self.table} WHERE updated < ?', (time.time() - self.ttl,)
+        ).rowcount
+        overflow = conn.execute(
+            f'DELETE FROM {self.table} WHERE id IN ('
+            f'SELECT id FROM {self.table} ORDER BY updated DESC LIMIT -1 OFFSET ?)',
+            (self.max_sessions,),
+        ).rowcount
+        conn.commit()
+        with self._lock:
+            self._counters['evicted_ttl'] += expired
+            self._counters['evicted_lru'] += overflow
+
+    def stats(self):
+        conn = self._connect()
+        count, size = conn.execute(
+            f'SELECT COUNT(*), COALESCE(SUM(LENGTH(data)), 0) FROM {self.table}'
+        ).fetchone()
+        with self._lock:
+            stats = dict(self._counters)
+        stats['backend'] = 'sqlite'
+        stats['sessions'] = count
+        stats['bytes'] = size
+        return stats
+
+
+def create_session_store(url=None, table='chat_sessions', **kwargs):
+    # CHAT_SESSION_STORE is either "memory" (default) or "sqlite:<path>"
+    url = url or os.getenv('CHAT_SESSION_STORE', 'memory')
+    if url.startswith('sqlite:'):
+        path = url[len('sqlite:'):]
+        if path.startswith('//'):
+            path = path[2:]
+        return SqliteSessionStore(path or 'chat_sessions.db', table=table, **kwargs)
+    return MemorySessionStore(**kwargs)
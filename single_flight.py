@@ -0,0 +1,70 @@
+import threading
+
+# Request coalescing for content generation.
+#
+# When several requests need the same content at the same time (say a whole
+# class opening the word game at once), only the first one calls the model.
+# The others wait for that call and share its result, or its exception. Keys
+# identify the logical content, e.g. the response cache key.
+
+
+class SingleFlightTimeout(TimeoutError):
+    pass
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    def __init__(self, timeout=60):
+        self.timeout = timeout
+
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._counters = {'calls': 0, 'deduplicated': 0, 'errors': 0, 'timeouts': 0}
+
+    def do(self, key, fn, timeout=None):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                self._counters['calls'] += 1
+            else:
+                call.waiters += 1
+                self._counters['deduplicated'] += 1
+
+        if leader:
+            try:
+                call.result = fn()
+            except Exception as e:
+                call.error = e
+                with self._lock:
+                    self._counters['errors'] += 1
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+        else:
+            timeout = self.timeout if timeout is None else timeout
+            if not call.done.wait(timeout):
+                with self._lock:
+                    self._counters['timeouts'] += 1
+                raise SingleFlightTimeout(f"Timed out after {timeout}s waiting for in-flight call")
+
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats['in_flight'] = len(self._calls)
+            stats['waiting'] = sum(call.waiters for call in self._calls.values())
+        return stats
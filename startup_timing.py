@@ -0,0 +1,58 @@
+import threading
+import time
+
+# Startup instrumentation.
+#
+# Records how long each phase of importing and setting up the app takes in
+# this process, when it became ready to serve, and how long it took until
+# the first request arrived. The report is printed at the first request and
+# is available on /stats. For a per-module breakdown of import time run
+# `python -X importtime -c "import chatbot"`.
+
+
+class StartupTimer:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = {}
+        self.ready_ms = None
+        self.first_request_ms = None
+        self._lock = threading.Lock()
+
+    def phase(self, name):
+        timer = self
+
+        class _Phase:
+            def __enter__(self):
+                self.start = time.perf_counter()
+
+            def __exit__(self, *exc):
+                timer.phases[name] = round((time.perf_counter() - self.start) * 1000, 1)
+                return False
+
+        return _Phase()
+
+    def _elapsed_ms(self):
+        return round((time.perf_counter() - self.started) * 1000, 1)
+
+    def mark_ready(self):
+        self.ready_ms = self._elapsed_ms()
+
+    def first_request(self):
+        # Returns True exactly once, for the first request in this process
+        if self.first_request_ms is not None:
+            return False
+        with self._lock:
+            if self.first_request_ms is not None:
+                return False
+            self.first_request_ms = self._elapsed_ms()
+            return True
+
+    def report(self):
+        return {
+            'phases_ms': dict(self.phases),
+            'ready_ms': self.ready_ms,
+            'first_request_ms': self.first_request_ms,
+        }
+
+
+startup = StartupTimer()
@@ -0,0 +1,159 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+
+from flask import Response, request
+
+try:
+    import brotli
+except ImportError:  # Optional: gzip is used when brotli isn't installed
+    brotli = None
+
+# In-memory static file serving.
+#
+# Only files listed in the manifest are served. They are read once at
+# startup, precompressed with gzip (and brotli when available) and kept in
+# memory with a strong ETag, so a request never touches the filesystem.
+# Stylesheets and scripts are also published under content-hashed URLs
+# (/static/<name>.<hash>.<ext>); the HTML pages are rewritten to reference
+# those, so they can be cached by browsers for a year, while the pages
+# themselves are revalidated with If-None-Match and answered with a 304
+# when unchanged.
+
+STATIC_MANIFEST = [
+    'index.html',
+    'quiz_game.html',
+    'eco_adventure.html',
+    'word_game.html',
+    'quiz_game.css',
+    'eco_adventure.css',
+    'word_game.css',
+    'quiz_game.js',
+    'eco_adventure.js',
+    'word_game.js',
+]
+
+# Assets that get a content-hashed, immutable URL
+HASHED_EXTENSIONS = ('.css', '.js')
+
+IMMUTABLE_CACHE = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE = 'no-cache'
+
+# Don't bother compressing tiny files
+MIN_COMPRESS_SIZE = 512
+
+ASSET_REF_RE = re.compile(r'(<(?:link|script)\b[^>]*?\b(?:href|src)=")([^"/:]+)(")')
+
+
+class Asset:
+    def __init__(self, name, body, content_type, cache_control):
+        self.name = name
+        self.content_type = content_type
+        self.cache_control = cache_control
+        self.digest = hashlib.sha256(body).hexdigest()
+
+        # encoding -> (body, etag); a strong ETag must differ per encoding
+        self.variants = {'identity': (body, f'"{self.digest[:20]}"')}
+        if len(body) >= MIN_COMPRESS_SIZE:
+            gzipped = gzip.compress(body, compresslevel=9, mtime=0)
+            if len(gzipped) < len(body):
+                self.variants['gzip'] = (gzipped, f'"{self.digest[:20]}-gz"')
+            if brotli is not None:
+                compressed = brotli.compress(body, quality=11)
+                if len(compressed) < len(body):
+                    self.variants['br'] = (compressed, f'"{self.digest[:20]}-br"')
+
+    def hashed_name(self):
+        base, ext = os.path.splitext(self.name)
+        return f"{base}.{self.digest[:12]}{ext}"
+
+
+def accepted_encodings(header):
+    encodings = set()
+    for part in header.split(','):
+        fields = part.strip().split(';')
+        coding = fields[0].strip().lower()
+        quality = 1.0
+        for field in fields[1:]:
+            field = field.strip()
+            if field.startswith('q='):
+                try:
+                    quality = float(field[2:])
+                except ValueError:
+                    quality = 0.0
+        if coding and quality > 0:
+            encodings.add(coding)
+    return encodings
+
+
+class StaticAssets:
+    def __init__(self, root, manifest=STATIC_MANIFEST):
+        self.root = root
+        self.assets = {}
+        self.hashed = {}
+
+        # Hashed assets first so the pages can be rewritten to point at them
+        for name in sorted(manifest, key=lambda name: not name.endswith(HASHED_EXTENSIONS)):
+            with open(os.path.join(root, name), 'rb') as f:
+                body = f.read()
+            content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+            if content_type.startswith('text/') or content_type in ('application/javascript', 'text/javascript'):
+                content_type += '; charset=utf-8'
+            if name.endswith('.html'):
+                body = self._rewrite_references(body)
+            asset = Asset(name, body, content_type, REVALIDATE_CACHE)
+            self.assets[name] = asset
+            if name.endswith(HASHED_EXTENSIONS):
+                self.hashed[asset.hashed_name()] = Asset(name, body, content_type, IMMUTABLE_CACHE)
+
+    def _rewrite_references(self, body):
+        def replace(match):
+            asset = self.assets.get(match.group(2))
+            if asset is None or not asset.name.endswith(HASHED_EXTENSIONS):
+                return match.group(0)
+            return f"{match.group(1)}/static/{asset.hashed_name()}{match.group(3)}"
+        return ASSET_REF_RE.sub(replace, body.decode('utf-8')).encode('utf-8')
+
+    def url_for(self, name):
+        asset = self.assets[name]
+        if name.endswith(HASHED_EXTENSIONS):
+            return f"/static/{asset.hashed_name()}"
+        return f"/{name}"
+
+    def lookup(self, name):
+        return self.assets.get(name)
+
+    def lookup_hashed(self, name):
+        return self.hashed.get(name)
+
+    def response(self, asset):
+        if asset is None:
+            return Response('Not Found', status=404, mimetype='text/plain')
+
+        # Pick the smallest encoding the client accepts
+        accepted = accepted_encodings(request.headers.get('Accept-Encoding', ''))
+        encoding = 'identity'
+        for candidate in ('br', 'gzip'):
+            if candidate in asset.variants and candidate in accepted:
+                encoding = candidate
+                break
+        body, etag = asset.variants[encoding]
+
+        headers = {
+            'ETag': etag,
+            'Cache-Control': asset.cache_control,
+            'Vary': 'Accept-Encoding',
+        }
+
+        # Any representation's ETag means the client already has this content
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match:
+            tags = {tag.strip().lstrip('W/') for tag in if_none_match.split(',')}
+            if '*' in tags or any(variant_etag in tags for _, variant_etag in asset.variants.values()):
+                return Response(status=304, headers=headers)
+
+        if encoding != 'identity':
+            headers['Content-Encoding'] = encoding
+        return Response(body, status=200, headers=headers, content_type=asset.content_type)
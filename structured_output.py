@@ -0,0 +1,225 @@
+import json
+import re
+import threading
+
+# Extraction of JSON arrays from model responses.
+#
+# The content models are asked for JSON output (see model_registry.py), so
+# the common case is a response that is exactly one JSON array and is parsed
+# with a single json.loads. Otherwise the text is scanned from the first
+# '[' that opens an array of objects, skipping prose or markdown fences
+# around it. If that array doesn't decode as a whole, its elements are
+# decoded one at a time with raw_decode so a broken element only costs that
+# element. After a bad element, decoding resumes at the next comma at the
+# array's own nesting level (skipping over brackets and strings inside the
+# element), keeping the valid items instead of discarding the whole batch.
+#
+# Every item is then checked against a per-endpoint schema: a dict of
+# field -> type or predicate. Items that don't match are dropped.
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = re.compile(r'\s*')
+
+_lock = threading.Lock()
+_counters = {'responses': 0, 'fast_path': 0, 'scanned': 0, 'salvaged': 0,
+             'items': 0, 'rejected': 0, 'failed': 0}
+
+
+def _is_str(value):
+    return isinstance(value, str) and bool(value.strip())
+
+
+def _is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _is_choice_list(value):
+    return (
+        isinstance(value, list)
+        and len(value) >= 1
+        and all(isinstance(choice, dict) and _is_str(choice.get('text')) for choice in value)
+    )
+
+
+QUESTION_SCHEMA = {
+    'question': _is_str,
+    'options': lambda value: isinstance(value, list) and len(value) == 4 and all(_is_str(o) for o in value),
+    'correct_answer': lambda value: value in ('A', 'B', 'C', 'D'),
+    'explanation': _is_str,
+}
+
+SCENARIO_SCHEMA = {
+    'id': _is_int,
+    'description': _is_str,
+    'choices': _is_choice_list,
+}
+
+WORD_SCHEMA = {
+    'word': _is_str,
+    'hint': _is_str,
+}
+
+
+def _skip_whitespace(text, pos):
+    return _WHITESPACE.match(text, pos).end()
+
+
+def _next_element(text, pos):
+    # Position after the next ',' at depth 1 of the array being decoded,
+    # scanning from `pos` inside one of its elements (or between two), or
+    # None if the array ends first. Brackets inside strings don't count.
+    depth = 1
+    in_string = False
+    escaped = False
+    for index in range(pos, len(text)):
+        char = text[index]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in '[{':
+            depth += 1
+        elif char in ']}':
+            depth -= 1
+            if depth == 0:
+                return None
+        elif char == ',' and depth == 1:
+            return index + 1
+    return None
+
+
+def _decode_array(text, start):
+    # Decode the array whose '[' is at `start`. Returns (items, salvaged)
+    # where `salvaged` counts elements that could not be decoded.
+    items = []
+    salvaged = 0
+    pos = _skip_whitespace(text, start + 1)
+    length = len(text)
+    while pos < length and text[pos] != ']':
+        try:
+            item, pos = _decoder.raw_decode(text, pos)
+            items.append(item)
+        except ValueError:
+            # Resume at the element after the broken one
+            salvaged += 1
+            pos = _next_element(text, pos)
+            if pos is None:
+                break
+            pos = _skip_whitespace(text, pos)
+            continue
+
+        pos = _skip_whitespace(text, pos)
+        if pos < length and text[pos] == ',':
+            pos = _skip_whitespace(text, pos + 1)
+        elif pos < length and text[pos] == '{':
+            # Missing comma between two objects
+            salvaged += 1
+        elif pos < length and text[pos] != ']':
+            # Junk between elements
+            salvaged += 1
+            pos = _next_element(text, pos)
+            if pos is None:
+                break
+            pos = _skip_whitespace(text, pos)
+    return items, salvaged
+
+
+def extract_json_array(text):
+    # Returns the items of the first JSON array of objects in `text`
+    stripped = text.strip()
+    if stripped.startswith('['):
+        try:
+            value = json.loads(stripped)
+            if isinstance(value, list):
+                with _lock:
+                    _counters['fast_path'] += 1
+                return value
+        except ValueError:
+            pass
+
+    with _lock:
+        _counters['scanned'] += 1
+    start = text.find('[')
+    while start != -1:
+        # Only arrays of objects count; skips things like "[1]" in prose
+        first = _skip_whitespace(text, start + 1)
+        if first < len(text) and text[first] == '{':
+            # Whole-array decode first; it stops at the closing bracket so
+            # trailing prose is ignored
+            try:
+                value, _ = _decoder.raw_decode(text, start)
+                if isinstance(value, list):
+                    return value
+            except ValueError:
+                pass
+            items, salvaged = _decode_array(text, start)
+            if items:
+                if salvaged:
+                    with _lock:
+                        _counters['salvaged'] += salvaged
+                return items
+        start = text.find('[', start + 1)
+    return []
+
+
+def matches_schema(item, schema):
+    if not isinstance(item, dict):
+        return False
+    for field, check in schema.items():
+        if field not in item:
+            return False
+        if isinstance(check, type):
+            if not isinstance(item[field], check):
+                return False
+        elif not check(item[field]):
+            return False
+    return True
+
+
+def parse_items(text, schema):
+    # Extract and validate items; raises ValueError if nothing usable is found
+    items = extract_json_array(text)
+    valid = [item for item in items if matches_schema(item, schema)]
+    with _lock:
+        _counters['responses'] += 1
+        _counters['items'] += len(valid)
+        _counters['rejected'] += len(items) - len(valid)
+        if not valid:
+            _counters['failed'] += 1
+    if not valid:
+        raise ValueError("No valid items found in model response")
+    return valid
+
+
+def stats():
+    with _lock:
+        return dict(_counters)
+
+
+if __name__ == '__main__':
+    # Regression check for salvaging: `python structured_output.py`. A
+    # broken scenario must only cost itself, even though its choices hold
+    # objects of their own and a string with brackets in it.
+    def _scenario(number):
+        return json.dumps({
+            'id': number,
+            'description': f'Scenario {number} [see map] {{north}}',
+            'choices': [{'text': 'Help', 'points': 10, 'feedback': 'Good', 'next': number + 1},
+                        {'text': 'Leave', 'points': -5, 'feedback': 'Hmm', 'next': number + 1}],
+        })
+
+    elements = [_scenario(number) for number in range(1, 11)]
+    elements[1] = elements[1].replace('"points": 10', '"points": ')
+    response = 'Here you go:\n```json\n[' + ',\n'.join(elements) + ']\n```'
+    ids = [item['id'] for item in parse_items(response, SCENARIO_SCHEMA)]
+    assert ids == [1, 3, 4, 5, 6, 7, 8, 9, 10], ids
+
+    elements[4] = elements[4] + ' trailing junk'
+    ids = [item['id'] for item in parse_items('[' + ', '.join(elements) + ']', SCENARIO_SCHEMA)]
+    assert ids == [1, 3, 4, 5, 6, 7, 8, 9, 10], ids
+    print('structured_output: ok')
@@ -0,0 +1,334 @@
+import random
+import threading
+import time
+
+# Guarded access to Gemini.
+#
+# Every model call made by the web app goes through UpstreamClient.generate,
+# which adds:
+#   - a per-endpoint deadline, passed to the SDK as the request timeout
+#   - bounded retries with jittered exponential backoff for transient errors
+#   - a per-endpoint circuit breaker: after `failure_threshold` consecutive
+#     failures calls fail immediately with CircuitOpenError (so routes serve
+#     their fallback content at once) until `reset_timeout` has passed and a
+#     trial call succeeds
+#   - a concurrency limit and a token bucket to stay under the API quota
+# A streaming call (stream=True) returns a StreamingCall, which keeps its
+# concurrency slot and the deadline until the stream has been read, and only
+# then counts as a success or failure for the circuit breaker.
+# An optional `observer(endpoint, seconds, outcome)` is called after every
+# call with its total latency (for a stream, until it ends), for metrics.
+# The limits are per process; with several gunicorn workers the effective
+# quota is the per-worker rate times the number of workers.
+
+
+class UpstreamError(Exception):
+    pass
+
+
+class CircuitOpenError(UpstreamError):
+    pass
+
+
+class UpstreamBusyError(UpstreamError):
+    pass
+
+
+# google.api_core exceptions are matched by name so this module doesn't need
+# to import the SDK
+RETRYABLE_ERRORS = {
+    'DeadlineExceeded', 'ServiceUnavailable', 'ResourceExhausted', 'InternalServerError',
+    'TooManyRequests', 'GatewayTimeout', 'BadGateway', 'Aborted', 'RetryError',
+}
+
+
+def is_retryable(error):
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    return any(cls.__name__ in RETRYABLE_ERRORS for cls in type(error).__mro__)
+
+
+class TokenBucket:
+    # A rate of 0 (or less) turns the bucket off
+    def __init__(self, rate_per_minute, burst=None):
+        self.enabled = rate_per_minute > 0
+        self.rate = rate_per_minute / 60.0
+        self.capacity = burst or max(1, rate_per_minute // 6)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.waits = 0
+
+    def acquire(self, timeout):
+        # Take one token, waiting up to `timeout` seconds; returns False if
+        # none became available in time
+        if not self.enabled:
+            return True
+        deadline = time.monotonic() + timeout
+        waited = False
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    if waited:
+                        self.waits += 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+            if now + wait > deadline:
+                return False
+            waited = True
+            time.sleep(wait)
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self.state = 'closed'
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+        self.trips = 0
+
+    def allow(self):
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open' and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = 'half_open'
+                self._trial_in_flight = False
+            if self.state == 'half_open' and not self._trial_in_flight:
+                # Let a single trial call through
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = 'closed'
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def cancel_trial(self):
+        # A half-open trial that never reached the upstream doesn't count
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == 'half_open' or self._failures >= self.failure_threshold:
+                if self.state != 'open':
+                    self.trips += 1
+                self.state = 'open'
+                self._opened_at = time.monotonic()
+                self._trial_in_flight = False
+
+
+class UpstreamClient:
+    def __init__(self, deadlines=None, default_deadline=30, max_retries=2, backoff_base=0.5,
+                 backoff_max=4.0, failure_threshold=5, reset_timeout=30,
+                 max_concurrency=32, rate_per_minute=600, observer=None):
+        self.deadlines = dict(deadlines or {})
+        self.default_deadline = default_deadline
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_concurrency = max_concurrency
+        self.observer = observer
+
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._bucket = TokenBucket(rate_per_minute)
+        self._breakers = {}
+        self._counters = {}
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    def _endpoint(self, endpoint):
+        with self._lock:
+            if endpoint not in self._breakers:
+                self._breakers[endpoint] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+                self._counters[endpoint] = {
+                    'calls': 0, 'successes': 0, 'failures': 0, 'retries': 0,
+                    'rejected': 0, 'busy': 0,
+                }
+            return self._breakers[endpoint], self._counters[endpoint]
+
+    def _count(self, counters, name):
+        with self._lock:
+            counters[name] += 1
+
+    def is_open(self, endpoint):
+        breaker, _ = self._endpoint(endpoint)
+        return breaker.state == 'open'
+
+    def generate(self, endpoint, model, contents, **kwargs):
+        start = time.perf_counter()
+
+        def observe(outcome):
+            if self.observer is not None:
+                self.observer(endpoint, time.perf_counter() - start, outcome)
+
+        try:
+            response = self._generate(endpoint, model, contents, observe, **kwargs)
+        except CircuitOpenError:
+            observe('rejected')
+            raise
+        except UpstreamBusyError:
+            observe('busy')
+            raise
+        except BaseException:
+            observe('error')
+            raise
+        if not isinstance(response, StreamingCall):
+            observe('success')
+        return response
+
+    def _generate(self, endpoint, model, contents, observe, **kwargs):
+        breaker, counters = self._endpoint(endpoint)
+        self._count(counters, 'calls')
+        if not breaker.allow():
+            self._count(counters, 'rejected')
+            raise CircuitOpenError(f"Gemini circuit open for {endpoint}")
+
+        deadline = time.monotonic() + self.deadlines.get(endpoint, self.default_deadline)
+        attempt = 0
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not self._slots.acquire(timeout=remaining):
+                self._count(counters, 'busy')
+                breaker.cancel_trial()
+                raise UpstreamBusyError(f"No upstream capacity for {endpoint} before its deadline")
+            # A stream keeps its slot (and counts as in flight) until it has
+            # been read or closed; StreamingCall releases it then
+            handed_off = False
+            try:
+                if not self._bucket.acquire(timeout=max(0.0, deadline - time.monotonic())):
+                    self._count(counters, 'busy')
+                    breaker.cancel_trial()
+                    raise UpstreamBusyError(f"Rate limit reached for {endpoint}")
+                with self._lock:
+                    self._in_flight += 1
+                try:
+                    timeout = max(1.0, deadline - time.monotonic())
+                    response = model.generate_content(
+                        contents, request_options={'timeout': timeout}, **kwargs)
+                    if kwargs.get('stream'):
+                        handed_off = True
+                        return StreamingCall(self, response, breaker, counters, deadline, observe)
+                finally:
+                    if not handed_off:
+                        with self._lock:
+                            self._in_flight -= 1
+            except UpstreamBusyError:
+                raise
+            except Exception as e:
+                backoff = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+                if (attempt < self.max_retries and is_retryable(e)
+                        and time.monotonic() + backoff < deadline):
+                    attempt += 1
+                    self._count(counters, 'retries')
+                    time.sleep(backoff)
+                    continue
+                self._count(counters, 'failures')
+                breaker.record_failure()
+                raise
+            finally:
+                if not handed_off:
+                    self._slots.release()
+
+            self._count(counters, 'successes')
+            breaker.record_success()
+            return response
+
+    def _end_stream(self, breaker, counters, succeeded):
+        with self._lock:
+            self._in_flight -= 1
+        self._slots.release()
+        if succeeded:
+            self._count(counters, 'successes')
+            breaker.record_success()
+        else:
+            self._count(counters, 'failures')
+            breaker.record_failure()
+
+    def stats(self):
+        with self._lock:
+            endpoints = {}
+            for endpoint, counters in self._counters.items():
+                breaker = self._breakers[endpoint]
+                endpoints[endpoint] = dict(counters, state=breaker.state, trips=breaker.trips)
+            return {
+                'in_flight': self._in_flight,
+                'max_concurrency': self.max_concurrency,
+                'rate_limit_waits': self._bucket.waits,
+                'endpoints': endpoints,
+            }
+
+
+class StreamingCall:
+    # A streaming response that holds its concurrency slot until it is read
+    # to the end (a success) or fails, runs past the deadline or is closed
+    # early (a failure). Other attributes pass through to the SDK response.
+    def __init__(self, client, response, breaker, counters, deadline, observe):
+        self.response = response
+        self._client = client
+        self._breaker = breaker
+        self._counters = counters
+        self._deadline = deadline
+        self._observe = observe
+        self._finished = False
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        return getattr(self.response, name)
+
+    def __iter__(self):
+        try:
+            for chunk in self.response:
+                if time.monotonic() > self._deadline:
+                    raise UpstreamError("Gemini stream ran past its deadline")
+                yield chunk
+        except GeneratorExit:
+            self.close()
+            raise
+        except BaseException:
+            if self._finish('error'):
+                self._cancel()
+            raise
+        self._finish('success')
+
+    def _finish(self, outcome):
+        # Returns False if the call had already ended
+        with self._lock:
+            if self._finished:
+                return False
+            self._finished = True
+        self._client._end_stream(self._breaker, self._counters, outcome == 'success')
+        self._observe(outcome)
+        return True
+
+    def _cancel(self):
+        # Stop the underlying gRPC stream so Gemini stops generating
+        iterator = getattr(self.response, '_iterator', None)
+        cancel = getattr(iterator, 'cancel', None)
+        if callable(cancel):
+            try:
+                cancel()
+            except Exception as e:
+                print(f"Error cancelling stream: {str(e)}")
+
+    def close(self):
+        if self._finish('cancelled'):
+            self._cancel()
+
+    def __del__(self):
+        # A stream that was never read still gives its slot back
+        self.close()
@@ -39,6 +39,10 @@ document.addEventListener('DOMContentLoaded', function() {
     const wordSummary = document.getElementById('word-summary');
     const playAgainBtn = document.getElementById('play-again-btn');
     const shareResultBtn = document.getElementById('share-result-btn');
+    const saveScoreBtn = document.getElementById('save-score-btn');
+    const playerNameInput = document.getElementById('player-name');
+    const playerRankElement = document.getElementById('player-rank');
+    const leaderboardList = document.getElementById('leaderboard-list');
     
     const hintModal = document.getElementById('hint-modal');
     const modalHintText = document.getElementById('modal-hint-text');
@@ -61,6 +65,9 @@ document.addEventListener('DOMContentLoaded', function() {
     let wordHistory = [];
     let hintsUsed = 0;
     let skipsUsed = 0;
+    // Ticket for the next round's words, which the server prepares while
+    // this round is played; it only applies to the same difficulty
+    let nextRoundTicket = null;
     
     // Initialize game
     init();
@@ -90,6 +97,7 @@ document.addEventListener('DOMContentLoaded', function() {
         });
         
         shareResultBtn.addEventListener('click', shareResults);
+        saveScoreBtn.addEventListener('click', saveScore);
         
         closeModal.addEventListener('click', () => {
             hintModal.classList.add('hidden');
@@ -209,12 +217,17 @@ document.addEventListener('DOMContentLoaded', function() {
     // Fetch words from API
     async function fetchWords() {
         try {
-            const response = await fetch('/get_words?difficulty=' + difficulty + '&mode=' + gameMode);
+            const response = await fetch('/game_session', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ game: 'word_game', difficulty: difficulty, ticket: nextRoundTicket })
+            });
             if (!response.ok) {
                 throw new Error('Network response was not ok');
             }
             const data = await response.json();
-            words = data;
+            nextRoundTicket = data.ticket;
+            words = data.round;
             return words;
         } catch (error) {
             console.error('Error fetching words:', error);
@@ -703,6 +716,7 @@ document.addEventListener('DOMContentLoaded', function() {
         
         // Update final score
         finalScoreElement.textContent = score;
+        showLeaderboard();
         
         // Generate performance message
         let performanceText = '';
@@ -757,6 +771,69 @@ document.addEventListener('DOMContentLoaded', function() {
         resultsScreen.classList.remove('hidden');
     }
     
+    // Leaderboard: load the top scores and let the player save theirs
+    function showLeaderboard() {
+        saveScoreBtn.disabled = false;
+        playerNameInput.value = localStorage.getItem('playerName') || '';
+        playerRankElement.textContent = '';
+        leaderboardList.innerHTML = '';
+        
+        fetch(`/leaderboard?game=word_game&difficulty=${difficulty}`)
+            .then(response => {
+                if (!response.ok) {
+                    throw new Error('Network response was not ok');
+                }
+                return response.json();
+            })
+            .then(data => renderLeaders(data.leaders))
+            .catch(error => console.error('Error loading leaderboard:', error));
+    }
+    
+    function saveScore() {
+        const name = playerNameInput.value.trim();
+        localStorage.setItem('playerName', name);
+        saveScoreBtn.disabled = true;
+        
+        fetch('/scores', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ game: 'word_game', difficulty: difficulty, name: name, score: score })
+        })
+            .then(response => {
+                if (!response.ok) {
+                    throw new Error('Network response was not ok');
+                }
+                return response.json();
+            })
+            .then(result => {
+                playerRankElement.textContent = result.improved ?
+                    `You are ranked #${result.rank} of ${result.players} players!` :
+                    `Your best score of ${result.score} is ranked #${result.rank} of ${result.players}.`;
+                renderLeaders(result.leaders, result.rank);
+            })
+            .catch(error => {
+                console.error('Error saving score:', error);
+                saveScoreBtn.disabled = false;
+                showToast('Could not save your score');
+            });
+    }
+    
+    function renderLeaders(leaders, myRank) {
+        leaderboardList.innerHTML = '';
+        leaders.forEach(entry => {
+            const item = document.createElement('li');
+            if (entry.rank === myRank) {
+                item.classList.add('me');
+            }
+            const name = document.createElement('span');
+            name.textContent = entry.name;
+            const points = document.createElement('span');
+            points.textContent = entry.score;
+            item.append(name, points);
+            leaderboardList.appendChild(item);
+        });
+    }
+    
     // Share results
     function shareResults() {
         const completedWords = wordHistory.filter(w => w.completed).length;
@@ -0,0 +1,223 @@
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+
+from content_bank import DIFFICULTIES, MAX_WORD_LENGTH, MIN_WORD_LENGTH, word_difficulty
+
+# Per-difficulty pools of pre-generated word game words.
+#
+# One generator call (any callable returning a list of {word, hint} dicts)
+# asks for a large mixed batch covering every difficulty. Words are checked
+# and classified locally: they must be MIN_LENGTH..MAX_LENGTH letters A-Z,
+# and their length decides the difficulty (see content_bank.word_difficulty),
+# so a single upstream call refills all three pools. A background worker
+# tops the pools up whenever one drops below `low_water`, and /get_words
+# hands out a random sample from memory.
+#
+# Words are retired after `max_serves` uses. Retired words are remembered
+# (up to `max_remembered`), so a later batch can't bring back a word players
+# have just seen, and a word is never live in two pools at once. An optional
+# `dedup` callable filters each generated batch further (for example
+# through dedup_index.py, which remembers words across restarts).
+
+MIN_LENGTH = MIN_WORD_LENGTH
+MAX_LENGTH = MAX_WORD_LENGTH
+
+
+def clean_word(item):
+    # Returns a normalized {word, hint} dict, or None if the item is unusable
+    if not isinstance(item, dict):
+        return None
+    word = str(item.get('word', '')).strip().upper()
+    hint = str(item.get('hint', '')).strip()
+    if not hint or not MIN_LENGTH <= len(word) <= MAX_LENGTH:
+        return None
+    if not (word.isascii() and word.isalpha()):
+        return None
+    return {'word': word, 'hint': hint}
+
+
+class WordPool:
+    def __init__(self, generator, batch_size=10, low_water=30, high_water=60,
+                 max_serves=25, max_remembered=2000, max_rounds=3, retry_delay=5.0,
+                 dedup=None):
+        self.generator = generator
+        self.dedup = dedup
+        self.batch_size = batch_size
+        self.low_water = low_water
+        self.high_water = high_water
+        self.max_serves = max_serves
+        self.max_remembered = max_remembered
+        # Generator calls per refill before giving up on a pool the model
+        # keeps under-supplying
+        self.max_rounds = max_rounds
+        self.retry_delay = retry_delay
+
+        # difficulty -> OrderedDict of word -> [{word, hint}, serve count]
+        self._pools = {difficulty: OrderedDict() for difficulty in DIFFICULTIES}
+        # Retired words, oldest first
+        self._retired = OrderedDict()
+
+        self._lock = threading.Lock()
+        self._fill_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._worker = None
+        self._worker_pid = None
+        # No synchronous fills before this time (see get_batch)
+        self._sync_fill_after = 0.0
+
+        self._counters = {
+            'generated': 0,
+            'duplicates': 0,
+            'near_duplicates': 0,
+            'invalid': 0,
+            'served': 0,
+            'refills': 0,
+            'sync_fills': 0,
+            'errors': 0,
+        }
+        self._generated_by_difficulty = {difficulty: 0 for difficulty in DIFFICULTIES}
+
+    # -- background refill -------------------------------------------------
+
+    def start(self):
+        # Threads don't survive a fork; each gunicorn worker starts its own
+        if self._worker is not None and self._worker_pid == os.getpid() and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is not None and self._worker_pid == os.getpid() and self._worker.is_alive():
+                return
+            self._worker_pid = os.getpid()
+            self._worker = threading.Thread(target=self._run, name='word-pool-refill', daemon=True)
+            self._worker.start()
+
+    def request_refill(self):
+        self._wakeup.set()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(timeout=60)
+            self._wakeup.clear()
+            for _ in range(self.max_rounds):
+                before = self.sizes()
+                short = [difficulty for difficulty, size in before.items() if size < self.high_water]
+                if not short:
+                    break
+                if not self.refill_once():
+                    time.sleep(self.retry_delay)
+                    break
+                after = self.sizes()
+                if all(after[difficulty] <= before[difficulty] for difficulty in short):
+                    # The batch only repeated words we already have; wait
+                    # before asking again
+                    time.sleep(self.retry_delay)
+                    break
+
+    def refill_once(self):
+        # Generate one mixed batch and sort it into the pools; returns False
+        # on failure
+        try:
+            batch = self.generator()
+        except Exception as e:
+            print(f"Error refilling word pool: {str(e)}")
+            with self._lock:
+                self._counters['errors'] += 1
+            return False
+        self.add(batch, dedup=self.dedup)
+        with self._lock:
+            self._counters['refills'] += 1
+        return True
+
+    def _known(self, word):
+        # Must be called with self._lock held
+        return word in self._retired or any(word in pool for pool in self._pools.values())
+
+    def add(self, items, dedup=None):
+        candidates = []
+        with self._lock:
+            for item in items or []:
+                cleaned = clean_word(item)
+                if cleaned is None:
+                    self._counters['invalid'] += 1
+                elif self._known(cleaned['word']):
+                    self._counters['duplicates'] += 1
+                else:
+                    candidates.append(cleaned)
+
+        if dedup is not None and candidates:
+            # Outside the lock: the check may hit the disk
+            fresh = dedup(candidates)
+            with self._lock:
+                self._counters['near_duplicates'] += len(candidates) - len(fresh)
+            candidates = fresh
+
+        added = 0
+        with self._lock:
+            for cleaned in candidates:
+                word = cleaned['word']
+                if self._known(word):
+                    self._counters['duplicates'] += 1
+                    continue
+                difficulty = word_difficulty(word)
+                self._pools[difficulty][word] = [cleaned, 0]
+                self._generated_by_difficulty[difficulty] += 1
+                added += 1
+            self._counters['generated'] += added
+        return added
+
+    # -- serving -----------------------------------------------------------
+
+    def get_batch(self, difficulty='medium', count=None):
+        count = count or self.batch_size
+        pool = self._pools[difficulty]
+        self.start()
+
+        if len(pool) < count and time.time() >= self._sync_fill_after:
+            # Short pool: wait for one batch, sharing it with concurrent
+            # requests (see question_pool.py). If that doesn't help, later
+            # requests take what there is for `retry_delay` seconds instead
+            # of each waiting on another call.
+            with self._fill_lock:
+                if len(pool) < count and time.time() >= self._sync_fill_after:
+                    with self._lock:
+                        self._counters['sync_fills'] += 1
+                    self.refill_once()
+                    if len(pool) < count:
+                        self._sync_fill_after = time.time() + self.retry_delay
+
+        with self._lock:
+            keys = random.sample(list(pool), min(count, len(pool)))
+            batch = []
+            for key in keys:
+                entry = pool[key]
+                batch.append(dict(entry[0]))
+                entry[1] += 1
+                if entry[1] >= self.max_serves:
+                    self._retire(pool, key)
+            self._counters['served'] += len(batch)
+            needs_refill = len(pool) < self.low_water
+
+        if needs_refill:
+            self.request_refill()
+        return batch
+
+    def _retire(self, pool, key):
+        # Must be called with self._lock held
+        del pool[key]
+        self._retired[key] = True
+        while len(self._retired) > self.max_remembered:
+            self._retired.popitem(last=False)
+
+    def sizes(self):
+        with self._lock:
+            return {difficulty: len(pool) for difficulty, pool in self._pools.items()}
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats['size'] = {difficulty: len(pool) for difficulty, pool in self._pools.items()}
+            stats['generated_by_difficulty'] = dict(self._generated_by_difficulty)
+            stats['retired'] = len(self._retired)
+        return stats